@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Route Optimizer Benchmark
+
+Runs every route optimization algorithm on reproducible instances and
+records wall time, peak memory and route score so that changes to
+RouteOptimizationService and EnhancedIntermediateCityService can be
+compared between commits.
+
+Instances are either synthetic corridors or real catalog pairs built from
+the local city data (no network access). Results are written as JSON and
+CSV with stable ordering so two runs can be diffed directly.
+
+Usage:
+    python scripts/benchmark_route_optimizer.py
+    python scripts/benchmark_route_optimizer.py --sizes 10 200 2000 --label before
+    python scripts/benchmark_route_optimizer.py --algorithms exact greedy --skip-memory
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest.mock import Mock
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from src.core.models import City, Coordinates, TripRequest, Season  # noqa: E402
+from src.services.city_service import CityService  # noqa: E402
+from src.services.route_optimization_service import (  # noqa: E402
+    RouteInstance, RouteOptimizationService
+)
+
+DEFAULT_SIZES = [10, 50, 200, 1000, 2000]
+DEFAULT_PAIRS = [('Paris', 'Rome'), ('Barcelona', 'Prague')]
+ALGORITHMS = ['exact', 'greedy', 'genetic', 'annealing', 'portfolio', 'enhanced_pipeline']
+
+# Endpoints that are not part of the local catalog
+ENDPOINTS = {
+    'Paris': (48.8566, 2.3522, 'France'),
+    'Rome': (41.9028, 12.4964, 'Italy'),
+    'Barcelona': (41.3851, 2.1734, 'Spain'),
+    'Prague': (50.0755, 14.4378, 'Czech Republic'),
+}
+
+CITY_TYPES = ['cultural', 'historic', 'coastal', 'culinary', 'wine', 'nature',
+              'mountain', 'artistic', 'romantic', 'adventure']
+
+
+def load_catalog() -> Dict[str, City]:
+    """Load the offline city catalog: curated cities plus the comprehensive JSON."""
+    catalog = {}
+
+    city_service = CityService(Mock())
+    for city in city_service._city_cache.values():
+        catalog[city.name] = city
+
+    json_path = os.path.join(ROOT_DIR, 'data', 'comprehensive_european_cities.json')
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    def walk(node: Any, country: str):
+        if not isinstance(node, dict):
+            return
+        if 'name' in node and isinstance(node.get('coordinates'), dict):
+            if node['name'] not in catalog:
+                catalog[node['name']] = City(
+                    name=node['name'],
+                    coordinates=Coordinates(node['coordinates']['lat'], node['coordinates']['lon']),
+                    country=country.replace('_', ' ').title(),
+                    population=node.get('population'),
+                    region=node.get('region'),
+                    types=node.get('types', [])
+                )
+            return
+        for value in node.values():
+            walk(value, country)
+
+    for country, regions in data['cities'].items():
+        walk(regions, country)
+
+    return catalog
+
+
+def resolve_city(name: str, catalog: Dict[str, City]) -> City:
+    """Look up a pair endpoint in the catalog, falling back to known coordinates."""
+    if name in catalog:
+        return catalog[name]
+    lat, lon, country = ENDPOINTS[name]
+    return City(name, Coordinates(lat, lon), country)
+
+
+def corridor_offsets(start: City, end: City, cities: List[City]) -> np.ndarray:
+    """Approximate distance in km from each city to the start-end segment."""
+    to_rad = math.pi / 180
+    mean_lat = (start.coordinates.latitude + end.coordinates.latitude) / 2 * to_rad
+
+    def project(city: City) -> Tuple[float, float]:
+        return (city.coordinates.longitude * math.cos(mean_lat) * 111.32,
+                city.coordinates.latitude * 110.57)
+
+    a = np.array(project(start))
+    b = np.array(project(end))
+    points = np.array([project(city) for city in cities])
+    segment = b - a
+    t = np.clip((points - a) @ segment / (segment @ segment), 0.0, 1.0)
+    return np.linalg.norm(points - (a + t[:, None] * segment), axis=1)
+
+
+def synthetic_instance(size: int, seed: int) -> Dict[str, Any]:
+    """Random corridor between two random European points."""
+    rng = random.Random(seed)
+    start = City('Start', Coordinates(rng.uniform(42, 52), rng.uniform(-2, 6)), 'Synthetic')
+    end = City('End', Coordinates(rng.uniform(40, 50), rng.uniform(10, 20)), 'Synthetic')
+
+    candidates = []
+    for i in range(size):
+        t = rng.random()
+        lat = start.coordinates.latitude + t * (end.coordinates.latitude - start.coordinates.latitude)
+        lon = start.coordinates.longitude + t * (end.coordinates.longitude - start.coordinates.longitude)
+        candidates.append(City(
+            f'Synthetic-{i}',
+            Coordinates(lat + rng.gauss(0, 0.8), lon + rng.gauss(0, 1.2)),
+            'Synthetic',
+            types=rng.sample(CITY_TYPES, 2)
+        ))
+
+    return {
+        'name': f'corridor-{size}',
+        'kind': 'synthetic',
+        'start': start,
+        'end': end,
+        'candidates': candidates,
+        'scores': {city.name: rng.random() for city in candidates},
+        'padded': 0
+    }
+
+
+def catalog_instance(pair: Tuple[str, str], size: int, catalog: Dict[str, City], seed: int) -> Dict[str, Any]:
+    """The ``size`` catalog cities closest to a real corridor, padded with jittered copies."""
+    rng = random.Random(seed)
+    start = resolve_city(pair[0], catalog)
+    end = resolve_city(pair[1], catalog)
+
+    pool = [city for name, city in sorted(catalog.items()) if name not in pair]
+    offsets = corridor_offsets(start, end, pool)
+    candidates = [pool[i] for i in np.argsort(offsets, kind='stable')[:size]]
+
+    # The catalog holds a few hundred cities; larger sizes reuse real cities with jitter
+    padded = 0
+    while len(candidates) < size:
+        base = candidates[padded % max(len(candidates), 1)]
+        padded += 1
+        candidates.append(City(
+            f'{base.name} #{padded}',
+            Coordinates(base.coordinates.latitude + rng.gauss(0, 0.15),
+                        base.coordinates.longitude + rng.gauss(0, 0.15)),
+            base.country,
+            types=list(base.types)
+        ))
+
+    return {
+        'name': f'{pair[0]}-{pair[1]}-{size}'.lower(),
+        'kind': 'catalog',
+        'start': start,
+        'end': end,
+        'candidates': candidates,
+        'scores': {city.name: rng.random() for city in candidates},
+        'padded': padded
+    }
+
+
+def run_algorithm(
+    algorithm: str,
+    spec: Dict[str, Any],
+    max_cities: int,
+    route_type: str,
+    time_budget: float
+) -> Tuple[List[str], float, str]:
+    """Run one algorithm and return (city names, benchmark score, method)."""
+    optimizer = RouteOptimizationService()
+    instance = RouteInstance.build(spec['start'], spec['end'], spec['candidates'], spec['scores'])
+
+    if algorithm == 'portfolio':
+        route = optimizer.optimize_route(
+            spec['start'], spec['end'], spec['candidates'], max_cities, route_type,
+            spec['scores'], time_budget_seconds=time_budget
+        )
+    elif algorithm == 'enhanced_pipeline':
+        route = run_enhanced_pipeline(spec, max_cities, route_type)
+    else:
+        method: Callable = {
+            'exact': optimizer._dynamic_programming_optimization,
+            'greedy': optimizer._greedy_optimization_with_local_search,
+            'genetic': optimizer._genetic_algorithm_optimization,
+            'annealing': optimizer._simulated_annealing_optimization,
+        }[algorithm]
+        route = method(instance, max_cities, route_type)
+
+    # Score every route with the same objective so algorithms are comparable
+    index = {city.name: i for i, city in enumerate(instance.cities)}
+    stops = [index[city.name] for city in route.cities if city.name in index]
+    return [city.name for city in route.cities], optimizer._calculate_route_score(instance, stops), route.optimization_method
+
+
+def run_enhanced_pipeline(spec: Dict[str, Any], max_cities: int, route_type: str):
+    """Score and optimize candidates through EnhancedIntermediateCityService offline."""
+    from src.services.enhanced_intermediate_city_service import EnhancedIntermediateCityService
+    from src.services.route_optimization_service import OptimizedRoute
+
+    service = EnhancedIntermediateCityService(CityService(Mock()))
+    request = TripRequest(
+        start_city=spec['start'].name,
+        end_city=spec['end'].name,
+        travel_days=7,
+        nights_at_destination=2,
+        season=Season.SUMMER
+    )
+
+    async def pipeline():
+        scored = await service._score_candidates(
+            spec['candidates'], spec['start'], spec['end'], request, route_type
+        )
+        optimized = await service._advanced_route_optimization(
+            scored, spec['start'], spec['end'], max_cities, route_type, request
+        )
+        return service._validate_and_adjust_route(optimized, spec['start'], spec['end'], max_cities)
+
+    final = asyncio.run(pipeline())
+    return OptimizedRoute(
+        cities=[scored.city for scored in final],
+        total_distance=0.0,
+        total_score=0.0,
+        optimization_method='enhanced_pipeline',
+        performance_metrics={},
+        routing_explanation=''
+    )
+
+
+def measure(
+    algorithm: str,
+    spec: Dict[str, Any],
+    args: argparse.Namespace
+) -> Dict[str, Any]:
+    """Time one run, then repeat it under tracemalloc for peak memory."""
+    def seeded_run():
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        return run_algorithm(algorithm, spec, args.max_cities, args.route_type, args.time_budget)
+
+    row = {
+        'instance': spec['name'],
+        'kind': spec['kind'],
+        'candidates': len(spec['candidates']),
+        'padded': spec['padded'],
+        'algorithm': algorithm,
+    }
+
+    try:
+        started = time.perf_counter()
+        cities, score, method = seeded_run()
+        row['wall_time_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        row['peak_memory_kb'] = None
+        if not args.skip_memory:
+            # Traced separately because tracemalloc slows down allocation-heavy code
+            tracemalloc.start()
+            try:
+                seeded_run()
+                row['peak_memory_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            finally:
+                tracemalloc.stop()
+
+        row.update({
+            'score': round(score, 6),
+            'stops': len(cities),
+            'method': method,
+            'cities': ' > '.join(cities),
+            'error': ''
+        })
+    except Exception as e:
+        row.update({'wall_time_ms': None, 'peak_memory_kb': None, 'score': None,
+                    'stops': 0, 'method': '', 'cities': '', 'error': str(e)})
+
+    return row
+
+
+def git_revision() -> Optional[str]:
+    """Current commit hash, if available."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def build_instances(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Materialise every instance requested on the command line."""
+    instances = []
+    if 'synthetic' in args.kinds:
+        for size in args.sizes:
+            instances.append(synthetic_instance(size, args.seed + size))
+    if 'catalog' in args.kinds:
+        catalog = load_catalog()
+        for pair in args.pairs:
+            for size in args.sizes:
+                instances.append(catalog_instance(pair, size, catalog, args.seed + size))
+    return instances
+
+
+def write_results(rows: List[Dict[str, Any]], args: argparse.Namespace) -> Tuple[str, str]:
+    """Write JSON and CSV result files and return their paths."""
+    os.makedirs(args.output_dir, exist_ok=True)
+    label = args.label or git_revision() or datetime.now().strftime('%Y%m%d-%H%M%S')
+    json_path = os.path.join(args.output_dir, f'route_benchmark_{label}.json')
+    csv_path = os.path.join(args.output_dir, f'route_benchmark_{label}.csv')
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'metadata': {
+                'label': label,
+                'git_revision': git_revision(),
+                'created_at': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'max_cities': args.max_cities,
+                'route_type': args.route_type,
+                'time_budget_seconds': args.time_budget,
+            },
+            'results': rows
+        }, f, indent=2, ensure_ascii=False)
+
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return json_path, csv_path
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark route optimization algorithms offline.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Candidate counts per instance')
+    parser.add_argument('--kinds', nargs='+', default=['synthetic', 'catalog'],
+                        choices=['synthetic', 'catalog'])
+    parser.add_argument('--pairs', nargs='+', default=[f'{a}:{b}' for a, b in DEFAULT_PAIRS],
+                        help='Catalog pairs as Start:End')
+    parser.add_argument('--algorithms', nargs='+', default=ALGORITHMS, choices=ALGORITHMS)
+    parser.add_argument('--max-cities', type=int, default=6)
+    parser.add_argument('--route-type', default='cultural')
+    parser.add_argument('--time-budget', type=float, default=1.5,
+                        help='Wall time budget for the portfolio run (seconds)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-memory', action='store_true',
+                        help='Skip the tracemalloc pass (halves the run time)')
+    parser.add_argument('--output-dir', default=os.path.join(ROOT_DIR, 'benchmark_results'))
+    parser.add_argument('--label', help='Result file suffix (defaults to the git revision)')
+
+    args = parser.parse_args(argv)
+    args.pairs = [tuple(pair.split(':', 1)) for pair in args.pairs]
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    instances = build_instances(args)
+
+    rows = []
+    for spec in instances:
+        for algorithm in args.algorithms:
+            row = measure(algorithm, spec, args)
+            rows.append(row)
+            print(f"{row['instance']:<28} {algorithm:<18} "
+                  f"score={row['score']} time_ms={row['wall_time_ms']} "
+                  f"peak_kb={row['peak_memory_kb']} {row['error']}")
+
+    json_path, csv_path = write_results(rows, args)
+    print(f"\nWrote {json_path}")
+    print(f"Wrote {csv_path}")
+
+
+if __name__ == '__main__':
+    main()
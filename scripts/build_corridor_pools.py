@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Corridor Pool Builder
+
+Precomputes intermediate-city candidate pools for the most popular
+start/end pairs so the planner can skip live candidate gathering.
+
+Popular pairs come from saved trips in the application database, topped up
+with a fixed list of well-known corridors. Every pair is built for each
+route type. Pools are rebuilt only when the city catalog or the learning
+data changed since the last build, unless --force is given.
+
+Usage:
+    python scripts/build_corridor_pools.py
+    python scripts/build_corridor_pools.py --top 300 --force
+    python scripts/build_corridor_pools.py --interval 3600   # refresh loop
+
+Cron (hourly check, rebuilds only when stale):
+    0 * * * * cd /app && python scripts/build_corridor_pools.py
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from typing import List, Optional, Tuple
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from src.core.models import Season, TripRequest  # noqa: E402
+from src.services.corridor_pool_store import CorridorPool, get_corridor_pool_store  # noqa: E402
+from src.services.enhanced_intermediate_city_service import get_enhanced_intermediate_city_service  # noqa: E402
+
+ROUTE_TYPES = ['scenic', 'cultural', 'adventure', 'culinary', 'romantic', 'hidden_gems']
+
+DEFAULT_PAIRS = [
+    ('Paris', 'Rome'), ('Paris', 'Barcelona'), ('Paris', 'Nice'), ('Lyon', 'Venice'),
+    ('Aix-en-Provence', 'Venice'), ('Barcelona', 'Prague'), ('Munich', 'Vienna'),
+    ('Amsterdam', 'Berlin'), ('Milan', 'Florence'), ('Madrid', 'Lisbon'),
+]
+
+
+def popular_pairs(db_path: str, top: int) -> List[Tuple[str, str]]:
+    """Most frequent start/end pairs from saved trips, then the default corridors."""
+    pairs: List[Tuple[str, str]] = []
+    try:
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute('''
+                SELECT start_city, end_city, COUNT(*) AS trips FROM saved_trips
+                GROUP BY LOWER(start_city), LOWER(end_city)
+                ORDER BY trips DESC LIMIT ?
+            ''', (top,)).fetchall()
+        pairs = [(start, end) for start, end, _ in rows]
+    except sqlite3.Error as e:
+        print(f"Could not read saved trips ({e}), using default corridors only")
+
+    seen = {(start.lower(), end.lower()) for start, end in pairs}
+    for start, end in DEFAULT_PAIRS:
+        if len(pairs) >= top:
+            break
+        if (start.lower(), end.lower()) not in seen:
+            pairs.append((start, end))
+    return pairs
+
+
+async def build_pools(pairs: List[Tuple[str, str]], route_types: List[str]) -> List[CorridorPool]:
+    service = get_enhanced_intermediate_city_service()
+    pools = []
+
+    for start_name, end_name in pairs:
+        start_city = service.city_service.get_city_by_name_sync(start_name)
+        end_city = service.city_service.get_city_by_name_sync(end_name)
+        if not start_city or not end_city:
+            print(f"Skipping {start_name} -> {end_name}: city not found")
+            continue
+
+        request = TripRequest(start_city=start_city.name, end_city=end_city.name, travel_days=7,
+                              nights_at_destination=2, season=Season.SUMMER)
+        for route_type in route_types:
+            pool = await service.build_corridor_pool(start_city, end_city, request, route_type)
+            pools.append(pool)
+            print(f"{start_city.name} -> {end_city.name} [{route_type}]: {len(pool.cities)} candidates")
+
+    return pools
+
+
+def run_once(args: argparse.Namespace) -> bool:
+    store = get_corridor_pool_store()
+    if args.output:
+        store.path = args.output
+    if not args.force and not store.is_stale():
+        print("Corridor pools are up to date")
+        return False
+
+    started = time.time()
+    pairs = popular_pairs(args.db, args.top)
+    pools = asyncio.run(build_pools(pairs, args.route_types))
+    store.save(pools)
+    print(f"Wrote {len(pools)} pools to {store.path} in {time.time() - started:.1f}s")
+    return True
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Precompute candidate pools for popular corridors.')
+    parser.add_argument('--db', default=os.path.join(ROOT_DIR, 'data', 'roadtrip.db'))
+    parser.add_argument('--top', type=int, default=200, help='Number of start/end pairs to build')
+    parser.add_argument('--route-types', nargs='+', default=ROUTE_TYPES, choices=ROUTE_TYPES)
+    parser.add_argument('--output', help='Artifact path (defaults to CORRIDOR_POOL_PATH or data/corridor_pools.json.gz)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the catalog and learning data are unchanged')
+    parser.add_argument('--interval', type=float,
+                        help='Keep running and check for staleness every INTERVAL seconds')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    run_once(args)
+    while args.interval:
+        time.sleep(args.interval)
+        args.force = False
+        run_once(args)
+
+
+if __name__ == '__main__':
+    main()
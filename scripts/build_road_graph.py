@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Road Graph Builder
+
+Builds the offline routing graph used by RoadGraphService from an
+OpenStreetMap extract of the European corridor.
+
+Only drivable major roads are kept. Ways are split at intersections so that
+intermediate shape points disappear from the graph, travel times come from
+maxspeed tags or per-highway defaults, and landmark tables for A* are
+precomputed. The result is a compressed .npz of CSR arrays.
+
+Usage:
+    python scripts/build_road_graph.py europe-corridor.osm.pbf
+    python scripts/build_road_graph.py extract.osm --bbox 41 -2 52 17 --landmarks 12
+
+.osm.pbf input needs the optional ``osmium`` package; plain .osm XML is
+read with the standard library.
+"""
+import argparse
+import math
+import os
+import sys
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from src.services.road_graph_service import DEFAULT_GRAPH_PATH, RoadGraph  # noqa: E402
+
+# Default speeds (km/h) for highway classes when maxspeed is missing
+HIGHWAY_SPEEDS = {
+    'motorway': 120, 'motorway_link': 60,
+    'trunk': 100, 'trunk_link': 50,
+    'primary': 80, 'primary_link': 40,
+    'secondary': 70, 'secondary_link': 40,
+    'tertiary': 60, 'tertiary_link': 30,
+}
+DEFAULT_CLASSES = ['motorway', 'trunk', 'primary', 'secondary']
+
+Way = Tuple[List[int], Dict[str, str]]
+
+
+def iter_osm_xml(path: str, keep_tags) -> Tuple[Dict[int, Tuple[float, float]], List[Way]]:
+    """Read nodes and highway ways from an .osm XML file."""
+    nodes = {}
+    ways = []
+    for _, element in ET.iterparse(path, events=('end',)):
+        if element.tag == 'node':
+            nodes[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+            element.clear()
+        elif element.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+            if keep_tags(tags):
+                ways.append(([int(nd.get('ref')) for nd in element.iter('nd')], tags))
+            element.clear()
+    return nodes, ways
+
+
+def iter_osm_pbf(path: str, keep_tags) -> Tuple[Dict[int, Tuple[float, float]], List[Way]]:
+    """Read nodes and highway ways from an .osm.pbf file with pyosmium."""
+    try:
+        import osmium
+    except ImportError:
+        raise SystemExit("Reading .osm.pbf needs the osmium package (pip install osmium)")
+    
+    class Handler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.ways = []
+        
+        def way(self, way):
+            tags = {tag.k: tag.v for tag in way.tags}
+            if keep_tags(tags):
+                self.ways.append(([n.ref for n in way.nodes], tags,
+                                  [(n.lat, n.lon) for n in way.nodes]))
+    
+    handler = Handler()
+    handler.apply_file(path, locations=True)
+    
+    nodes = {}
+    ways = []
+    for refs, tags, locations in handler.ways:
+        nodes.update(zip(refs, locations))
+        ways.append((refs, tags))
+    return nodes, ways
+
+
+def parse_speed(tags: Dict[str, str]) -> float:
+    """Speed in km/h from maxspeed or the highway class default."""
+    default = HIGHWAY_SPEEDS.get(tags.get('highway'), 50)
+    value = tags.get('maxspeed', '').strip().lower()
+    try:
+        if value.endswith('mph'):
+            speed = float(value[:-3]) * 1.609
+        else:
+            speed = float(value.split()[0])
+    except (ValueError, IndexError):
+        return default
+    # Posted limits overstate average speeds; never exceed the class default by much
+    return min(speed, default * 1.1)
+
+
+def haversine_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+def split_ways(nodes: Dict[int, Tuple[float, float]], ways: List[Way],
+               bbox: Optional[List[float]]) -> Iterator[Tuple[int, int, float, float, str]]:
+    """
+    Yield (from_osm_id, to_osm_id, length_m, seconds, oneway) per road segment.
+    
+    Ways are cut only at nodes shared with other ways and at way ends, so
+    shape points are folded into segment lengths.
+    """
+    def inside(point):
+        return bbox is None or (bbox[0] <= point[0] <= bbox[2] and bbox[1] <= point[1] <= bbox[3])
+    
+    usage = defaultdict(int)
+    for refs, _ in ways:
+        for ref in refs:
+            usage[ref] += 1
+    
+    for refs, tags in ways:
+        refs = [ref for ref in refs if ref in nodes and inside(nodes[ref])]
+        if len(refs) < 2:
+            continue
+        
+        speed_ms = parse_speed(tags) / 3.6
+        oneway = tags.get('oneway', 'no')
+        if tags.get('highway', '').startswith('motorway') or tags.get('junction') == 'roundabout':
+            oneway = 'yes' if oneway == 'no' else oneway
+        
+        segment_start = refs[0]
+        length = 0.0
+        for previous, ref in zip(refs, refs[1:]):
+            length += haversine_m(nodes[previous], nodes[ref])
+            if ref == refs[-1] or usage[ref] > 1:
+                yield segment_start, ref, length, length / speed_ms, oneway
+                segment_start = ref
+                length = 0.0
+
+
+def build_graph(nodes, ways, bbox=None) -> RoadGraph:
+    """Turn parsed OSM data into a RoadGraph."""
+    node_index: Dict[int, int] = {}
+    latitudes: List[float] = []
+    longitudes: List[float] = []
+    sources, targets, seconds, lengths = [], [], [], []
+    
+    def index_of(osm_id: int) -> int:
+        if osm_id not in node_index:
+            node_index[osm_id] = len(latitudes)
+            latitudes.append(nodes[osm_id][0])
+            longitudes.append(nodes[osm_id][1])
+        return node_index[osm_id]
+    
+    for start, end, length, travel_seconds, oneway in split_ways(nodes, ways, bbox):
+        a, b = index_of(start), index_of(end)
+        if oneway in ('no', 'yes', 'true', '1'):
+            sources.append(a)
+            targets.append(b)
+            seconds.append(travel_seconds)
+            lengths.append(length)
+        if oneway in ('no', '-1'):
+            sources.append(b)
+            targets.append(a)
+            seconds.append(travel_seconds)
+            lengths.append(length)
+    
+    return RoadGraph.from_edges(latitudes, longitudes, sources, targets, seconds, lengths)
+
+
+def largest_component(graph: RoadGraph) -> RoadGraph:
+    """Drop islands so every snapped city can reach every other."""
+    from scipy.sparse.csgraph import connected_components
+    
+    _, labels = connected_components(graph.to_csr(), directed=True, connection='strong')
+    keep = labels == np.bincount(labels).argmax()
+    remap = np.full(graph.node_count, -1, dtype=np.int64)
+    remap[keep] = np.arange(keep.sum())
+    
+    rows = np.repeat(np.arange(graph.node_count), np.diff(graph.indptr))
+    edges = keep[rows] & keep[graph.indices]
+    return RoadGraph.from_edges(
+        graph.node_lat[keep], graph.node_lon[keep],
+        remap[rows[edges]], remap[graph.indices[edges]],
+        graph.travel_seconds[edges], graph.length_m[edges]
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Build the offline road graph from an OSM extract.')
+    parser.add_argument('extract', help='.osm or .osm.pbf file')
+    parser.add_argument('--output', default=DEFAULT_GRAPH_PATH)
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'),
+                        help='Keep only nodes inside this box')
+    parser.add_argument('--classes', nargs='+', default=DEFAULT_CLASSES,
+                        help='Highway classes to keep (link roads are added automatically)')
+    parser.add_argument('--landmarks', type=int, default=8)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    classes = set(args.classes) | {f'{name}_link' for name in args.classes}
+    
+    def keep_tags(tags):
+        return tags.get('highway') in classes and tags.get('access') not in ('no', 'private')
+    
+    reader = iter_osm_pbf if args.extract.endswith('.pbf') else iter_osm_xml
+    print(f"Reading {args.extract}...")
+    nodes, ways = reader(args.extract, keep_tags)
+    print(f"Kept {len(ways)} ways over {len(nodes)} nodes")
+    
+    graph = largest_component(build_graph(nodes, ways, args.bbox))
+    print(f"Graph: {graph.node_count} nodes, {graph.edge_count} edges")
+    
+    if args.landmarks > 0:
+        graph.select_landmarks(args.landmarks)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    graph.save(args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
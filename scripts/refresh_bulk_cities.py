@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Bulk City Cache Refresher
+
+Fills the GeoNames bulk European city cache (data/bulk_cities.db, or
+BULK_CITY_CACHE_PATH) that planning reads as a candidate source. Web workers
+never fetch the list themselves, so run this once after a deploy and keep it
+running as the single refresh process (the ``bulk-cities`` Procfile entry).
+Only countries missing or older than the cache TTL are fetched, unless
+--force is given.
+
+Usage:
+    python scripts/refresh_bulk_cities.py
+    python scripts/refresh_bulk_cities.py --force
+    python scripts/refresh_bulk_cities.py --interval 3600   # refresh loop
+
+Cron (daily check, fetches only stale countries):
+    0 4 * * * cd /app && python scripts/refresh_bulk_cities.py
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from src.services.bulk_city_cache import BulkCityCache  # noqa: E402
+
+
+def run_once(args: argparse.Namespace) -> int:
+    cache = BulkCityCache(db_path=args.db, refresh_enabled=False)
+    if args.force:
+        cache.ttl_seconds = 0
+    stale = cache.stale_countries()
+    if not stale:
+        print("Bulk city cache is up to date")
+        return 0
+
+    started = time.time()
+    refreshed = cache.refresh_stale()
+    print(f"Refreshed {refreshed}/{len(stale)} countries ({cache.stats()['cities']} cities) "
+          f"in {cache.db_path} in {time.time() - started:.1f}s")
+    return refreshed
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Fill or refresh the bulk European city cache.')
+    parser.add_argument('--db', help='Cache path (defaults to BULK_CITY_CACHE_PATH or data/bulk_cities.db)')
+    parser.add_argument('--force', action='store_true', help='Refetch every country, even fresh ones')
+    parser.add_argument('--interval', type=float,
+                        help='Keep running and check for stale countries every INTERVAL seconds')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    run_once(args)
+    while args.interval:
+        time.sleep(args.interval)
+        args.force = False
+        run_once(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Scheduling of AI jobs: Claude calls and the endpoints that fan out into them.
+
+A process-wide cap limits how many AI jobs run at once. Jobs beyond the cap
+wait in priority lanes, and interactive chat is admitted before batch work
+such as itinerary generation. Within a lane, users are served round-robin,
+so one user's burst of requests cannot starve everyone else. A job that
+waits longer than its lane's queue timeout is shed with ``AISchedulerBusy``,
+and callers fall back as they would on an upstream error.
+
+Jobs hold a slot for as long as they run:
+    
+    async with get_ai_scheduler().slot('batch'):
+        ...
+
+Slots are re-entrant: Claude calls made inside a job that already holds a
+slot (the trip matcher, for example) do not queue a second time. The
+requesting user comes from ``set_ai_user``, which the web layer calls once
+per request, so the service layer doesn't have to pass it through.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Highest priority first
+LANES = ('interactive', 'batch')
+
+# Seconds a job may wait for a slot before it is shed
+DEFAULT_QUEUE_TIMEOUTS = {
+    'interactive': 20.0,
+    'batch': 90.0
+}
+
+_current_user: ContextVar[str] = ContextVar('ai_job_user', default='anonymous')
+_holding_slot: ContextVar[bool] = ContextVar('ai_job_holding_slot', default=False)
+
+
+class AISchedulerBusy(Exception):
+    """Raised when an AI job waited longer than its lane's queue timeout."""
+
+
+def set_ai_user(user_key: Any):
+    """Attribute AI jobs started from the current context to ``user_key``."""
+    _current_user.set(str(user_key) if user_key is not None else 'anonymous')
+
+
+class AIJobScheduler:
+    """Global concurrency cap with priority lanes and per-user round-robin."""
+    
+    def __init__(self, max_concurrency: int = None, queue_timeouts: Dict[str, float] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv('AI_MAX_CONCURRENCY', '4'))
+        self.queue_timeouts = {**DEFAULT_QUEUE_TIMEOUTS, **(queue_timeouts or {})}
+        
+        # Waiters are thread-safe futures so jobs on every worker loop share one queue
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting: Dict[str, OrderedDict[str, Deque[Future]]] = {lane: OrderedDict() for lane in LANES}
+        self._stats = {
+            lane: {'admitted': 0, 'queued': 0, 'timed_out': 0, 'max_depth': 0,
+                   'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+            for lane in LANES
+        }
+    
+    def _depth(self, lane: str) -> int:
+        return sum(len(queue) for queue in self._waiting[lane].values())
+    
+    def _request(self, lane: str, user: str) -> Future:
+        """Take a free slot or join the lane; the returned future resolves once admitted."""
+        if lane not in self._waiting:
+            raise ValueError(f"Unknown AI job lane: {lane}")
+        
+        future = Future()
+        with self._lock:
+            queued = any(self._waiting[name] for name in LANES)
+            if self._running < self.max_concurrency and not queued:
+                self._running += 1
+                future.set_running_or_notify_cancel()
+                future.set_result(None)
+                return future
+            
+            self._waiting[lane].setdefault(user, deque()).append(future)
+            stats = self._stats[lane]
+            stats['queued'] += 1
+            stats['max_depth'] = max(stats['max_depth'], self._depth(lane))
+        logger.debug("AI job queued", lane=lane, running=self._running, max_concurrency=self.max_concurrency)
+        return future
+    
+    def _release(self):
+        """Hand the slot to the next waiter, or free it when nobody is waiting."""
+        with self._lock:
+            granted = None
+            for lane in LANES:
+                users = self._waiting[lane]
+                while users and granted is None:
+                    user, queue = next(iter(users.items()))
+                    future = queue.popleft()
+                    # Round-robin: a user with more waiting jobs goes to the back of the lane
+                    del users[user]
+                    if queue:
+                        users[user] = queue
+                    if future.set_running_or_notify_cancel():
+                        granted = future
+                if granted is not None:
+                    break
+            if granted is None:
+                self._running -= 1
+                return
+        granted.set_result(None)
+    
+    def _withdraw(self, lane: str, user: str, future: Future):
+        """Remove a waiter that gave up, returning its slot if it was admitted meanwhile."""
+        with self._lock:
+            queue = self._waiting[lane].get(user)
+            if queue is not None and future in queue:
+                queue.remove(future)
+                if not queue:
+                    del self._waiting[lane][user]
+                return
+            admitted = not future.cancelled()
+        if admitted:
+            self._release()
+    
+    def _admitted(self, lane: str, started: float):
+        waited = time.monotonic() - started
+        with self._lock:
+            stats = self._stats[lane]
+            stats['admitted'] += 1
+            stats['total_wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+    
+    def _shed(self, lane: str, user: str, future: Future):
+        self._withdraw(lane, user, future)
+        with self._lock:
+            self._stats[lane]['timed_out'] += 1
+        logger.warning("AI job shed after queue timeout", lane=lane, timeout=self.queue_timeouts[lane])
+        return AISchedulerBusy(f"AI {lane} queue is full, try again shortly")
+    
+    async def _acquire(self, lane: str, user: str):
+        started = time.monotonic()
+        future = self._request(lane, user)
+        if not future.done():
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.queue_timeouts[lane])
+            except asyncio.TimeoutError:
+                raise self._shed(lane, user, future) from None
+            except BaseException:
+                self._withdraw(lane, user, future)
+                raise
+        self._admitted(lane, started)
+    
+    @asynccontextmanager
+    async def slot(self, lane: str = 'batch'):
+        """Hold one AI job slot for the duration of the block."""
+        if _holding_slot.get():
+            yield
+            return
+        
+        await self._acquire(lane, _current_user.get())
+        _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            # set() rather than reset(): a streaming job may finish in another task's context
+            _holding_slot.set(False)
+            self._release()
+    
+    @contextmanager
+    def slot_sync(self, lane: str = 'batch'):
+        """Blocking variant of ``slot`` for synchronous callers."""
+        if _holding_slot.get():
+            yield
+            return
+        
+        user = _current_user.get()
+        started = time.monotonic()
+        future = self._request(lane, user)
+        try:
+            future.result(timeout=self.queue_timeouts[lane])
+        except FutureTimeoutError:
+            future.cancel()
+            raise self._shed(lane, user, future) from None
+        self._admitted(lane, started)
+        
+        _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            _holding_slot.set(False)
+            self._release()
+    
+    async def run(self, job: Callable[[], Awaitable[Any]], lane: str = 'batch') -> Any:
+        """Run ``job()`` as a single AI job; it is only called once a slot is held."""
+        async with self.slot(lane):
+            return await job()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'running': self._running,
+                'lanes': {
+                    lane: {
+                        'queue_depth': self._depth(lane),
+                        'waiting_users': len(self._waiting[lane]),
+                        'admitted': stats['admitted'],
+                        'queued': stats['queued'],
+                        'timed_out': stats['timed_out'],
+                        'max_depth': stats['max_depth'],
+                        'avg_wait_ms': round(stats['total_wait_seconds'] * 1000 / stats['admitted'], 1)
+                        if stats['admitted'] else 0.0,
+                        'max_wait_ms': round(stats['max_wait_seconds'] * 1000, 1)
+                    }
+                    for lane, stats in self._stats.items()
+                }
+            }
+
+
+# Global AI job scheduler (one per worker process)
+_ai_scheduler = None
+_ai_scheduler_lock = threading.Lock()
+
+
+def get_ai_scheduler() -> AIJobScheduler:
+    """Get the process-wide AI job scheduler."""
+    global _ai_scheduler
+    if _ai_scheduler is None:
+        with _ai_scheduler_lock:
+            if _ai_scheduler is None:
+                _ai_scheduler = AIJobScheduler()
+    return _ai_scheduler
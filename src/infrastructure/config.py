@@ -3,7 +3,7 @@ Secure configuration management.
 """
 import os
 from typing import Optional, Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from ..core.interfaces import ConfigurationService
 from ..core.exceptions import ConfigurationError
 from ..core.models import ServiceResult
@@ -23,11 +23,20 @@ class DatabaseConfig:
         return f"postgresql://{self.username}:{self.password}@{self.host}:{self.port}/{self.database}"
 
 
+# Requests per minute for providers with published usage policies
+DEFAULT_PROVIDER_RATE_LIMITS = {
+    'nominatim': 60,     # Max 1 request per second
+    'opentripmap': 600,  # Free tier: 10 requests per second
+}
+
+
 @dataclass
 class APIConfig:
     timeout: int = 30
     max_retries: int = 3
-    rate_limit_per_minute: int = 60
+    rate_limit_per_minute: int = 60  # Default for providers without an override
+    provider_rate_limits: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_PROVIDER_RATE_LIMITS))
+    rate_limit_shared: bool = False  # Coordinate limits across workers through SQLite
 
 
 class SecureConfigurationService(ConfigurationService):
@@ -80,10 +89,18 @@ class SecureConfigurationService(ConfigurationService):
     def get_api_config(self) -> APIConfig:
         """Get API configuration."""
         try:
+            # Per-provider overrides, e.g. API_RATE_LIMIT_NOMINATIM=50
+            provider_rate_limits = dict(DEFAULT_PROVIDER_RATE_LIMITS)
+            for name, value in os.environ.items():
+                if name.startswith('API_RATE_LIMIT_') and name != 'API_RATE_LIMIT_SHARED':
+                    provider_rate_limits[name[len('API_RATE_LIMIT_'):].lower()] = int(value)
+            
             return APIConfig(
                 timeout=int(os.getenv('API_TIMEOUT', 30)),
                 max_retries=int(os.getenv('API_MAX_RETRIES', 3)),
-                rate_limit_per_minute=int(os.getenv('API_RATE_LIMIT', 60))
+                rate_limit_per_minute=int(os.getenv('API_RATE_LIMIT', 60)),
+                provider_rate_limits=provider_rate_limits,
+                rate_limit_shared=os.getenv('API_RATE_LIMIT_SHARED', 'false').lower() == 'true'
             )
         except (ValueError, TypeError) as e:
             raise ConfigurationError(f"Invalid API configuration: {e}")
@@ -0,0 +1,245 @@
+"""
+Shared HTTP client layer for external API services.
+
+Every service gets its aiohttp session from here instead of creating its
+own. There is one pooled session per event loop with per-host connection
+limits, keep-alive and a DNS cache, so repeated calls to the same API reuse
+TLS connections instead of handshaking each time.
+
+Synchronous code (Flask views, planners) should call ``run_sync`` rather
+than ``asyncio.run``: it runs the coroutine on a long-lived event loop owned
+by the calling thread, so that thread's session and its open connections
+survive from one request to the next.
+"""
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Dict, Iterator, Optional
+
+import aiohttp
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass
+class HttpClientConfig:
+    """Connection pool and timeout settings."""
+    limit: int = 100                # Total simultaneous connections per loop
+    limit_per_host: int = 10        # Simultaneous connections per host
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+    total_timeout: float = 30.0
+    connect_timeout: float = 10.0
+    user_agent: str = 'TripPlanner/1.0'
+    
+    @classmethod
+    def from_env(cls) -> 'HttpClientConfig':
+        return cls(
+            limit=int(os.getenv('HTTP_POOL_LIMIT', cls.limit)),
+            limit_per_host=int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', cls.limit_per_host)),
+            keepalive_timeout=float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', cls.keepalive_timeout)),
+            dns_cache_ttl=int(os.getenv('HTTP_DNS_CACHE_TTL', cls.dns_cache_ttl)),
+            total_timeout=float(os.getenv('HTTP_TIMEOUT', cls.total_timeout)),
+            connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', cls.connect_timeout))
+        )
+
+
+class HttpClient:
+    """Pooled aiohttp sessions, one per event loop."""
+    
+    def __init__(self, config: Optional[HttpClientConfig] = None):
+        self.config = config or HttpClientConfig.from_env()
+        self._sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]' = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.stats = {'sessions_created': 0}
+    
+    def session(self) -> aiohttp.ClientSession:
+        """Session for the running event loop. Must be called from a coroutine."""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self._create_session()
+            with self._lock:
+                self._prune_closed_loops()
+                self._sessions[loop] = session
+        return session
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.config.limit,
+            limit_per_host=self.config.limit_per_host,
+            keepalive_timeout=self.config.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.config.dns_cache_ttl
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.config.total_timeout,
+            connect=self.config.connect_timeout
+        )
+        self.stats['sessions_created'] += 1
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={'User-Agent': self.config.user_agent}
+        )
+    
+    def _prune_closed_loops(self):
+        """Drop sessions whose loop was closed without closing them (e.g. ``asyncio.run``)."""
+        for loop, session in list(self._sessions.items()):
+            if loop.is_closed():
+                session.detach()
+                del self._sessions[loop]
+    
+    async def close(self):
+        """Close the session of the running loop."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+    
+    def close_all(self):
+        """Close every session whose loop is idle. Called at interpreter exit."""
+        for loop, session in list(self._sessions.items()):
+            if session.closed or loop.is_closed() or loop.is_running():
+                continue
+            try:
+                loop.run_until_complete(session.close())
+            except Exception as e:
+                logger.warning("Failed to close HTTP session", error=str(e))
+        self._sessions.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'sessions_created': self.stats['sessions_created'],
+            'open_sessions': sum(1 for session in self._sessions.values() if not session.closed),
+            'limit': self.config.limit,
+            'limit_per_host': self.config.limit_per_host
+        }
+
+
+# Long-lived event loop per thread for synchronous callers
+_thread_state = threading.local()
+_thread_loops = []
+_thread_loops_lock = threading.Lock()
+
+
+def _thread_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_thread_state, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_state.loop = loop
+        with _thread_loops_lock:
+            _thread_loops.append(loop)
+    return loop
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine to completion from synchronous code on this thread's worker loop.
+    
+    ``timeout`` cancels the coroutine itself, not just the wait. Async code
+    should ``await`` instead: when a loop is already running on this thread
+    the coroutine runs on a fresh helper thread and loop, and the calling
+    loop is blocked until it finishes.
+    """
+    if timeout is not None:
+        coro = asyncio.wait_for(coro, timeout)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _thread_loop().run_until_complete(coro)
+    
+    logger.debug("run_sync called inside a running loop, using a helper thread")
+    return _run_on_helper_thread(coro)
+
+
+def _run_on_helper_thread(coro: Awaitable) -> Any:
+    """
+    Run a coroutine on a new thread with its own short-lived loop.
+    
+    Each nested call gets its own thread, so nested sync-over-async calls
+    cannot exhaust a pool and deadlock.
+    """
+    outcome: Dict[str, Any] = {}
+    
+    async def run_and_close_session():
+        try:
+            return await coro
+        finally:
+            if _http_client is not None:
+                await _http_client.close()
+    
+    def run():
+        loop = asyncio.new_event_loop()
+        try:
+            outcome['result'] = loop.run_until_complete(run_and_close_session())
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            loop.close()
+    
+    thread = threading.Thread(target=run, name='http-sync-nested', daemon=True)
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def iter_sync(iterable: AsyncIterable) -> Iterator[Any]:
+    """
+    Iterate an async iterable from synchronous code (e.g. a streaming Flask response).
+    
+    Every step runs on this thread's worker loop, so connections opened by
+    the iterator stay on one loop for its whole lifetime.
+    """
+    iterator = iterable.__aiter__()
+    finished = False
+    try:
+        while True:
+            try:
+                yield run_sync(iterator.__anext__())
+            except StopAsyncIteration:
+                finished = True
+                return
+    finally:
+        # Abandoned early (e.g. client disconnected): let the iterator release what it holds
+        if not finished and hasattr(iterator, 'aclose'):
+            run_sync(iterator.aclose())
+
+
+def _shutdown():
+    if _http_client is not None:
+        _http_client.close_all()
+    with _thread_loops_lock:
+        for loop in _thread_loops:
+            if not loop.is_running() and not loop.is_closed():
+                loop.close()
+        _thread_loops.clear()
+
+
+atexit.register(_shutdown)
+
+
+# Global HTTP client instance (one per worker process)
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Get the process-wide HTTP client."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HttpClient()
+    return _http_client
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Pooled session for the running event loop."""
+    return get_http_client().session()
@@ -0,0 +1,188 @@
+"""
+Token-bucket rate limiting per external provider.
+
+Each provider gets a bucket refilled at its configured requests per minute,
+with a burst of one second's worth of requests. Callers reserve a token and
+then sleep only for as long as their reservation requires, so concurrent
+tasks in a worker share the quota instead of each sleeping a fixed delay.
+
+With ``API_RATE_LIMIT_SHARED=true`` the bucket state lives in SQLite
+(``RATE_LIMIT_DB_PATH``, default data/rate_limits.db), so all workers on the
+host draw from the same quota.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import structlog
+
+from .config import APIConfig, SecureConfigurationService
+
+logger = structlog.get_logger(__name__)
+
+# Kept out of the tracked application database
+DEFAULT_SHARED_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'rate_limits.db')
+
+
+class TokenBucket:
+    """In-process token bucket that hands out reservations."""
+    
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens now and return how long the caller must wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+class SQLiteTokenBucket:
+    """Token bucket whose state is shared by every worker through SQLite."""
+    
+    def __init__(self, provider: str, rate_per_minute: float, db_path: str,
+                 burst: Optional[float] = None):
+        self.provider = provider
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self.db_path = db_path
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    provider TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+    
+    def reserve(self, tokens: float = 1.0) -> float:
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE provider = ?',
+                (self.provider,)
+            ).fetchone()
+            now = time.time()
+            available = self.capacity if row is None else min(
+                self.capacity, row[0] + max(0.0, now - row[1]) * self.rate
+            )
+            available -= tokens
+            conn.execute('''
+                INSERT INTO rate_limit_buckets (provider, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(provider) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+            ''', (self.provider, available, now))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return max(0.0, -available / self.rate)
+
+
+class RateLimiter:
+    """Per-provider token buckets shared by every task in the worker."""
+    
+    def __init__(self, api_config: Optional[APIConfig] = None, shared_db_path: Optional[str] = None):
+        self.api_config = api_config or SecureConfigurationService().get_api_config()
+        if shared_db_path is None and self.api_config.rate_limit_shared:
+            shared_db_path = os.getenv('RATE_LIMIT_DB_PATH', DEFAULT_SHARED_DB_PATH)
+        self.shared_db_path = shared_db_path
+        
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Any] = {}
+        self._local_fallbacks: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+    
+    def rate_for(self, provider: str) -> int:
+        return self.api_config.provider_rate_limits.get(provider, self.api_config.rate_limit_per_minute)
+    
+    def _bucket(self, provider: str):
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(provider)
+                if bucket is None:
+                    rate = self.rate_for(provider)
+                    if self.shared_db_path:
+                        bucket = SQLiteTokenBucket(provider, rate, self.shared_db_path)
+                    else:
+                        bucket = TokenBucket(rate)
+                    self._buckets[provider] = bucket
+                    self._stats[provider] = {
+                        'requests': 0, 'delayed': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0
+                    }
+        return bucket
+    
+    def reserve(self, provider: str, tokens: float = 1.0) -> float:
+        """Reserve tokens for a provider and return the required wait in seconds."""
+        bucket = self._bucket(provider)
+        try:
+            delay = bucket.reserve(tokens)
+        except sqlite3.Error as e:
+            # Shared state unavailable (locked or read-only): limit this worker on its own
+            logger.warning("Shared rate limit unavailable, using local bucket", provider=provider, error=str(e))
+            with self._lock:
+                fallback = self._local_fallbacks.setdefault(provider, TokenBucket(self.rate_for(provider)))
+            delay = fallback.reserve(tokens)
+        
+        with self._lock:
+            stats = self._stats[provider]
+            stats['requests'] += 1
+            if delay > 0:
+                stats['delayed'] += 1
+                stats['total_wait_seconds'] += delay
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'], delay)
+        return delay
+    
+    async def acquire(self, provider: str, tokens: float = 1.0) -> float:
+        """Wait until the provider's quota allows another request."""
+        if self.shared_db_path:
+            # The shared bucket takes a SQLite write lock; keep that off the event loop
+            delay = await asyncio.to_thread(self.reserve, provider, tokens)
+        else:
+            delay = self.reserve(provider, tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                provider: {
+                    'rate_per_minute': self.rate_for(provider),
+                    'requests': int(stats['requests']),
+                    'delayed': int(stats['delayed']),
+                    'avg_wait_ms': round(stats['total_wait_seconds'] * 1000 / stats['requests'], 1)
+                    if stats['requests'] else 0.0,
+                    'max_wait_ms': round(stats['max_wait_seconds'] * 1000, 1),
+                    'shared': self.shared_db_path is not None
+                }
+                for provider, stats in self._stats.items()
+            }
+
+
+# Global rate limiter instance (one per worker process)
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the process-wide rate limiter."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+    return _rate_limiter
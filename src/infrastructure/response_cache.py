@@ -0,0 +1,309 @@
+"""
+Persistent HTTP response cache for external API GET requests.
+
+Sits under the shared HTTP client: services call ``cached_get`` where they
+used ``get_http_session().get`` and receive a response with the same
+``status`` / ``json()`` / ``text()`` interface.
+
+- Each endpoint has a cache policy (fresh TTL plus a stale window) chosen by
+  host and path prefix.
+- Within the stale window the cached body is returned immediately and the
+  entry is refreshed on a background loop, so requests never wait on a refresh.
+- Refreshes send If-None-Match / If-Modified-Since when upstream gave an
+  ETag or Last-Modified, and a 304 only extends the entry.
+- Entries live in SQLite (``HTTP_CACHE_PATH``, default data/http_cache.db)
+  and survive restarts. Lookups and writes run in worker threads, so the
+  event loop never waits on disk.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import structlog
+
+from .http_client import get_http_session
+from .rate_limiter import get_rate_limiter
+
+logger = structlog.get_logger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'http_cache.db')
+MAX_BODY_BYTES = 2 * 1024 * 1024
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+@dataclass
+class CachePolicy:
+    """How long a response is fresh, and how long after that it may still be served."""
+    ttl_seconds: int
+    stale_seconds: int = 0
+
+
+# (host, path prefix, policy) - first match wins
+DEFAULT_CACHE_POLICIES: List[Tuple[str, str, CachePolicy]] = [
+    ('api.openweathermap.org', '', CachePolicy(30 * 60, 30 * 60)),
+    ('api.opentripmap.com', '/0.1/en/places/geoname', CachePolicy(30 * DAY, 30 * DAY)),
+    ('api.opentripmap.com', '', CachePolicy(3 * DAY, 4 * DAY)),
+    ('nominatim.openstreetmap.org', '', CachePolicy(30 * DAY, 30 * DAY)),
+    ('api.geonames.org', '', CachePolicy(30 * DAY, 30 * DAY)),
+    ('www.wikidata.org', '', CachePolicy(7 * DAY, 7 * DAY)),
+    ('whc.unesco.org', '', CachePolicy(7 * DAY, 7 * DAY)),
+    ('places-api.foursquare.com', '', CachePolicy(DAY, 2 * DAY)),
+    ('www.eventbriteapi.com', '', CachePolicy(HOUR, HOUR)),
+    ('test.api.amadeus.com', '/v1/reference-data/locations/hotels', CachePolicy(DAY, 6 * DAY)),
+    ('test.api.amadeus.com', '/v3/shopping/hotel-offers', CachePolicy(15 * 60, 15 * 60)),
+]
+
+
+@dataclass
+class CachedResponse:
+    """Response body with the subset of the aiohttp response interface services use."""
+    status: int
+    body: str
+    from_cache: bool = False
+    
+    async def json(self) -> Any:
+        return json.loads(self.body)
+    
+    async def text(self) -> str:
+        return self.body
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    query = sorted((str(key), str(value)) for key, value in (params or {}).items())
+    return hashlib.sha256(json.dumps([url, query]).encode()).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with stale-while-revalidate."""
+    
+    def __init__(self, path: str = None, policies: List[Tuple[str, str, CachePolicy]] = None):
+        self.path = path or os.getenv('HTTP_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.policies = policies if policies is not None else DEFAULT_CACHE_POLICIES
+        self.enabled = os.getenv('HTTP_CACHE_ENABLED', 'true').lower() == 'true'
+        
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'not_modified': 0, 'refreshes': 0, 'errors': 0}
+        self._init_db()
+    
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with sqlite3.connect(self.path, timeout=10) as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS http_response_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        host TEXT NOT NULL,
+                        status INTEGER NOT NULL,
+                        body TEXT NOT NULL,
+                        etag TEXT,
+                        last_modified TEXT,
+                        fetched_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_expires ON http_response_cache(expires_at)')
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error("HTTP response cache unavailable", path=self.path, error=str(e))
+            self.enabled = False
+    
+    def policy_for(self, url: str) -> Optional[CachePolicy]:
+        parts = urlsplit(url)
+        for host, path_prefix, policy in self.policies:
+            if parts.hostname == host and parts.path.startswith(path_prefix):
+                return policy
+        return None
+    
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None, provider: Optional[str] = None,
+                  policy: Optional[CachePolicy] = None) -> CachedResponse:
+        """GET through the cache. ``provider`` names the rate-limit bucket for network fetches."""
+        policy = policy or self.policy_for(url)
+        if not self.enabled or policy is None:
+            return await self._fetch(url, params, headers, provider)
+        
+        key = request_key(url, params)
+        entry = await asyncio.to_thread(self._load, key)
+        now = time.time()
+        if entry is not None:
+            if now < entry['expires_at']:
+                self.stats['hits'] += 1
+                return CachedResponse(entry['status'], entry['body'], from_cache=True)
+            if now < entry['expires_at'] + policy.stale_seconds:
+                self.stats['stale_hits'] += 1
+                self._schedule_refresh(key, url, params, headers, provider, policy, entry)
+                return CachedResponse(entry['status'], entry['body'], from_cache=True)
+        
+        self.stats['misses'] += 1
+        try:
+            response = await self._revalidate(key, url, params, headers, provider, policy, entry)
+        except Exception as e:
+            if entry is None:
+                raise
+            error = str(e)
+        else:
+            if entry is None or response.from_cache or 200 <= response.status < 300:
+                return response
+            error = f"HTTP {response.status}"
+        
+        # Upstream is failing (raised, throttled or erroring); an expired answer beats none
+        logger.warning("Serving expired response after fetch error", host=urlsplit(url).hostname, error=error)
+        self.stats['errors'] += 1
+        return CachedResponse(entry['status'], entry['body'], from_cache=True)
+    
+    async def _fetch(self, url, params, headers, provider) -> CachedResponse:
+        if provider:
+            await get_rate_limiter().acquire(provider)
+        async with get_http_session().get(url, params=params, headers=headers) as response:
+            return CachedResponse(response.status, await response.text())
+    
+    async def _revalidate(self, key, url, params, headers, provider, policy, entry) -> CachedResponse:
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        
+        if provider:
+            await get_rate_limiter().acquire(provider)
+        async with get_http_session().get(url, params=params, headers=request_headers) as response:
+            if response.status == 304 and entry is not None:
+                self.stats['not_modified'] += 1
+                await asyncio.to_thread(self._touch, key, policy)
+                return CachedResponse(entry['status'], entry['body'], from_cache=True)
+            
+            body = await response.text()
+            if response.status == 200 and len(body) <= MAX_BODY_BYTES:
+                await asyncio.to_thread(self._store, key, url, response.status, body,
+                                        response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                        policy)
+            return CachedResponse(response.status, body)
+    
+    def _schedule_refresh(self, key, url, params, headers, provider, policy, entry):
+        """Refresh a stale entry on the background loop unless a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        async def refresh():
+            try:
+                await self._revalidate(key, url, params, headers, provider, policy, entry)
+                self.stats['refreshes'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning("Background refresh failed", host=urlsplit(url).hostname, error=str(e))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        asyncio.run_coroutine_threadsafe(refresh(), self._background_loop())
+    
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._refresh_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='http-cache-refresh', daemon=True).start()
+                self._refresh_loop = loop
+            return self._refresh_loop
+    
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with sqlite3.connect(self.path, timeout=5) as conn:
+                conn.row_factory = sqlite3.Row
+                row = conn.execute('SELECT * FROM http_response_cache WHERE cache_key = ?', (key,)).fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.warning("HTTP cache read failed", error=str(e))
+            return None
+    
+    def _store(self, key, url, status, body, etag, last_modified, policy: CachePolicy):
+        now = time.time()
+        try:
+            with sqlite3.connect(self.path, timeout=5) as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO http_response_cache
+                    (cache_key, host, status, body, etag, last_modified, fetched_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (key, urlsplit(url).hostname or '', status, body, etag, last_modified,
+                      now, now + policy.ttl_seconds))
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("HTTP cache write failed", error=str(e))
+    
+    def _touch(self, key: str, policy: CachePolicy):
+        now = time.time()
+        try:
+            with sqlite3.connect(self.path, timeout=5) as conn:
+                conn.execute('UPDATE http_response_cache SET fetched_at = ?, expires_at = ? WHERE cache_key = ?',
+                             (now, now + policy.ttl_seconds, key))
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("HTTP cache write failed", error=str(e))
+    
+    def purge_expired(self, older_than_seconds: float = 30 * DAY) -> int:
+        """Delete entries that expired more than ``older_than_seconds`` ago."""
+        try:
+            with sqlite3.connect(self.path, timeout=10) as conn:
+                cursor = conn.execute('DELETE FROM http_response_cache WHERE expires_at < ?',
+                                      (time.time() - older_than_seconds,))
+                conn.commit()
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning("HTTP cache purge failed", error=str(e))
+            return 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['stale_hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': round((self.stats['hits'] + self.stats['stale_hits']) / lookups, 3) if lookups else 0.0,
+            'enabled': self.enabled
+        }
+
+
+class _CachedGet:
+    """Async context manager so ``cached_get`` drops in for ``session.get``."""
+    
+    def __init__(self, url, params, headers, provider, policy):
+        self._args = (url, params, headers, provider, policy)
+    
+    async def __aenter__(self) -> CachedResponse:
+        return await get_response_cache().get(*self._args)
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+def cached_get(url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+               provider: Optional[str] = None, policy: Optional[CachePolicy] = None) -> _CachedGet:
+    """Cached GET: ``async with cached_get(url, params=...) as response:``."""
+    return _CachedGet(url, params, headers, provider, policy)
+
+
+# Global response cache instance
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide HTTP response cache."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache
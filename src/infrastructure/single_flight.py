@@ -0,0 +1,182 @@
+"""
+Single-flight coalescing of identical in-flight external calls.
+
+When several requests ask a provider for the same thing at the same time,
+only the first one (the leader) performs the call; the others wait for the
+leader's result. The in-flight table is process-wide and the shared result is
+a thread-safe future, so callers on different event loops coalesce too.
+
+Shared calls run on a dedicated background loop rather than the leader's own
+loop, which may stop or close as soon as the leader gives up (``run_sync``).
+A caller that times out only stops waiting; the call is cancelled once no
+caller is waiting for it.
+
+Service methods opt in with the ``coalesce`` decorator:
+    
+    @coalesce('opentripmap')
+    async def get_city_attractions(self, coordinates, radius_km=10, ...):
+        ...
+
+The key is the provider, the method name and its normalized arguments, so
+coalescing happens before anything reaches the HTTP layer.
+"""
+import asyncio
+import copy
+import functools
+import inspect
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_argument(value: Any) -> Hashable:
+    """Hashable, order-independent form of a call argument."""
+    if isinstance(value, float):
+        return round(value, 5)
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), normalize_argument(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_argument(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize_argument(item) for item in value))
+    if is_dataclass(value):
+        return (type(value).__name__,) + tuple(normalize_argument(getattr(value, f.name)) for f in fields(value))
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    return repr(value)
+
+
+@dataclass
+class _Flight:
+    """One in-flight call and the callers waiting on it."""
+    future: Future = field(default_factory=Future)
+    task: Optional[Future] = None
+    waiters: int = 0
+    followers: int = 0
+
+
+class SingleFlight:
+    """Process-wide table of in-flight calls keyed by (provider, normalized request)."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple, _Flight] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+    
+    async def do(self, provider: str, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``call`` unless an identical call is in flight, in which case share its result."""
+        flight_key = (provider, key)
+        loop = self._background_loop()
+        with self._lock:
+            stats = self._stats.setdefault(provider, {'calls': 0, 'executed': 0, 'deduplicated': 0})
+            stats['calls'] += 1
+            flight = self._inflight.get(flight_key)
+            if flight is None:
+                flight = _Flight()
+                flight.task = asyncio.run_coroutine_threadsafe(self._run(flight_key, flight, call), loop)
+                self._inflight[flight_key] = flight
+                stats['executed'] += 1
+            else:
+                flight.followers += 1
+                stats['deduplicated'] += 1
+            flight.waiters += 1
+        
+        try:
+            result = await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                self._abandon(flight_key, flight)
+            raise
+        
+        # Results are shared, so each caller gets its own copy to mutate
+        return copy.deepcopy(result) if flight.followers else result
+    
+    async def _run(self, flight_key: Tuple, flight: _Flight, call: Callable[[], Awaitable[Any]]):
+        """Perform the call and resolve the shared future for every waiting caller."""
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            self._finish(flight_key, flight)
+            flight.future.cancel()
+            raise
+        except Exception as e:
+            self._finish(flight_key, flight)
+            flight.future.set_exception(e)
+            return
+        
+        self._finish(flight_key, flight)
+        flight.future.set_result(result)
+    
+    def _finish(self, flight_key: Tuple, flight: _Flight):
+        with self._lock:
+            if self._inflight.get(flight_key) is flight:
+                del self._inflight[flight_key]
+    
+    def _abandon(self, flight_key: Tuple, flight: _Flight):
+        """Stop waiting on a flight, cancelling the call once nobody is waiting any more."""
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters or flight.future.done():
+                return
+            if self._inflight.get(flight_key) is flight:
+                del self._inflight[flight_key]
+        flight.task.cancel()
+    
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='single-flight', daemon=True).start()
+                self._loop = loop
+            return self._loop
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                provider: {
+                    **stats,
+                    'in_flight': sum(1 for key in self._inflight if key[0] == provider),
+                    'dedup_rate': round(stats['deduplicated'] / stats['calls'], 3) if stats['calls'] else 0.0
+                }
+                for provider, stats in self._stats.items()
+            }
+
+
+def coalesce(provider: str):
+    """Decorate an async service method so identical concurrent calls share one execution."""
+    def decorator(method: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(method)
+        
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = (method.__qualname__,) + tuple(
+                (name, normalize_argument(value))
+                for name, value in bound.arguments.items() if name != 'self'
+            )
+            return await get_single_flight().do(provider, key, lambda: method(self, *args, **kwargs))
+        
+        return wrapper
+    
+    return decorator
+
+
+# Global single-flight table (one per worker process)
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get the process-wide single-flight table."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -4,11 +4,14 @@ Provides real hotel data from Amadeus's global hotel inventory.
 """
 import os
 import asyncio
-import aiohttp
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import structlog
 from ..core.models import Coordinates
+from ..infrastructure.http_client import get_http_session
+from ..infrastructure.rate_limiter import get_rate_limiter
+from ..infrastructure.response_cache import cached_get
+from ..infrastructure.single_flight import coalesce
 
 logger = structlog.get_logger(__name__)
 
@@ -27,25 +30,21 @@ class AmadeusHotelService:
         # Token management
         self.access_token = None
         self.token_expires_at = None
-        self.session = None
         
         if not self.client_id or not self.client_secret:
             logger.warning("Amadeus API credentials not configured - using fallback data")
     
     async def __aenter__(self):
         """Async context manager entry"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        return False
     
+    @coalesce('amadeus')
     async def _get_access_token(self) -> bool:
-        """Get or refresh access token."""
+        """Get or refresh access token. Concurrent refreshes share one request."""
         # Check if current token is still valid
         if (self.access_token and self.token_expires_at and 
             datetime.now() < self.token_expires_at - timedelta(minutes=5)):  # 5 min buffer
@@ -55,9 +54,6 @@ class AmadeusHotelService:
             return False
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             data = {
                 'grant_type': 'client_credentials',
                 'client_id': self.client_id,
@@ -68,7 +64,8 @@ class AmadeusHotelService:
                 'Content-Type': 'application/x-www-form-urlencoded'
             }
             
-            async with self.session.post(self.auth_url, data=data, headers=headers) as response:
+            await get_rate_limiter().acquire('amadeus')
+            async with get_http_session().post(self.auth_url, data=data, headers=headers) as response:
                 if response.status == 200:
                     result = await response.json()
                     self.access_token = result['access_token']
@@ -97,6 +94,7 @@ class AmadeusHotelService:
             'Accept': 'application/json'
         }
     
+    @coalesce('amadeus')
     async def get_hotels_by_city(self, city_code: str, radius: int = 5) -> List[Dict]:
         """Get list of hotels in a city using IATA city code."""
         headers = await self._get_api_headers()
@@ -112,7 +110,7 @@ class AmadeusHotelService:
                 'hotelSource': 'ALL'
             }
             
-            async with self.session.get(url, headers=headers, params=params) as response:
+            async with cached_get(url, headers=headers, params=params, provider='amadeus') as response:
                 if response.status == 200:
                     result = await response.json()
                     hotels_data = result.get('data', [])
@@ -153,6 +151,7 @@ class AmadeusHotelService:
             logger.error(f"Hotel list error for {city_code}: {e}")
             return self._get_fallback_hotels(city_code, 10)
     
+    @coalesce('amadeus')
     async def get_hotels_by_coordinates(self, coordinates: Coordinates, radius: int = 5) -> List[Dict]:
         """Get list of hotels near coordinates."""
         headers = await self._get_api_headers()
@@ -169,7 +168,7 @@ class AmadeusHotelService:
                 'hotelSource': 'ALL'
             }
             
-            async with self.session.get(url, headers=headers, params=params) as response:
+            async with cached_get(url, headers=headers, params=params, provider='amadeus') as response:
                 if response.status == 200:
                     result = await response.json()
                     hotels_data = result.get('data', [])
@@ -210,6 +209,7 @@ class AmadeusHotelService:
             logger.error(f"Hotel geocode search error: {e}")
             return self._get_fallback_hotels("Unknown", 10)
     
+    @coalesce('amadeus')
     async def search_hotel_offers(self, hotel_ids: List[str], check_in_date: str, 
                                 check_out_date: str, adults: int = 2, 
                                 room_quantity: int = 1) -> List[Dict]:
@@ -228,7 +228,7 @@ class AmadeusHotelService:
                 'roomQuantity': room_quantity
             }
             
-            async with self.session.get(url, headers=headers, params=params) as response:
+            async with cached_get(url, headers=headers, params=params, provider='amadeus') as response:
                 if response.status == 200:
                     result = await response.json()
                     offers_data = result.get('data', [])
@@ -4,11 +4,11 @@ Alternative: RapidAPI Booking.com or Hotels.com APIs
 """
 import os
 import asyncio
-import aiohttp
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import structlog
 from ..core.models import Coordinates
+from ..infrastructure.http_client import get_http_session
 
 logger = structlog.get_logger(__name__)
 
@@ -20,7 +20,6 @@ class BookingService:
         # Using RapidAPI's Booking.com endpoint (correct subscribed endpoint)
         self.api_key = os.getenv('RAPIDAPI_KEY')  # RapidAPI key for Booking.com
         self.base_url = "https://booking-com15.p.rapidapi.com/api/v1"
-        self.session = None
         
         if not self.api_key:
             logger.warning("Booking API key not configured - using fallback data")
@@ -42,9 +41,6 @@ class BookingService:
             checkout_date = checkout.strftime('%Y-%m-%d')
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             # Use the new API format - we'll try with a generic destination ID
             # For major cities, we can use known destination IDs or search by name
             dest_id = self._get_destination_id_for_city(city_name)
@@ -70,7 +66,7 @@ class BookingService:
                 'X-RapidAPI-Host': 'booking-com15.p.rapidapi.com'
             }
             
-            async with self.session.get(url, params=params, headers=headers) as response:
+            async with get_http_session().get(url, params=params, headers=headers) as response:
                 if response.status == 200:
                     data = await response.json()
                     # Handle the correct response structure: data.data.hotels or data.result.hotels
@@ -211,6 +207,4 @@ class BookingService:
         return []
     
     async def close(self):
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
\ No newline at end of file
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Persistent cache for the GeoNames bulk European city list.
+
+The list is stored per country in SQLite with a long TTL, and planning
+requests only ever read the in-memory snapshot. The cache is filled by
+``scripts/refresh_bulk_cities.py``, run as the single ``bulk-cities``
+Procfile process; alternatively one worker can run the background refresher
+with BULK_CITY_REFRESH_ENABLED=true. Workers reload the snapshot when another
+process has written a newer version, and a lease row ensures only one
+process refreshes at a time.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from ..infrastructure.http_client import run_sync
+
+logger = structlog.get_logger(__name__)
+
+EUROPEAN_COUNTRIES = [
+    'FR', 'IT', 'ES', 'DE', 'AT', 'CH', 'BE', 'NL', 'PT', 'PL',
+    'CZ', 'HU', 'HR', 'SI', 'SK', 'RO', 'BG', 'GR', 'MT', 'CY'
+]
+
+# Kept out of the tracked application database
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'bulk_cities.db')
+
+
+class BulkCityCache:
+    """SQLite-backed bulk city list with an in-memory snapshot per worker."""
+    
+    def __init__(self, db_path: str = None, ttl_seconds: float = 30 * 24 * 3600,
+                 check_interval_seconds: float = 3600.0,
+                 lease_seconds: float = 600.0,
+                 reload_interval_seconds: float = 30.0,
+                 retry_backoff_seconds: float = 60.0,
+                 refresh_enabled: Optional[bool] = None):
+        if db_path is None:
+            db_path = os.getenv('BULK_CITY_CACHE_PATH', DEFAULT_DB_PATH)
+        if refresh_enabled is None:
+            refresh_enabled = os.getenv('BULK_CITY_REFRESH_ENABLED', 'false').lower() == 'true'
+        
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.lease_seconds = lease_seconds
+        self.reload_interval_seconds = reload_interval_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.refresh_enabled = refresh_enabled
+        
+        self._lock = threading.Lock()
+        self._cities: List[Dict[str, Any]] = []
+        self._version = 0
+        self._last_reload_check = 0.0
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._retry_at = 0.0  # No wake-ups from requests before this time after a failed refresh
+        self._warned_empty = False
+        self._worker_id = uuid.uuid4().hex
+        
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._init_schema()
+        self.reload()
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+    
+    def _init_schema(self):
+        """Create the per-country cache and refresh lease tables."""
+        with self._get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS bulk_city_cache (
+                    country_code TEXT PRIMARY KEY,
+                    cities TEXT NOT NULL, -- JSON array
+                    fetched_at REAL NOT NULL,
+                    version INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS bulk_city_refresh_lease (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    holder TEXT,
+                    expires_at REAL DEFAULT 0
+                )
+            ''')
+            conn.execute('INSERT OR IGNORE INTO bulk_city_refresh_lease (id, holder, expires_at) VALUES (1, NULL, 0)')
+            conn.commit()
+    
+    def get_cities(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Return cached cities in country order. Never performs network I/O.
+        
+        Picks up newer versions written by other workers and nudges the
+        background refresher when the cache is empty, unless a recent
+        refresh failed and is still backing off.
+        """
+        self._reload_if_changed()
+        self.ensure_refresher()
+        if self.refresh_enabled and not self._cities and time.time() >= self._retry_at:
+            self._wake.set()
+        if not self._cities and not self.refresh_enabled and not self._warned_empty:
+            self._warned_empty = True
+            logger.warning("Bulk city cache is empty; run scripts/refresh_bulk_cities.py to fill it",
+                           path=self.db_path)
+        with self._lock:
+            return self._cities[:limit]
+    
+    @property
+    def version(self) -> int:
+        """Version of the newest country currently loaded in this worker."""
+        return self._version
+    
+    def reload(self):
+        """Load every cached country into the in-memory snapshot."""
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute('SELECT country_code, cities, version FROM bulk_city_cache').fetchall()
+            
+            by_country = {row['country_code']: json.loads(row['cities']) for row in rows}
+            cities = [city for code in EUROPEAN_COUNTRIES for city in by_country.get(code, [])]
+            with self._lock:
+                self._cities = cities
+                self._version = max((row['version'] for row in rows), default=0)
+        
+        except Exception as e:
+            logger.error("Failed to load bulk city cache", error=str(e))
+    
+    def _reload_if_changed(self):
+        """Cheap version check so workers see refreshes made elsewhere."""
+        if time.time() - self._last_reload_check < self.reload_interval_seconds:
+            return
+        self._last_reload_check = time.time()
+        try:
+            with self._get_connection() as conn:
+                version = conn.execute('SELECT COALESCE(MAX(version), 0) FROM bulk_city_cache').fetchone()[0]
+            if version != self._version:
+                self.reload()
+        except Exception as e:
+            logger.warning("Bulk city cache version check failed", error=str(e))
+    
+    def store_country(self, country_code: str, cities: List[Dict[str, Any]]):
+        """Persist one country's cities and bump the cache version."""
+        with self._get_connection() as conn:
+            version = conn.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM bulk_city_cache').fetchone()[0]
+            conn.execute('''
+                INSERT INTO bulk_city_cache (country_code, cities, fetched_at, version)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(country_code) DO UPDATE SET
+                    cities = excluded.cities,
+                    fetched_at = excluded.fetched_at,
+                    version = excluded.version
+            ''', (country_code, json.dumps(cities), time.time(), version))
+            conn.commit()
+    
+    def stale_countries(self) -> List[str]:
+        """Countries that are missing or older than the TTL."""
+        with self._get_connection() as conn:
+            fetched = dict(conn.execute('SELECT country_code, fetched_at FROM bulk_city_cache').fetchall())
+        cutoff = time.time() - self.ttl_seconds
+        return [code for code in EUROPEAN_COUNTRIES if fetched.get(code, 0) < cutoff]
+    
+    def _acquire_lease(self) -> bool:
+        """Claim the cross-worker refresh lease if it is free or expired."""
+        now = time.time()
+        with self._get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE bulk_city_refresh_lease SET holder = ?, expires_at = ?
+                WHERE id = 1 AND (expires_at < ? OR holder = ?)
+            ''', (self._worker_id, now + self.lease_seconds, now, self._worker_id))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    def _release_lease(self):
+        with self._get_connection() as conn:
+            conn.execute('''
+                UPDATE bulk_city_refresh_lease SET holder = NULL, expires_at = 0
+                WHERE id = 1 AND holder = ?
+            ''', (self._worker_id,))
+            conn.commit()
+    
+    def refresh_stale(self) -> int:
+        """Fetch stale countries from GeoNames. Runs on the refresher thread only."""
+        stale = self.stale_countries()
+        if not stale or not self._acquire_lease():
+            return 0
+        
+        try:
+            refreshed = run_sync(self._fetch_countries(stale))
+            logger.info("Refreshed bulk city cache", countries=refreshed, requested=len(stale))
+            self.reload()
+            return refreshed
+        finally:
+            self._release_lease()
+    
+    async def _fetch_countries(self, countries: List[str]) -> int:
+        from .enhanced_city_service import EnhancedCityService
+        
+        refreshed = 0
+        async with EnhancedCityService() as service:
+            for country in countries:
+                if self._stop_event.is_set():
+                    break
+                cities = await service.fetch_country_cities(country)
+                if cities:
+                    self.store_country(country, cities)
+                    refreshed += 1
+        return refreshed
+    
+    def ensure_refresher(self):
+        """Start the background refresh thread once per process."""
+        if not self.refresh_enabled or self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._run_refresher, name='bulk-city-refresher', daemon=True
+                )
+                self._refresher.start()
+    
+    def _run_refresher(self):
+        failures = 0
+        while not self._stop_event.is_set():
+            try:
+                stale = len(self.stale_countries())
+                failed = stale > 0 and self.refresh_stale() == 0
+            except Exception as e:
+                logger.error("Bulk city refresh failed", error=str(e))
+                failed = True
+            
+            if failed:
+                # Back off exponentially up to the regular check interval
+                failures += 1
+                delay = min(self.check_interval_seconds, self.retry_backoff_seconds * 2 ** (failures - 1))
+            else:
+                failures = 0
+                delay = self.check_interval_seconds
+            self._retry_at = time.time() + delay
+            
+            self._wake.clear()
+            self._wake.wait(timeout=delay)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = len(self._cities)
+        return {
+            'cities': count,
+            'version': self._version,
+            'stale_countries': len(self.stale_countries()),
+            'checked_at': datetime.now().isoformat()
+        }
+    
+    def close(self):
+        self._stop_event.set()
+        self._wake.set()
+
+
+# Global bulk city cache instance (one per worker process)
+_bulk_city_cache = None
+_bulk_city_cache_lock = threading.Lock()
+
+
+def get_bulk_city_cache() -> BulkCityCache:
+    """Get the process-wide bulk city cache."""
+    global _bulk_city_cache
+    if _bulk_city_cache is None:
+        with _bulk_city_cache_lock:
+            if _bulk_city_cache is None:
+                _bulk_city_cache = BulkCityCache()
+    return _bulk_city_cache
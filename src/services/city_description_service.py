@@ -12,6 +12,8 @@ from dataclasses import dataclass
 import structlog
 
 from ..core.models import City, TripRequest
+from ..infrastructure.ai_scheduler import get_ai_scheduler
+from ..infrastructure.http_client import run_sync
 
 logger = structlog.get_logger(__name__)
 
@@ -207,11 +209,13 @@ Focus on authentic experiences, local culture, and what makes this destination s
             
             client = anthropic.Anthropic(api_key=self.anthropic_api_key)
             
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            async with get_ai_scheduler().slot('batch'):
+                response = await asyncio.to_thread(
+                    client.messages.create,
+                    model="claude-3-5-sonnet-20241022",
+                    max_tokens=1500,
+                    messages=[{"role": "user", "content": prompt}]
+                )
             
             # Parse the JSON response with error handling
             response_text = response.content[0].text
@@ -320,8 +324,8 @@ Focus on authentic experiences, local culture, and what makes this destination s
                 # Return basic city data without async processing
                 return [{'city': city, 'description': None} for city in cities]
             except RuntimeError:
-                # No event loop running, we can use asyncio.run()
-                return asyncio.run(process_cities())
+                # No event loop running, we can use run_sync()
+                return run_sync(process_cities())
         except Exception as e:
             logger.error(f"Failed to enhance cities: {e}")
             # Return basic city data
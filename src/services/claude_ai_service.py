@@ -4,107 +4,302 @@ Claude AI integration for travel assistance, personalization, and intelligent fe
 import os
 import json
 import asyncio
-import aiohttp
-from typing import Dict, List, Optional, Any
+import hashlib
+import re
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Any
 from datetime import datetime
 import structlog
+from ..infrastructure.ai_scheduler import AISchedulerBusy, get_ai_scheduler
+from ..infrastructure.cache import CacheService
+from ..infrastructure.http_client import get_http_session
 
 logger = structlog.get_logger(__name__)
 
+CHAT_UNAVAILABLE_MESSAGE = "I'm sorry, I'm having trouble connecting to my AI assistant right now. Please try again later."
+
+# How long identical prompts reuse a completion, per feature
+RESPONSE_CACHE_TTLS = {
+    'chat': 3600,
+    'preferences': 24 * 3600,
+    'itinerary': 7 * 24 * 3600,
+    'weather_optimization': 3 * 3600,
+    'photo_analysis': 7 * 24 * 3600,
+    'insights': 24 * 3600
+}
+
+# Features a user is actively waiting on; everything else queues in the batch lane
+INTERACTIVE_FEATURES = {'chat', 'photo_analysis'}
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+def _normalize_content(content: Any) -> Any:
+    """Normalize message content, which is a string or a list of content blocks."""
+    if isinstance(content, str):
+        return _normalize_text(content)
+    if isinstance(content, list):
+        return [
+            {**block, 'text': _normalize_text(block['text'])} if block.get('type') == 'text' else block
+            for block in content
+        ]
+    return content
+
+
 class ClaudeAIService:
     """Service for integrating Claude AI into travel planning and assistance."""
     
     def __init__(self):
         self.api_key = os.getenv('ANTHROPIC_API_KEY')
-        self.base_url = "https://api.anthropic.com/v1"
+        # Overridable so a local stub server speaking the Messages API can stand in
+        self.base_url = os.getenv('ANTHROPIC_BASE_URL', "https://api.anthropic.com/v1")
         self.model = "claude-3-5-sonnet-20241022"
-        self.session = None
+        
+        self.response_cache = CacheService(os.getenv('REDIS_URL'))
+        self._usage_lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, float]] = {}
         
         if not self.api_key:
             logger.warning("Anthropic API key not configured - AI features will be limited")
     
+    def _headers(self) -> Dict[str, str]:
+        return {
+            'Content-Type': 'application/json',
+            'x-api-key': self.api_key,
+            'anthropic-version': '2023-06-01'
+        }
+    
+    def _build_payload(self, messages: List[Dict], max_tokens: int, system_prompt: str = None) -> Dict:
+        payload = {
+            'model': self.model,
+            'max_tokens': max_tokens,
+            'messages': messages
+        }
+        if system_prompt:
+            payload['system'] = system_prompt
+        return payload
+    
+    def _cache_key(self, payload: Dict) -> str:
+        """Key on the model, parameters and whitespace/case-normalized prompt."""
+        normalized = {
+            **payload,
+            'system': _normalize_text(payload.get('system', '')),
+            'messages': [
+                {'role': message.get('role'), 'content': _normalize_content(message.get('content'))}
+                for message in payload['messages']
+            ]
+        }
+        digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+        return f"claude:response:{digest}"
+    
+    def _lane(self, feature: str) -> str:
+        return 'interactive' if feature in INTERACTIVE_FEATURES else 'batch'
+    
+    def _cached_response(self, feature: str, payload: Dict) -> Optional[str]:
+        if feature not in RESPONSE_CACHE_TTLS:
+            return None
+        cached = self.response_cache.get(self._cache_key(payload))
+        if cached is not None:
+            self._record_usage(feature, cache_hit=True)
+        return cached
+    
+    def _store_response(self, feature: str, payload: Dict, text: Optional[str]):
+        if text and feature in RESPONSE_CACHE_TTLS:
+            self.response_cache.set(self._cache_key(payload), text, RESPONSE_CACHE_TTLS[feature])
+    
+    def _record_usage(self, feature: str, cache_hit: bool = False, error: bool = False,
+                      usage: Optional[Dict] = None, latency_ms: float = 0.0):
+        with self._usage_lock:
+            stats = self._usage.setdefault(feature, {
+                'requests': 0, 'cache_hits': 0, 'errors': 0,
+                'input_tokens': 0, 'output_tokens': 0, 'total_latency_ms': 0.0, 'api_calls': 0
+            })
+            stats['requests'] += 1
+            if cache_hit:
+                stats['cache_hits'] += 1
+                return
+            stats['api_calls'] += 1
+            stats['total_latency_ms'] += latency_ms
+            if error:
+                stats['errors'] += 1
+            if usage:
+                stats['input_tokens'] += usage.get('input_tokens', 0)
+                stats['output_tokens'] += usage.get('output_tokens', 0)
+    
+    def get_usage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Requests, cache hits, tokens and average API latency per feature."""
+        with self._usage_lock:
+            return {
+                feature: {
+                    **{key: value for key, value in stats.items() if key != 'total_latency_ms'},
+                    'avg_latency_ms': round(stats['total_latency_ms'] / stats['api_calls'], 1)
+                    if stats['api_calls'] else 0.0
+                }
+                for feature, stats in self._usage.items()
+            }
+    
     async def _make_request(self, messages: List[Dict], max_tokens: int = 1000, 
-                           system_prompt: str = None) -> Optional[str]:
+                           system_prompt: str = None, feature: str = 'general') -> Optional[str]:
         """Make a request to Claude API."""
         if not self.api_key:
             return None
         
+        payload = self._build_payload(messages, max_tokens, system_prompt)
+        cached = self._cached_response(feature, payload)
+        if cached is not None:
+            return cached
+        
+        started = time.monotonic()
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'x-api-key': self.api_key,
-                'anthropic-version': '2023-06-01'
-            }
-            
-            payload = {
-                'model': self.model,
-                'max_tokens': max_tokens,
-                'messages': messages
-            }
-            
-            if system_prompt:
-                payload['system'] = system_prompt
-            
-            async with self.session.post(f"{self.base_url}/messages", 
-                                       headers=headers, 
-                                       json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data['content'][0]['text'] if data.get('content') else None
-                else:
-                    logger.error(f"Claude API error: {response.status}")
-                    return None
-                    
+            async with get_ai_scheduler().slot(self._lane(feature)):
+                started = time.monotonic()
+                async with get_http_session().post(f"{self.base_url}/messages", 
+                                           headers=self._headers(), 
+                                           json=payload) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        text = data['content'][0]['text'] if data.get('content') else None
+                        self._record_usage(feature, usage=data.get('usage'),
+                                           latency_ms=(time.monotonic() - started) * 1000)
+                        self._store_response(feature, payload, text)
+                        return text
+                    else:
+                        logger.error(f"Claude API error: {response.status}")
+                        self._record_usage(feature, error=True, latency_ms=(time.monotonic() - started) * 1000)
+                        return None
+        
+        except AISchedulerBusy:
+            self._record_usage(feature, error=True)
+            return None
         except Exception as e:
             logger.error(f"Claude API request failed: {e}")
+            self._record_usage(feature, error=True, latency_ms=(time.monotonic() - started) * 1000)
             return None
     
+    async def stream_request(self, messages: List[Dict], max_tokens: int = 1000,
+                             system_prompt: str = None, feature: str = 'general') -> AsyncIterator[str]:
+        """
+        Stream a completion as text deltas from the Messages API event stream.
+        
+        A cached completion is yielded as a single chunk. Nothing is yielded
+        when the API is unavailable, so callers fall back on an empty stream.
+        """
+        if not self.api_key:
+            return
+        
+        payload = self._build_payload(messages, max_tokens, system_prompt)
+        cached = self._cached_response(feature, payload)
+        if cached is not None:
+            yield cached
+            return
+        
+        started = time.monotonic()
+        usage: Dict[str, int] = {}
+        chunks: List[str] = []
+        try:
+            async with get_ai_scheduler().slot(self._lane(feature)):
+                started = time.monotonic()
+                async with get_http_session().post(f"{self.base_url}/messages",
+                                           headers=self._headers(),
+                                           json={**payload, 'stream': True}) as response:
+                    if response.status != 200:
+                        logger.error(f"Claude API error: {response.status}")
+                        self._record_usage(feature, error=True, latency_ms=(time.monotonic() - started) * 1000)
+                        return
+                    
+                    async for raw_line in response.content:
+                        line = raw_line.decode('utf-8').strip()
+                        if not line.startswith('data:'):
+                            continue
+                        event = json.loads(line[len('data:'):].strip())
+                        event_type = event.get('type')
+                        
+                        if event_type == 'content_block_delta' and event['delta'].get('type') == 'text_delta':
+                            chunks.append(event['delta']['text'])
+                            yield event['delta']['text']
+                        elif event_type == 'message_start':
+                            usage.update(event.get('message', {}).get('usage', {}))
+                        elif event_type == 'message_delta':
+                            usage.update(event.get('usage', {}))
+                        elif event_type == 'error':
+                            raise RuntimeError(event.get('error', {}).get('message', 'stream error'))
+        
+        except AISchedulerBusy:
+            self._record_usage(feature, error=True)
+            return
+        except Exception as e:
+            logger.error(f"Claude API stream failed: {e}")
+            self._record_usage(feature, error=True, latency_ms=(time.monotonic() - started) * 1000)
+            return
+        
+        self._record_usage(feature, usage=usage, latency_ms=(time.monotonic() - started) * 1000)
+        self._store_response(feature, payload, ''.join(chunks))
+    
     def _make_request_sync(self, messages: List[Dict], max_tokens: int = 1000, 
-                          system_prompt: str = None) -> Optional[str]:
+                          system_prompt: str = None, feature: str = 'general') -> Optional[str]:
         """Make a synchronous request to Claude API."""
         if not self.api_key:
             return None
         
+        payload = self._build_payload(messages, max_tokens, system_prompt)
+        cached = self._cached_response(feature, payload)
+        if cached is not None:
+            return cached
+        
+        started = time.monotonic()
         try:
             import requests
             
-            headers = {
-                'Content-Type': 'application/json',
-                'x-api-key': self.api_key,
-                'anthropic-version': '2023-06-01'
-            }
-            
-            payload = {
-                'model': self.model,
-                'max_tokens': max_tokens,
-                'messages': messages
-            }
-            
-            if system_prompt:
-                payload['system'] = system_prompt
-            
-            response = requests.post(f"{self.base_url}/messages", 
-                                   headers=headers, 
-                                   json=payload,
-                                   timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data['content'][0]['text'] if data.get('content') else None
-            else:
-                logger.error(f"Claude API error: {response.status_code}")
-                return None
+            with get_ai_scheduler().slot_sync(self._lane(feature)):
+                started = time.monotonic()
+                response = requests.post(f"{self.base_url}/messages", 
+                                       headers=self._headers(), 
+                                       json=payload,
+                                       timeout=30)
                 
+                if response.status_code == 200:
+                    data = response.json()
+                    text = data['content'][0]['text'] if data.get('content') else None
+                    self._record_usage(feature, usage=data.get('usage'),
+                                       latency_ms=(time.monotonic() - started) * 1000)
+                    self._store_response(feature, payload, text)
+                    return text
+                else:
+                    logger.error(f"Claude API error: {response.status_code}")
+                    self._record_usage(feature, error=True, latency_ms=(time.monotonic() - started) * 1000)
+                    return None
+        
+        except AISchedulerBusy:
+            self._record_usage(feature, error=True)
+            return None
         except Exception as e:
             logger.error(f"Claude API sync request failed: {e}")
+            self._record_usage(feature, error=True, latency_ms=(time.monotonic() - started) * 1000)
             return None
     
     async def travel_chat_assistant(self, user_message: str, chat_history: List[Dict] = None, 
                                   user_context: Dict = None) -> str:
         """AI travel assistant for general travel questions and advice."""
+        system_prompt, messages = self._chat_request(user_message, chat_history)
+        response = await self._make_request(messages, max_tokens=1500, system_prompt=system_prompt, feature='chat')
+        return response or CHAT_UNAVAILABLE_MESSAGE
+    
+    async def stream_chat_assistant(self, user_message: str, chat_history: List[Dict] = None,
+                                    user_context: Dict = None) -> AsyncIterator[str]:
+        """Streaming variant of travel_chat_assistant that yields text as it is generated."""
+        system_prompt, messages = self._chat_request(user_message, chat_history)
+        received = False
+        async for chunk in self.stream_request(messages, max_tokens=1500, system_prompt=system_prompt, feature='chat'):
+            received = True
+            yield chunk
+        if not received:
+            yield CHAT_UNAVAILABLE_MESSAGE
+    
+    def _chat_request(self, user_message: str, chat_history: List[Dict] = None):
+        """System prompt and message list for a chat turn."""
         system_prompt = """You are an expert European travel assistant specializing in road trips and travel planning. 
         You help users plan amazing road trips across Europe, provide travel advice, suggest destinations, 
         and answer questions about European travel, culture, food, and attractions.
@@ -134,8 +329,7 @@ class ClaudeAIService:
             'content': user_message
         })
         
-        response = await self._make_request(messages, max_tokens=1500, system_prompt=system_prompt)
-        return response or "I'm sorry, I'm having trouble connecting to my AI assistant right now. Please try again later."
+        return system_prompt, messages
     
     async def analyze_travel_preferences(self, user_data: Dict) -> Dict:
         """Analyze user travel preferences and suggest personalized recommendations."""
@@ -167,7 +361,7 @@ class ClaudeAIService:
         
         messages = [{'role': 'user', 'content': user_prompt}]
         
-        response = await self._make_request(messages, max_tokens=2000, system_prompt=system_prompt)
+        response = await self._make_request(messages, max_tokens=2000, system_prompt=system_prompt, feature='preferences')
         
         if response:
             try:
@@ -232,7 +426,7 @@ class ClaudeAIService:
         
         messages = [{'role': 'user', 'content': user_prompt}]
         
-        response = await self._make_request(messages, max_tokens=3000, system_prompt=system_prompt)
+        response = await self._make_request(messages, max_tokens=3000, system_prompt=system_prompt, feature='itinerary')
         
         if response:
             try:
@@ -262,7 +456,7 @@ class ClaudeAIService:
         
         messages = [{'role': 'user', 'content': user_prompt}]
         
-        response = await self._make_request(messages, max_tokens=1500, system_prompt=system_prompt)
+        response = await self._make_request(messages, max_tokens=1500, system_prompt=system_prompt, feature='weather_optimization')
         
         return {
             'optimizations': response or "Weather optimization unavailable",
@@ -319,7 +513,7 @@ class ClaudeAIService:
                     }
                 ]
                 
-                response = self._make_request_sync(messages, max_tokens=1500, system_prompt=system_prompt)
+                response = self._make_request_sync(messages, max_tokens=1500, system_prompt=system_prompt, feature='photo_analysis')
                 
                 try:
                     destinations = json.loads(response) if response else []
@@ -359,7 +553,7 @@ class ClaudeAIService:
             messages = [{'role': 'user', 'content': user_prompt}]
             
             try:
-                response = self._make_request_sync(messages, max_tokens=2000, system_prompt=system_prompt)
+                response = self._make_request_sync(messages, max_tokens=2000, system_prompt=system_prompt, feature='photo_analysis')
                 
                 if response:
                     try:
@@ -396,7 +590,7 @@ class ClaudeAIService:
         
         messages = [{'role': 'user', 'content': user_prompt}]
         
-        response = await self._make_request(messages, max_tokens=1500, system_prompt=system_prompt)
+        response = await self._make_request(messages, max_tokens=1500, system_prompt=system_prompt, feature='insights')
         
         return {
             'insights': response or "Your travel journey is unique and amazing!",
@@ -470,9 +664,7 @@ class ClaudeAIService:
         }
     
     async def close(self):
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
 
 # Global service instance
 _claude_service = None
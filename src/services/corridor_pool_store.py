@@ -0,0 +1,233 @@
+"""
+Precomputed intermediate-city candidate pools for popular corridors.
+
+An offline job (scripts/build_corridor_pools.py) gathers, deduplicates and
+corridor-filters the candidates for each popular start/end pair and route
+type, scores the request-independent components, and writes everything to
+one gzipped JSON artifact. The planner reads pools from here and only falls
+back to live candidate gathering on a miss.
+
+Each artifact records fingerprints of the city catalog and the learning data
+it was built from. Pools built from an older catalog are treated as misses,
+and the build job skips the rebuild when neither fingerprint has changed.
+"""
+import dataclasses
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import structlog
+
+from ..core.models import City, Coordinates
+
+logger = structlog.get_logger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+DEFAULT_POOL_PATH = os.path.join(DATA_DIR, 'corridor_pools.json.gz')
+CATALOG_PATH = os.path.join(DATA_DIR, 'comprehensive_european_cities.json')
+LEARNING_DATA_PATH = os.path.join(DATA_DIR, 'learning_data.json')
+POOL_FORMAT_VERSION = 1
+
+_CITY_DEFAULTS = {
+    f.name: f.default for f in dataclasses.fields(City)
+    if f.default is not dataclasses.MISSING
+}
+
+
+@dataclass
+class CorridorPool:
+    """Candidate pool for one start/end pair and route type."""
+    start_city: str
+    end_city: str
+    route_type: str
+    cities: List[City]
+    static_scores: Dict[str, Dict[str, float]] = field(default_factory=dict)  # City name -> component scores
+    built_at: float = 0.0
+
+
+def corridor_key(start_city: str, end_city: str, route_type: str) -> str:
+    return f"{start_city.strip().lower()}|{end_city.strip().lower()}|{route_type}"
+
+
+def _file_fingerprint(path: str) -> str:
+    try:
+        stat = os.stat(path)
+        return f"{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return 'missing'
+
+
+def catalog_fingerprint() -> str:
+    """Fingerprint of the city catalog: the bundled JSON plus the bulk city cache version."""
+    from .bulk_city_cache import get_bulk_city_cache
+    
+    try:
+        bulk_version = get_bulk_city_cache().version
+    except Exception:
+        bulk_version = 0
+    raw = f"{_file_fingerprint(CATALOG_PATH)}|{bulk_version}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def learning_fingerprint() -> str:
+    """Fingerprint of the persisted learning data and the interaction aggregates."""
+    from .interaction_store import aggregates_fingerprint
+    
+    raw = f"{_file_fingerprint(LEARNING_DATA_PATH)}|{aggregates_fingerprint()}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _encode_city(city: City) -> Dict[str, Any]:
+    """Compact form: coordinates as a pair, default-valued fields dropped."""
+    encoded = {'coordinates': [city.coordinates.latitude, city.coordinates.longitude]}
+    for name, value in dataclasses.asdict(city).items():
+        if name == 'coordinates' or value in (None, [], {}) or value == _CITY_DEFAULTS.get(name, object()):
+            continue
+        encoded[name] = value
+    return encoded
+
+
+def _decode_city(data: Dict[str, Any]) -> City:
+    data = dict(data)
+    latitude, longitude = data.pop('coordinates')
+    return City(coordinates=Coordinates(latitude=latitude, longitude=longitude), **data)
+
+
+class CorridorPoolStore:
+    """Read side of the corridor pool artifact, reloaded when the file changes."""
+    
+    def __init__(self, path: str = None, reload_interval_seconds: float = 60.0):
+        self.path = path or os.getenv('CORRIDOR_POOL_PATH', DEFAULT_POOL_PATH)
+        self.reload_interval_seconds = reload_interval_seconds
+        
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict[str, Any]] = {}
+        self._catalog_fingerprint: Optional[str] = None
+        self._learning_fingerprint: Optional[str] = None
+        self._loaded_mtime: Optional[float] = None
+        self._last_reload_check = 0.0
+        self._current_catalog: Optional[str] = None
+        self._catalog_checked_at = 0.0
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0}
+    
+    def get(self, start_city: str, end_city: str, route_type: str) -> Optional[CorridorPool]:
+        """Return the pool for a corridor, or None on a miss or a stale catalog."""
+        self._reload_if_changed()
+        entry = self._pools.get(corridor_key(start_city, end_city, route_type))
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        
+        if self._catalog_fingerprint != self._current_catalog_fingerprint():
+            self.stats['stale'] += 1
+            return None
+        
+        self.stats['hits'] += 1
+        return CorridorPool(
+            start_city=entry['start_city'],
+            end_city=entry['end_city'],
+            route_type=entry['route_type'],
+            cities=[_decode_city(city) for city in entry['cities']],
+            static_scores=entry.get('static_scores', {}),
+            built_at=entry.get('built_at', 0.0)
+        )
+    
+    def _current_catalog_fingerprint(self) -> str:
+        """Catalog fingerprint, recomputed at most once per reload interval."""
+        now = time.time()
+        if self._current_catalog is None or now - self._catalog_checked_at >= self.reload_interval_seconds:
+            self._current_catalog = catalog_fingerprint()
+            self._catalog_checked_at = now
+        return self._current_catalog
+    
+    def is_stale(self) -> bool:
+        """True when the catalog or learning data changed since the artifact was built."""
+        self._reload_if_changed(force=True)
+        return (
+            not self._pools
+            or self._catalog_fingerprint != catalog_fingerprint()
+            or self._learning_fingerprint != learning_fingerprint()
+        )
+    
+    def save(self, pools: Iterable[CorridorPool]):
+        """Write a complete artifact atomically and load it into this store."""
+        payload = {
+            'format_version': POOL_FORMAT_VERSION,
+            'built_at': time.time(),
+            'catalog_fingerprint': catalog_fingerprint(),
+            'learning_fingerprint': learning_fingerprint(),
+            'pools': {
+                corridor_key(pool.start_city, pool.end_city, pool.route_type): {
+                    'start_city': pool.start_city,
+                    'end_city': pool.end_city,
+                    'route_type': pool.route_type,
+                    'built_at': pool.built_at or time.time(),
+                    'cities': [_encode_city(city) for city in pool.cities],
+                    'static_scores': {
+                        name: {key: round(value, 4) for key, value in scores.items()}
+                        for name, scores in pool.static_scores.items()
+                    }
+                }
+                for pool in pools
+            }
+        }
+        
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        
+        logger.info("Saved corridor pools", path=self.path, pools=len(payload['pools']))
+        self._reload_if_changed(force=True)
+    
+    def _reload_if_changed(self, force: bool = False):
+        """Reload the artifact when its mtime changes, at most once per interval."""
+        if not force and time.time() - self._last_reload_check < self.reload_interval_seconds:
+            return
+        self._last_reload_check = time.time()
+        
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                payload = json.load(f)
+            if payload.get('format_version') != POOL_FORMAT_VERSION:
+                logger.warning("Ignoring corridor pools with unknown format",
+                               format_version=payload.get('format_version'))
+                return
+            
+            with self._lock:
+                self._pools = payload.get('pools', {})
+                self._catalog_fingerprint = payload.get('catalog_fingerprint')
+                self._learning_fingerprint = payload.get('learning_fingerprint')
+                self._loaded_mtime = mtime
+            logger.info("Loaded corridor pools", pools=len(self._pools))
+        
+        except Exception as e:
+            logger.error("Failed to load corridor pools", path=self.path, error=str(e))
+
+
+# Global corridor pool store instance
+_corridor_pool_store = None
+_corridor_pool_store_lock = threading.Lock()
+
+
+def get_corridor_pool_store() -> CorridorPoolStore:
+    """Get the process-wide corridor pool store."""
+    global _corridor_pool_store
+    if _corridor_pool_store is None:
+        with _corridor_pool_store_lock:
+            if _corridor_pool_store is None:
+                _corridor_pool_store = CorridorPoolStore()
+    return _corridor_pool_store
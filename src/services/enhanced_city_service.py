@@ -4,7 +4,6 @@ Combines data from GeoNames, OpenStreetMap, Wikidata, UNESCO, and existing APIs.
 """
 import os
 import asyncio
-import aiohttp
 import json
 from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass
@@ -12,6 +11,8 @@ from datetime import datetime
 import structlog
 from ..core.models import City, Coordinates, ServiceResult
 from ..core.exceptions import ExternalServiceError
+from ..infrastructure.response_cache import cached_get
+from .bulk_city_cache import get_bulk_city_cache
 
 logger = structlog.get_logger(__name__)
 
@@ -34,7 +35,9 @@ class EnhancedCityService:
     def __init__(self):
         # No API keys needed for these free services
         self.geonames_username = os.getenv('GEONAMES_USERNAME', 'eurotrip_demo')  # Free registration
-        self.session = None
+        self.headers = {
+            'User-Agent': 'EuroTrip Travel Planner/2.0 (https://eurotrip.com)'
+        }
         self._city_cache: Dict[str, CityEnrichmentData] = {}
         
         # API endpoints
@@ -48,18 +51,10 @@ class EnhancedCityService:
         }
     
     async def __aenter__(self):
-        if not self.session:
-            headers = {
-                'User-Agent': 'EuroTrip Travel Planner/2.0 (https://eurotrip.com)'
-            }
-            timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(headers=headers, timeout=timeout)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
-            self.session = None
+        return False
     
     async def enrich_city_data(self, city_name: str, country_code: str = None) -> CityEnrichmentData:
         """Gather comprehensive city data from multiple free APIs."""
@@ -115,7 +110,7 @@ class EnhancedCityService:
             if country_code:
                 params['country'] = country_code
             
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, headers=self.headers, provider='geonames') as response:
                 if response.status == 200:
                     data = await response.json()
                     geonames = data.get('geonames', [])
@@ -163,10 +158,7 @@ class EnhancedCityService:
             if country_code:
                 params['countrycodes'] = country_code.lower()
             
-            # Add delay to respect rate limits (max 1 request per second)
-            await asyncio.sleep(1.1)
-            
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, headers=self.headers, provider='nominatim') as response:
                 if response.status == 200:
                     data = await response.json()
                     
@@ -214,7 +206,7 @@ class EnhancedCityService:
             
             cultural_sites = []
             
-            async with self.session.get(search_url, params=search_params) as response:
+            async with cached_get(search_url, params=search_params, headers=self.headers, provider='wikidata') as response:
                 if response.status == 200:
                     data = await response.json()
                     entities = data.get('search', [])
@@ -230,7 +222,7 @@ class EnhancedCityService:
                                 'languages': 'en'
                             }
                             
-                            async with self.session.get(search_url, params=detail_params) as detail_response:
+                            async with cached_get(search_url, params=detail_params, headers=self.headers, provider='wikidata') as detail_response:
                                 if detail_response.status == 200:
                                     detail_data = await detail_response.json()
                                     entity_data = detail_data.get('entities', {}).get(entity_id, {})
@@ -263,7 +255,7 @@ class EnhancedCityService:
             
             unesco_sites = []
             
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, headers=self.headers, provider='unesco') as response:
                 if response.status == 200:
                     data = await response.json()
                     sites = data.get('sites', [])
@@ -354,57 +346,53 @@ class EnhancedCityService:
         )
     
     async def get_european_cities_bulk(self, limit: int = 1000) -> List[Dict]:
-        """Get bulk European city data for database population."""
-        logger.info(f"Fetching bulk European city data (limit: {limit})")
-        
-        european_countries = [
-            'FR', 'IT', 'ES', 'DE', 'AT', 'CH', 'BE', 'NL', 'PT', 'PL', 
-            'CZ', 'HU', 'HR', 'SI', 'SK', 'RO', 'BG', 'GR', 'MT', 'CY'
-        ]
-        
-        all_cities = []
+        """
+        Get bulk European city data from the persistent cache.
         
-        for country in european_countries:
-            try:
-                url = f"{self.apis['geonames']}/searchJSON"
-                params = {
-                    'country': country,
-                    'featureClass': 'P',
-                    'featureCode': 'PPLA',  # Administrative capitals
-                    'maxRows': 50,
-                    'username': self.geonames_username,
-                    'orderby': 'population'
-                }
-                
-                async with self.session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        cities = data.get('geonames', [])
-                        
-                        for city in cities:
-                            all_cities.append({
-                                'name': city.get('name'),
-                                'country': city.get('countryName'),
-                                'country_code': city.get('countryCode'),
-                                'population': city.get('population', 0),
-                                'coordinates': {
-                                    'latitude': float(city.get('lat', 0)),
-                                    'longitude': float(city.get('lng', 0))
-                                },
-                                'admin_area': city.get('adminName1'),
-                                'feature_code': city.get('fcode'),
-                                'source': 'geonames_bulk'
-                            })
-                
-                # Rate limiting
-                await asyncio.sleep(0.1)
+        Never calls GeoNames; the cache is filled by
+        scripts/refresh_bulk_cities.py (the ``bulk-cities`` process).
+        """
+        return get_bulk_city_cache().get_cities(limit)
+    
+    async def fetch_country_cities(self, country: str) -> Optional[List[Dict]]:
+        """Fetch one country's administrative capitals from GeoNames (refresh job only)."""
+        try:
+            url = f"{self.apis['geonames']}/searchJSON"
+            params = {
+                'country': country,
+                'featureClass': 'P',
+                'featureCode': 'PPLA',  # Administrative capitals
+                'maxRows': 50,
+                'username': self.geonames_username,
+                'orderby': 'population'
+            }
+            
+            async with cached_get(url, params=params, headers=self.headers, provider='geonames') as response:
+                if response.status != 200:
+                    logger.warning("GeoNames bulk fetch failed", country=country, status=response.status)
+                    return None
                 
-            except Exception as e:
-                logger.error(f"Bulk fetch error for {country}: {e}")
-                continue
-        
-        logger.info(f"Fetched {len(all_cities)} European cities")
-        return all_cities[:limit]
+                data = await response.json()
+                return [
+                    {
+                        'name': city.get('name'),
+                        'country': city.get('countryName'),
+                        'country_code': city.get('countryCode'),
+                        'population': city.get('population', 0),
+                        'coordinates': {
+                            'latitude': float(city.get('lat', 0)),
+                            'longitude': float(city.get('lng', 0))
+                        },
+                        'admin_area': city.get('adminName1'),
+                        'feature_code': city.get('fcode'),
+                        'source': 'geonames_bulk'
+                    }
+                    for city in data.get('geonames', [])
+                ]
+            
+        except Exception as e:
+            logger.error(f"Bulk fetch error for {country}: {e}")
+            return None
 
 
 # Global service instance
@@ -415,4 +403,4 @@ def get_enhanced_city_service() -> EnhancedCityService:
     global _enhanced_city_service
     if _enhanced_city_service is None:
         _enhanced_city_service = EnhancedCityService()
-    return _enhanced_city_service
\ No newline at end of file
+    return _enhanced_city_service
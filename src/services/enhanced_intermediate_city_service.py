@@ -19,6 +19,7 @@ from .preference_scoring_service import get_preference_scoring_service, UserPref
 from .route_optimization_service import get_route_optimization_service
 from .advanced_filtering_service import get_advanced_filtering_service
 from .dynamic_learning_service import get_dynamic_learning_service
+from .corridor_pool_store import CorridorPool, get_corridor_pool_store
 
 logger = structlog.get_logger(__name__)
 
@@ -59,6 +60,7 @@ class EnhancedIntermediateCityService:
         self.route_optimizer = get_route_optimization_service()
         self.filtering_service = get_advanced_filtering_service()
         self.learning_service = get_dynamic_learning_service()
+        self.corridor_pools = get_corridor_pool_store()
         
         # Scoring weights for different factors
         self.scoring_weights = {
@@ -70,6 +72,14 @@ class EnhancedIntermediateCityService:
             'timing': 0.05,        # Seasonal relevance
             'budget': 0.05         # Budget fit
         }
+        
+        # Per-source timeouts (seconds) for concurrent candidate gathering
+        self.source_timeouts = {
+            'enhanced': 5.0,
+            'opentripmap': 8.0,
+            'fallback': 3.0
+        }
+        self.opentripmap_concurrency = 4  # Simultaneous country lookups
     
     async def find_optimal_intermediate_cities(
         self, 
@@ -87,10 +97,17 @@ class EnhancedIntermediateCityService:
                    route_type=route_type,
                    max_cities=max_cities)
         
-        # Step 1: Gather candidates from multiple sources
-        raw_candidates = await self._gather_candidate_cities(
-            start_city, end_city, request, route_type
-        )
+        # Step 1: Use the precomputed corridor pool, or gather candidates from multiple sources
+        pool = self.corridor_pools.get(start_city.name, end_city.name, route_type)
+        if pool is not None:
+            raw_candidates = pool.cities
+            static_scores = pool.static_scores
+            logger.info("Using precomputed corridor pool", candidates=len(raw_candidates))
+        else:
+            raw_candidates = await self._gather_candidate_cities(
+                start_city, end_city, request, route_type
+            )
+            static_scores = None
         
         # Step 1.5: Apply advanced filtering
         candidates = await self._apply_advanced_filtering(
@@ -105,7 +122,7 @@ class EnhancedIntermediateCityService:
         
         # Step 2: Score all candidates comprehensively
         scored_cities = await self._score_candidates(
-            candidates, start_city, end_city, request, route_type
+            candidates, start_city, end_city, request, route_type, static_scores
         )
         
         # Step 3: Advanced route optimization using multiple algorithms
@@ -123,6 +140,27 @@ class EnhancedIntermediateCityService:
         
         return [scored_city.city for scored_city in final_cities]
     
+    async def build_corridor_pool(
+        self, start_city: City, end_city: City, request: TripRequest, route_type: str
+    ) -> CorridorPool:
+        """Gather a corridor's candidates and their request-independent scores for the offline pool."""
+        candidates = await self._gather_candidate_cities(
+            start_city, end_city, request, route_type
+        )
+        route_info = self._calculate_route_info(start_city, end_city)
+        
+        return CorridorPool(
+            start_city=start_city.name,
+            end_city=end_city.name,
+            route_type=route_type,
+            cities=candidates,
+            static_scores={
+                city.name: self._static_score_components(city, start_city, end_city, route_type, route_info)
+                for city in candidates
+            },
+            built_at=datetime.now().timestamp()
+        )
+    
     async def _gather_candidate_cities(
         self, 
         start_city: City, 
@@ -130,39 +168,48 @@ class EnhancedIntermediateCityService:
         request: TripRequest,
         route_type: str
     ) -> List[City]:
-        """Gather candidate cities from multiple sources."""
-        
-        all_candidates = []
-        
-        # Source 1: Enhanced city service with enriched data
-        try:
-            enhanced_candidates = await self._get_enhanced_service_candidates(
-                start_city, end_city, route_type
+        """
+        Gather candidate cities from multiple sources concurrently.
+        
+        Every source runs under its own timeout, so total latency is the
+        slowest source's timeout rather than the sum. Results are collected
+        as each source finishes; the enhanced and OpenTripMap sources fill a
+        sink, so if they time out they still contribute whatever they had
+        already gathered.
+        """
+        
+        partial: Dict[str, List[City]] = {name: [] for name in self.source_timeouts}
+        sources = {
+            # Source 1: Enhanced city service with enriched data
+            'enhanced': self._get_enhanced_service_candidates(
+                start_city, end_city, route_type, sink=partial['enhanced']
+            ),
+            # Source 2: OpenTripMap attractions and cities
+            'opentripmap': self._get_opentripmap_candidates(
+                start_city, end_city, route_type, sink=partial['opentripmap']
+            ),
+            # Source 3: Fallback comprehensive database (CPU-bound, off the event loop)
+            'fallback': asyncio.to_thread(
+                self._get_fallback_candidates, start_city, end_city, route_type
             )
-            all_candidates.extend(enhanced_candidates)
-            logger.info(f"Enhanced service: {len(enhanced_candidates)} candidates")
-        except Exception as e:
-            logger.error(f"Enhanced service failed: {e}")
+        }
         
-        # Source 2: OpenTripMap attractions and cities
-        try:
-            otm_candidates = await self._get_opentripmap_candidates(
-                start_city, end_city, route_type
-            )
-            all_candidates.extend(otm_candidates)
-            logger.info(f"OpenTripMap: {len(otm_candidates)} candidates")
-        except Exception as e:
-            logger.error(f"OpenTripMap service failed: {e}")
+        async def run_source(name: str, coroutine) -> str:
+            try:
+                partial[name] = await asyncio.wait_for(coroutine, self.source_timeouts[name])
+            except asyncio.TimeoutError:
+                logger.warning("Candidate source timed out", source=name,
+                               timeout=self.source_timeouts[name], kept=len(partial[name]))
+            except Exception as e:
+                logger.error(f"{name} candidate source failed: {e}")
+            return name
         
-        # Source 3: Fallback comprehensive database
-        try:
-            fallback_candidates = self._get_fallback_candidates(
-                start_city, end_city, route_type
-            )
-            all_candidates.extend(fallback_candidates)
-            logger.info(f"Fallback: {len(fallback_candidates)} candidates")
-        except Exception as e:
-            logger.error(f"Fallback service failed: {e}")
+        for finished in asyncio.as_completed([run_source(name, coro) for name, coro in sources.items()]):
+            name = await finished
+            logger.info(f"{name}: {len(partial[name])} candidates")
+        
+        # Merge in source priority order so deduplication keeps the richest record
+        all_candidates = [city for name in sources for city in partial[name]]
         
         # Deduplicate and filter by route proximity
         unique_candidates = self._deduplicate_candidates(all_candidates)
@@ -173,10 +220,11 @@ class EnhancedIntermediateCityService:
         return route_candidates
     
     async def _get_enhanced_service_candidates(
-        self, start_city: City, end_city: City, route_type: str
+        self, start_city: City, end_city: City, route_type: str,
+        sink: Optional[List[City]] = None
     ) -> List[City]:
-        """Get candidates from enhanced city service."""
-        candidates = []
+        """Get candidates from enhanced city service, appending matches to ``sink`` as they convert."""
+        candidates = sink if sink is not None else []
         
         try:
             async with self.enhanced_city_service:
@@ -198,26 +246,44 @@ class EnhancedIntermediateCityService:
         return candidates
     
     async def _get_opentripmap_candidates(
-        self, start_city: City, end_city: City, route_type: str
+        self, start_city: City, end_city: City, route_type: str,
+        sink: Optional[List[City]] = None
     ) -> List[City]:
-        """Get candidates from OpenTripMap service."""
-        candidates = []
+        """
+        Get candidates from OpenTripMap service.
+        
+        Countries are queried concurrently with bounded concurrency. As each
+        country completes, ``sink`` is rebuilt from the finished countries in
+        route country order, so deduplication stays deterministic.
+        """
+        candidates = sink if sink is not None else []
+        semaphore = asyncio.Semaphore(self.opentripmap_concurrency)
+        by_country: Dict[str, List[City]] = {}
+        
+        async def fetch_country(country: str) -> Tuple[str, List[Dict]]:
+            async with semaphore:
+                return country, await self.opentripmap_service.get_cities_in_country(country, limit=100)
         
         try:
             async with self.opentripmap_service:
                 # Search for cities in each relevant country
                 countries = self._determine_countries_for_route(start_city, end_city)
                 
-                for country in countries:
-                    country_cities = await self.opentripmap_service.get_cities_in_country(
-                        country, limit=100
-                    )
+                for finished in asyncio.as_completed([fetch_country(country) for country in countries]):
+                    try:
+                        country, country_cities = await finished
+                    except Exception as e:
+                        logger.warning(f"OpenTripMap country lookup failed: {e}")
+                        continue
                     
+                    matches = []
                     for city_data in country_cities:
                         if self._matches_route_type(city_data, route_type):
                             city = self._convert_to_city_object(city_data, source='opentripmap')
                             if city:
-                                candidates.append(city)
+                                matches.append(city)
+                    by_country[country] = matches
+                    candidates[:] = [city for name in countries for city in by_country.get(name, [])]
                 
         except Exception as e:
             logger.error(f"OpenTripMap service error: {e}")
@@ -284,7 +350,8 @@ class EnhancedIntermediateCityService:
         start_city: City, 
         end_city: City, 
         request: TripRequest,
-        route_type: str
+        route_type: str,
+        static_scores: Optional[Dict[str, Dict[str, float]]] = None
     ) -> List[CityScore]:
         """Score all candidate cities comprehensively."""
         
@@ -296,7 +363,8 @@ class EnhancedIntermediateCityService:
         for city in candidates:
             try:
                 score = await self._calculate_city_score(
-                    city, start_city, end_city, request, route_type, route_info
+                    city, start_city, end_city, request, route_type, route_info,
+                    (static_scores or {}).get(city.name)
                 )
                 scored_cities.append(score)
             except Exception as e:
@@ -314,16 +382,20 @@ class EnhancedIntermediateCityService:
         end_city: City, 
         request: TripRequest,
         route_type: str,
-        route_info: Dict
+        route_info: Dict,
+        static_scores: Optional[Dict[str, float]] = None
     ) -> CityScore:
         """Calculate comprehensive score for a city."""
         
         reasons = []
         
-        # Distance score: how well positioned along route
-        distance_score = self._calculate_distance_score(
-            city, start_city, end_city, route_info
+        # Request-independent components, precomputed for corridor pools
+        static = static_scores or self._static_score_components(
+            city, start_city, end_city, route_type, route_info
         )
+        
+        # Distance score: how well positioned along route
+        distance_score = static['distance']
         if distance_score > 0.7:
             reasons.append("Well positioned along route")
         
@@ -335,21 +407,19 @@ class EnhancedIntermediateCityService:
             reasons.append(f"Excellent match for {route_type} style")
         
         # Diversity score: adds variety to route
-        diversity_score = self._calculate_diversity_score(
-            city, route_type
-        )
+        diversity_score = static['diversity']
         if diversity_score > 0.7:
             reasons.append("Adds unique character to route")
         
         # Popularity score: tourist appeal
-        popularity_score = self._calculate_popularity_score(city)
+        popularity_score = static['popularity']
         if popularity_score > 0.8:
             reasons.append("Popular destination")
         elif popularity_score < 0.3:
             reasons.append("Hidden gem")
         
         # Accessibility score: ease of access
-        accessibility_score = self._calculate_accessibility_score(city)
+        accessibility_score = static['accessibility']
         
         # Timing score: seasonal/time relevance
         timing_score = self._calculate_timing_score(city, request)
@@ -387,6 +457,17 @@ class EnhancedIntermediateCityService:
             reasons=reasons
         )
     
+    def _static_score_components(
+        self, city: City, start_city: City, end_city: City, route_type: str, route_info: Dict
+    ) -> Dict[str, float]:
+        """Score components that depend only on the corridor, not on the request."""
+        return {
+            'distance': self._calculate_distance_score(city, start_city, end_city, route_info),
+            'diversity': self._calculate_diversity_score(city, route_type),
+            'popularity': self._calculate_popularity_score(city),
+            'accessibility': self._calculate_accessibility_score(city)
+        }
+    
     async def _optimize_route_selection(
         self, 
         scored_cities: List[CityScore], 
@@ -561,6 +642,8 @@ class EnhancedIntermediateCityService:
             logger.info(f"Route optimization completed using {optimized_route.optimization_method}")
             logger.info(f"Performance: {optimized_route.performance_metrics}")
             logger.info(f"Explanation: {optimized_route.routing_explanation}")
+            if optimized_route.algorithm_reports:
+                logger.info(f"Algorithm reports: {optimized_route.algorithm_reports}")
             
             # Convert back to CityScore objects
             optimized_scored_cities = []
@@ -928,9 +1011,25 @@ class EnhancedIntermediateCityService:
         return list(countries)[:5]  # Limit to 5 countries max
     
     def _deduplicate_candidates(self, candidates: List[City]) -> List[City]:
-        """Remove duplicate cities based on name and proximity."""
+        """
+        Remove duplicate cities based on name and proximity.
+        
+        Accepted cities are bucketed on a grid of cells at least 10 km wide, so
+        each candidate is only compared with cities in its own and the eight
+        neighbouring cells instead of every accepted city.
+        """
+        if not candidates:
+            return []
+        
+        radius_km = 10
+        lat_step = radius_km / 111.0
+        max_lat = max(abs(city.coordinates.latitude) for city in candidates)
+        lon_step = lat_step / max(math.cos(math.radians(min(max_lat + lat_step, 89.0))), 0.01)
+        lon_cells = max(int(math.ceil(360.0 / lon_step)), 1)
+        
         unique_cities = []
         seen_names = set()
+        grid: Dict[Tuple[int, int], List[City]] = {}
         
         for city in candidates:
             city_key = city.name.lower().replace(' ', '').replace('-', '')
@@ -938,16 +1037,20 @@ class EnhancedIntermediateCityService:
             if city_key in seen_names:
                 continue
             
-            # Check for nearby duplicates (within 10km)
-            is_duplicate = False
-            for existing_city in unique_cities:
-                if self._calculate_distance(city.coordinates, existing_city.coordinates) < 10:
-                    is_duplicate = True
-                    break
+            # Check for nearby duplicates (within 10km) in neighbouring cells
+            row = int(math.floor(city.coordinates.latitude / lat_step))
+            col = int(math.floor((city.coordinates.longitude + 180.0) / lon_step))
+            is_duplicate = any(
+                self._calculate_distance(city.coordinates, existing_city.coordinates) < radius_km
+                for d_row in (-1, 0, 1)
+                for d_col in (-1, 0, 1)
+                for existing_city in grid.get((row + d_row, (col + d_col) % lon_cells), ())
+            )
             
             if not is_duplicate:
                 unique_cities.append(city)
                 seen_names.add(city_key)
+                grid.setdefault((row, col % lon_cells), []).append(city)
         
         return unique_cities
     
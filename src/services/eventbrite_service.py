@@ -4,10 +4,12 @@ Note: Search API was deprecated in 2019, but we can try alternative approaches.
 """
 import os
 import asyncio
-import aiohttp
 from typing import List, Dict, Optional
 import structlog
 from ..core.models import Coordinates
+from ..infrastructure.http_client import get_http_session
+from ..infrastructure.response_cache import cached_get
+from ..infrastructure.single_flight import coalesce
 
 logger = structlog.get_logger(__name__)
 
@@ -18,22 +20,17 @@ class EventbriteService:
     def __init__(self):
         self.api_key = os.getenv('EVENTBRITE_API_KEY')
         self.base_url = "https://www.eventbriteapi.com/v3"
-        self.session = None
         
         if not self.api_key:
             logger.warning("Eventbrite API key not configured - service will be limited")
     
     async def __aenter__(self):
         """Async context manager entry"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        return False
     
     async def test_api_access(self) -> bool:
         """Test if API access is working."""
@@ -41,9 +38,6 @@ class EventbriteService:
             return False
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             # Try to get user info as a test
             url = f"{self.base_url}/users/me/"
             headers = {
@@ -51,7 +45,7 @@ class EventbriteService:
                 'Accept': 'application/json'
             }
             
-            async with self.session.get(url, headers=headers) as response:
+            async with get_http_session().get(url, headers=headers) as response:
                 if response.status == 200:
                     logger.info("Eventbrite API access successful")
                     return True
@@ -64,6 +58,7 @@ class EventbriteService:
             logger.error(f"Eventbrite API test error: {e}")
             return False
     
+    @coalesce('eventbrite')
     async def find_events_by_location(self, coordinates: Coordinates, city_name: str, limit: int = 10) -> List[Dict]:
         """
         Try to find events by location (likely deprecated, but we'll try).
@@ -73,9 +68,6 @@ class EventbriteService:
             return self._get_fallback_events(city_name, limit)
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             # Try the deprecated search endpoint (will likely fail)
             url = f"{self.base_url}/events/search/"
             params = {
@@ -91,7 +83,7 @@ class EventbriteService:
                 'Accept': 'application/json'
             }
             
-            async with self.session.get(url, headers=headers, params=params) as response:
+            async with cached_get(url, headers=headers, params=params, provider='eventbrite') as response:
                 if response.status == 200:
                     data = await response.json()
                     events = data.get('events', [])
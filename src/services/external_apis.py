@@ -12,6 +12,7 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 from ..core.models import ServiceResult, Coordinates
 from ..core.exceptions import ExternalServiceError, RateLimitError
 from ..infrastructure.config import SecureConfigurationService
+from ..infrastructure.http_client import get_http_session
 
 logger = structlog.get_logger(__name__)
 
@@ -74,18 +75,15 @@ class OpenRouteServiceAPI:
         self.api_key = api_key
         self.base_url = base_url
         self.circuit_breaker = CircuitBreaker()
-        self.session = None
+        self.headers = {
+            'Authorization': self.api_key,
+            'Content-Type': 'application/json',
+            'User-Agent': 'TravelPlanner/2.0'
+        }
+        self.timeout = aiohttp.ClientTimeout(total=30)
     
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self.session is None:
-            headers = {
-                'Authorization': self.api_key,
-                'Content-Type': 'application/json',
-                'User-Agent': 'TravelPlanner/2.0'
-            }
-            timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(headers=headers, timeout=timeout)
-        return self.session
+        return get_http_session()
     
     @retry(
         stop=stop_after_attempt(3),
@@ -109,7 +107,7 @@ class OpenRouteServiceAPI:
             
             url = f"{self.base_url}/v2/directions/{profile}/json"
             
-            async with session.post(url, json=data) as response:
+            async with session.post(url, json=data, headers=self.headers, timeout=self.timeout) as response:
                 if response.status == 429:
                     raise RateLimitError("OpenRouteService rate limit exceeded")
                 
@@ -158,7 +156,7 @@ class OpenRouteServiceAPI:
             
             url = f"{self.base_url}/v2/directions/driving-car/json"
             
-            async with session.post(url, json=data) as response:
+            async with session.post(url, json=data, headers=self.headers, timeout=self.timeout) as response:
                 if response.status != 200:
                     raise ExternalServiceError("Multi-point routing failed", "openroute")
                 
@@ -178,9 +176,7 @@ class OpenRouteServiceAPI:
             raise ExternalServiceError(f"Multi-point routing failed: {e}", "openroute")
     
     async def close(self):
-        """Close the session."""
-        if self.session:
-            await self.session.close()
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
 
 
 class OpenWeatherMapAPI:
@@ -190,13 +186,10 @@ class OpenWeatherMapAPI:
         self.api_key = api_key
         self.base_url = base_url
         self.circuit_breaker = CircuitBreaker()
-        self.session = None
+        self.timeout = aiohttp.ClientTimeout(total=15)
     
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self.session is None:
-            timeout = aiohttp.ClientTimeout(total=15)
-            self.session = aiohttp.ClientSession(timeout=timeout)
-        return self.session
+        return get_http_session()
     
     @retry(
         stop=stop_after_attempt(3),
@@ -221,7 +214,7 @@ class OpenWeatherMapAPI:
             forecast_params = current_params.copy()
             forecast_params['cnt'] = min(days * 8, 40)  # 3-hour intervals, max 5 days
             
-            async with session.get(current_url, params=current_params) as current_response:
+            async with session.get(current_url, params=current_params, timeout=self.timeout) as current_response:
                 if current_response.status == 401:
                     raise ExternalServiceError("Invalid OpenWeatherMap API key", "openweather", 401)
                 
@@ -230,7 +223,7 @@ class OpenWeatherMapAPI:
                 
                 current_data = await current_response.json()
             
-            async with session.get(forecast_url, params=forecast_params) as forecast_response:
+            async with session.get(forecast_url, params=forecast_params, timeout=self.timeout) as forecast_response:
                 if forecast_response.status != 200:
                     raise ExternalServiceError("Forecast API error", "openweather", forecast_response.status)
                 
@@ -271,9 +264,7 @@ class OpenWeatherMapAPI:
             raise ExternalServiceError(f"Weather data unavailable: {e}", "openweather")
     
     async def close(self):
-        """Close the session."""
-        if self.session:
-            await self.session.close()
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
 
 
 class GooglePlacesAPI:
@@ -283,13 +274,10 @@ class GooglePlacesAPI:
         self.api_key = api_key
         self.base_url = base_url
         self.circuit_breaker = CircuitBreaker()
-        self.session = None
+        self.timeout = aiohttp.ClientTimeout(total=20)
     
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self.session is None:
-            timeout = aiohttp.ClientTimeout(total=20)
-            self.session = aiohttp.ClientSession(timeout=timeout)
-        return self.session
+        return get_http_session()
     
     @retry(
         stop=stop_after_attempt(3),
@@ -308,7 +296,7 @@ class GooglePlacesAPI:
                 'key': self.api_key
             }
             
-            async with session.get(url, params=params) as response:
+            async with session.get(url, params=params, timeout=self.timeout) as response:
                 if response.status == 403:
                     raise ExternalServiceError("Google Places API quota exceeded", "google_places", 403)
                 
@@ -363,7 +351,7 @@ class GooglePlacesAPI:
                 'key': self.api_key
             }
             
-            async with session.get(url, params=params) as response:
+            async with session.get(url, params=params, timeout=self.timeout) as response:
                 if response.status != 200:
                     raise ExternalServiceError("Restaurant search failed", "google_places", response.status)
                 
@@ -398,9 +386,7 @@ class GooglePlacesAPI:
             raise ExternalServiceError(f"Restaurant search failed: {e}", "google_places")
     
     async def close(self):
-        """Close the session."""
-        if self.session:
-            await self.session.close()
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
 
 
 class ExternalAPIManager:
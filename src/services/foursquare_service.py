@@ -4,10 +4,11 @@ Free tier: 1000 requests/day
 """
 import os
 import asyncio
-import aiohttp
 from typing import List, Dict, Optional
 import structlog
 from ..core.models import Coordinates
+from ..infrastructure.response_cache import cached_get
+from ..infrastructure.single_flight import coalesce
 
 logger = structlog.get_logger(__name__)
 
@@ -18,20 +19,17 @@ class FoursquareService:
     def __init__(self):
         self.api_key = os.getenv('FOURSQUARE_API_KEY')
         self.base_url = "https://places-api.foursquare.com/places"
-        self.session = None
         
         if not self.api_key:
             logger.warning("Foursquare API key not configured - using fallback data")
     
+    @coalesce('foursquare')
     async def find_restaurants(self, coordinates: Coordinates, city_name: str, limit: int = 10) -> List[Dict]:
         """Find top restaurants near the given coordinates."""
         if not self.api_key:
             return self._get_fallback_restaurants(city_name, limit)
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/search"
             params = {
                 'll': f"{coordinates.latitude},{coordinates.longitude}",
@@ -47,7 +45,7 @@ class FoursquareService:
                 'X-Places-Api-Version': '2025-06-17'
             }
             
-            async with self.session.get(url, params=params, headers=headers) as response:
+            async with cached_get(url, params=params, headers=headers, provider='foursquare') as response:
                 if response.status == 200:
                     data = await response.json()
                     return self._format_restaurants(data.get('results', []))
@@ -59,20 +57,14 @@ class FoursquareService:
         except Exception as e:
             logger.error(f"Restaurant search error: {e}")
             return self._get_fallback_restaurants(city_name, limit)
-        finally:
-            if self.session:
-                await self.session.close()
-                self.session = None
     
+    @coalesce('foursquare')
     async def find_activities(self, coordinates: Coordinates, city_name: str, limit: int = 10) -> List[Dict]:
         """Find top activities and attractions near the given coordinates."""
         if not self.api_key:
             return self._get_fallback_activities(city_name, limit)
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/search"
             params = {
                 'll': f"{coordinates.latitude},{coordinates.longitude}",
@@ -88,7 +80,7 @@ class FoursquareService:
                 'X-Places-Api-Version': '2025-06-17'
             }
             
-            async with self.session.get(url, params=params, headers=headers) as response:
+            async with cached_get(url, params=params, headers=headers, provider='foursquare') as response:
                 if response.status == 200:
                     data = await response.json()
                     return self._format_activities(data.get('results', []))
@@ -100,10 +92,6 @@ class FoursquareService:
         except Exception as e:
             logger.error(f"Activities search error: {e}")
             return self._get_fallback_activities(city_name, limit)
-        finally:
-            if self.session:
-                await self.session.close()
-                self.session = None
     
     def _format_restaurants(self, results: List[Dict]) -> List[Dict]:
         """Format Foursquare restaurant data."""
@@ -193,6 +181,4 @@ class FoursquareService:
         return []
     
     async def close(self):
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
\ No newline at end of file
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
\ No newline at end of file
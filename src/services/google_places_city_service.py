@@ -4,11 +4,11 @@ This replaces hardcoded city data with live Google Places searches.
 """
 import os
 import asyncio
-import aiohttp
 from typing import List, Optional, Dict, Any, Tuple
 from geopy.distance import geodesic
 import structlog
 from ..core.models import City, Coordinates, ServiceResult
+from ..infrastructure.http_client import get_http_session
 from ..core.exceptions import ExternalServiceError
 
 logger = structlog.get_logger(__name__)
@@ -21,7 +21,6 @@ class GooglePlacesCityService:
         self.google_api_key = os.getenv('GOOGLE_PLACES_API_KEY')
         # Use the new Places API endpoint
         self.base_url = "https://places.googleapis.com/v1/places"
-        self.session = None
         self._city_cache: Dict[str, City] = {}
         
         if not self.google_api_key:
@@ -109,9 +108,6 @@ class GooglePlacesCityService:
     async def _search_cities(self, query: str) -> List[Dict]:
         """Search for cities using Google Places API (New)."""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             # Use the new Places API searchText endpoint
             url = f"{self.base_url}:searchText"
             
@@ -127,7 +123,7 @@ class GooglePlacesCityService:
                 'maxResultCount': 10
             }
             
-            async with self.session.post(url, json=payload, headers=headers) as response:
+            async with get_http_session().post(url, json=payload, headers=headers) as response:
                 if response.status == 200:
                     data = await response.json()
                     return data.get('places', [])
@@ -143,9 +139,6 @@ class GooglePlacesCityService:
     async def _text_search(self, query: str) -> List[Dict]:
         """General text search using Google Places API (New)."""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}:searchText"
             
             headers = {
@@ -159,7 +152,7 @@ class GooglePlacesCityService:
                 'maxResultCount': 20
             }
             
-            async with self.session.post(url, json=payload, headers=headers) as response:
+            async with get_http_session().post(url, json=payload, headers=headers) as response:
                 if response.status == 200:
                     data = await response.json()
                     return data.get('places', [])
@@ -177,9 +170,6 @@ class GooglePlacesCityService:
                                        route_end: Coordinates, max_deviation_km: float) -> List[Dict]:
         """Search for interesting places along a route using Places API (New)."""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             # Use searchNearby endpoint for the new API
             url = f"{self.base_url}:searchNearby"
             
@@ -214,7 +204,7 @@ class GooglePlacesCityService:
                     }
                 }
                 
-                async with self.session.post(url, json=payload, headers=headers) as response:
+                async with get_http_session().post(url, json=payload, headers=headers) as response:
                     if response.status == 200:
                         data = await response.json()
                         places = data.get('places', [])
@@ -711,6 +701,4 @@ class GooglePlacesCityService:
         return name.replace('_', ' ').title()
     
     async def close(self):
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
@@ -0,0 +1,313 @@
+"""
+Durable interaction store for trip learning.
+
+Completed trips are appended to a SQLite log and folded into aggregate
+counters in the same transaction. Writes are queued in memory and flushed
+in batches by a background thread so learning never blocks a request, and
+each worker refreshes its in-memory aggregate snapshot on a short interval
+so counters written by other gunicorn workers become visible.
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Kept out of the tracked application database
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'interactions.db')
+
+
+class InteractionStore:
+    """Append-only SQLite trip log with incrementally updated aggregates."""
+
+    def __init__(self, db_path: str = None, batch_size: int = 100,
+                 flush_interval_seconds: float = 2.0,
+                 refresh_interval_seconds: float = 30.0,
+                 max_queue_size: int = 10000):
+        if db_path is None:
+            db_path = os.getenv('INTERACTION_STORE_PATH', DEFAULT_DB_PATH)
+
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._city_aggregates: Dict[str, Dict[str, float]] = {}
+        self._total_trips = 0
+        self._last_refresh = 0.0
+        self._stop_event = threading.Event()
+        self.stats = {'enqueued': 0, 'flushed': 0, 'dropped': 0, 'flush_errors': 0}
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._init_schema()
+        self.refresh_aggregates()
+
+        self._writer = threading.Thread(
+            target=self._run_writer, name='interaction-store-writer', daemon=True
+        )
+        self._writer.start()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Open a connection tuned for concurrent writers across workers."""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_schema(self):
+        """Create the interaction log and aggregate tables."""
+        with self._get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS trip_interactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    cities TEXT NOT NULL, -- JSON array of city names
+                    preferences TEXT, -- JSON
+                    rating REAL DEFAULT 0,
+                    created_at TIMESTAMP NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trip_interactions_user
+                ON trip_interactions (user_id)
+            ''')
+
+            # Per-city counters, updated incrementally on every flush
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS city_interaction_aggregates (
+                    city_name TEXT PRIMARY KEY,
+                    trip_count INTEGER DEFAULT 0,
+                    rating_sum REAL DEFAULT 0,
+                    rated_count INTEGER DEFAULT 0,
+                    high_rating_count INTEGER DEFAULT 0,
+                    updated_at TIMESTAMP
+                )
+            ''')
+
+            # Per-user city history used for personalised suggestions
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS user_city_aggregates (
+                    user_id TEXT NOT NULL,
+                    city_name TEXT NOT NULL,
+                    visit_count INTEGER DEFAULT 0,
+                    rating_sum REAL DEFAULT 0,
+                    high_rating_count INTEGER DEFAULT 0,
+                    last_visited TIMESTAMP,
+                    PRIMARY KEY (user_id, city_name)
+                )
+            ''')
+            conn.commit()
+
+    def record_trip(self, user_id: str, cities: List[str],
+                    preferences: Optional[Dict[str, Any]] = None,
+                    rating: float = 0) -> bool:
+        """Queue a completed trip for persistence. Never blocks the caller."""
+        record = {
+            'user_id': str(user_id),
+            'cities': [c for c in cities if c],
+            'preferences': preferences or {},
+            'rating': float(rating or 0),
+            'created_at': datetime.now().isoformat()
+        }
+        try:
+            self._queue.put_nowait(record)
+            self._count('enqueued')
+            return True
+        except queue.Full:
+            self._count('dropped')
+            logger.warning("Interaction queue full, dropping trip", user_id=user_id)
+            return False
+
+    def _count(self, name: str, amount: int = 1):
+        # Request threads and the writer thread both update the counters
+        with self._lock:
+            self.stats[name] += amount
+
+    def _run_writer(self):
+        """Background loop that drains the queue in batches."""
+        while not self._stop_event.is_set():
+            batch = self._drain(timeout=self.flush_interval_seconds)
+            if batch:
+                self._flush_batch(batch)
+            if time.time() - self._last_refresh >= self.refresh_interval_seconds:
+                self.refresh_aggregates()
+
+    def _drain(self, timeout: float) -> List[Dict[str, Any]]:
+        """Collect up to ``batch_size`` queued records, waiting at most ``timeout``."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            return batch
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush_batch(self, batch: List[Dict[str, Any]]):
+        """Append a batch to the log and fold it into the counters atomically."""
+        try:
+            with self._get_connection() as conn:
+                conn.executemany('''
+                    INSERT INTO trip_interactions (user_id, cities, preferences, rating, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [
+                    (r['user_id'], json.dumps(r['cities']), json.dumps(r['preferences']),
+                     r['rating'], r['created_at'])
+                    for r in batch
+                ])
+
+                city_rows = []
+                user_rows = []
+                for r in batch:
+                    rated = 1 if r['rating'] > 0 else 0
+                    high = 1 if r['rating'] >= 4 else 0
+                    for city_name in set(r['cities']):
+                        city_rows.append((city_name, r['rating'], rated, high, r['created_at']))
+                        user_rows.append((r['user_id'], city_name, r['rating'], high, r['created_at']))
+
+                conn.executemany('''
+                    INSERT INTO city_interaction_aggregates
+                        (city_name, trip_count, rating_sum, rated_count, high_rating_count, updated_at)
+                    VALUES (?, 1, ?, ?, ?, ?)
+                    ON CONFLICT(city_name) DO UPDATE SET
+                        trip_count = trip_count + 1,
+                        rating_sum = rating_sum + excluded.rating_sum,
+                        rated_count = rated_count + excluded.rated_count,
+                        high_rating_count = high_rating_count + excluded.high_rating_count,
+                        updated_at = excluded.updated_at
+                ''', city_rows)
+
+                conn.executemany('''
+                    INSERT INTO user_city_aggregates
+                        (user_id, city_name, visit_count, rating_sum, high_rating_count, last_visited)
+                    VALUES (?, ?, 1, ?, ?, ?)
+                    ON CONFLICT(user_id, city_name) DO UPDATE SET
+                        visit_count = visit_count + 1,
+                        rating_sum = rating_sum + excluded.rating_sum,
+                        high_rating_count = high_rating_count + excluded.high_rating_count,
+                        last_visited = excluded.last_visited
+                ''', user_rows)
+                conn.commit()
+
+            self._count('flushed', len(batch))
+            logger.debug("Flushed trip interactions", count=len(batch))
+
+        except Exception as e:
+            self._count('flush_errors')
+            logger.error("Failed to flush trip interactions", count=len(batch), error=str(e))
+
+    def flush(self):
+        """Synchronously flush everything currently queued (shutdown and tests)."""
+        while True:
+            batch = self._drain(timeout=0)
+            if not batch:
+                break
+            self._flush_batch(batch)
+        self.refresh_aggregates()
+
+    def refresh_aggregates(self):
+        """Reload the per-city counter snapshot, picking up other workers' writes."""
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT city_name, trip_count, rating_sum, rated_count, high_rating_count
+                    FROM city_interaction_aggregates
+                ''').fetchall()
+                total = conn.execute('SELECT COUNT(*) FROM trip_interactions').fetchone()[0]
+
+            snapshot = {
+                row['city_name']: {
+                    'trip_count': row['trip_count'],
+                    'avg_rating': row['rating_sum'] / row['rated_count'] if row['rated_count'] else 0.0,
+                    'high_rating_count': row['high_rating_count']
+                }
+                for row in rows
+            }
+            with self._lock:
+                self._city_aggregates = snapshot
+                self._total_trips = total
+
+        except Exception as e:
+            logger.error("Failed to refresh interaction aggregates", error=str(e))
+        finally:
+            self._last_refresh = time.time()
+
+    def get_city_aggregate(self, city_name: str) -> Optional[Dict[str, float]]:
+        """Return the cached counters for a city, if any trips include it."""
+        with self._lock:
+            return self._city_aggregates.get(city_name)
+
+    def get_total_trips(self) -> int:
+        """Return the cached total number of recorded trips."""
+        with self._lock:
+            return self._total_trips
+
+    def get_user_city_history(self, user_id: str) -> List[Dict[str, Any]]:
+        """Return a user's per-city history, most recently visited first."""
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT city_name, visit_count, rating_sum, high_rating_count, last_visited
+                    FROM user_city_aggregates
+                    WHERE user_id = ?
+                    ORDER BY last_visited DESC
+                ''', (str(user_id),)).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error("Failed to load user city history", user_id=user_id, error=str(e))
+            return []
+
+    def close(self):
+        """Stop the writer thread after flushing pending interactions."""
+        self._stop_event.set()
+        self._writer.join(timeout=self.flush_interval_seconds + 1)
+        self.flush()
+
+
+def aggregates_fingerprint(db_path: str = None) -> str:
+    """Cheap summary of the aggregate counters, read without starting a store."""
+    if db_path is None:
+        db_path = os.getenv('INTERACTION_STORE_PATH', DEFAULT_DB_PATH)
+    if not os.path.exists(db_path):
+        return 'missing'
+    try:
+        with sqlite3.connect(db_path, timeout=5) as conn:
+            row = conn.execute('''
+                SELECT COUNT(*), COALESCE(SUM(trip_count), 0), COALESCE(SUM(rated_count), 0),
+                       COALESCE(SUM(high_rating_count), 0), COALESCE(SUM(rating_sum), 0)
+                FROM city_interaction_aggregates
+            ''').fetchone()
+        return ':'.join(str(value) for value in row)
+    except sqlite3.Error:
+        return 'unavailable'
+
+
+# Global interaction store instance (one per worker process)
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_interaction_store() -> InteractionStore:
+    """Get the process-wide interaction store."""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = InteractionStore()
+                atexit.register(_store_instance.close)
+    return _store_instance
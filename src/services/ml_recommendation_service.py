@@ -3,7 +3,6 @@ ML-based trip recommendation service using collaborative filtering and content-b
 """
 import json
 import math
-from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 try:
@@ -14,9 +13,19 @@ except ImportError:
 
 from ..core.models import City, Coordinates, ServiceResult
 from .city_service import CityService
+from .interaction_store import InteractionStore, get_interaction_store
 
 logger = structlog.get_logger(__name__)
 
+# Popularity prior for the bandit: each city's share of PRIOR_TRIPS pseudo-trips.
+# Real trip counts are added on top, so recorded data outweighs the prior quickly.
+PRIOR_TRIPS = 200
+DEFAULT_PRIOR_SHARE = 0.005
+POPULARITY_PRIOR = {
+    'Paris': 0.10, 'Rome': 0.095, 'Barcelona': 0.08, 'Florence': 0.07,
+    'Venice': 0.065, 'Amsterdam': 0.06, 'Prague': 0.055, 'Vienna': 0.05
+}
+
 @dataclass
 class TripPreference:
     """User trip preferences for ML recommendations."""
@@ -31,13 +40,20 @@ class TripPreference:
 class MLRecommendationService:
     """ML-powered trip recommendation service."""
     
-    def __init__(self, city_service: CityService):
+    def __init__(self, city_service: CityService,
+                 interaction_store: Optional[InteractionStore] = None):
         self.city_service = city_service
         self.user_profiles = {}  # Store user preferences
-        self.trip_history = {}   # Store completed trips
+        self._interaction_store = interaction_store  # Durable trip history, opened on first use
         self.city_features = {}  # Store city feature vectors
         self.initialize_city_features()
     
+    @property
+    def interaction_store(self) -> InteractionStore:
+        if self._interaction_store is None:
+            self._interaction_store = get_interaction_store()
+        return self._interaction_store
+    
     def initialize_city_features(self):
         """Initialize city feature vectors for ML recommendations."""
         cities = list(self.city_service._city_cache.values())
@@ -580,16 +596,13 @@ class MLRecommendationService:
     def learn_from_trip(self, user_id: str, trip_data: Dict[str, Any]):
         """Learn from completed trips to improve future recommendations."""
         try:
-            # Store trip data for collaborative filtering
-            if user_id not in self.trip_history:
-                self.trip_history[user_id] = []
-            
-            self.trip_history[user_id].append({
-                'timestamp': datetime.now().isoformat(),
-                'cities': trip_data.get('cities', []),
-                'preferences': trip_data.get('preferences', {}),
-                'rating': trip_data.get('user_rating', 0)
-            })
+            # Queued for a batched write; aggregates become visible on the next refresh
+            self.interaction_store.record_trip(
+                user_id,
+                cities=trip_data.get('cities', []),
+                preferences=trip_data.get('preferences', {}),
+                rating=trip_data.get('user_rating', 0)
+            )
             
             logger.info("Learned from trip", user_id=user_id, cities=len(trip_data.get('cities', [])))
             
@@ -598,23 +611,21 @@ class MLRecommendationService:
     
     def get_personalized_suggestions(self, user_id: str, preferences: TripPreference) -> List[str]:
         """Get personalized city suggestions based on user history."""
-        if user_id not in self.trip_history:
+        user_history = self.interaction_store.get_user_city_history(user_id)
+        if not user_history:
             return []
         
-        user_trips = self.trip_history[user_id]
         suggestions = []
         
         # Analyze user's travel patterns
-        visited_cities = set()
+        visited_cities = {entry['city_name'] for entry in user_history}
         preferred_types = []
         
-        for trip in user_trips:
-            if trip.get('rating', 0) >= 4:  # Only consider well-rated trips
-                for city_name in trip.get('cities', []):
-                    visited_cities.add(city_name)
-                    city = self.city_service.get_city_by_name_sync(city_name)
-                    if city and city.types:
-                        preferred_types.extend(city.types)
+        for entry in user_history:
+            if entry.get('high_rating_count', 0) > 0:  # Only consider well-rated trips
+                city = self.city_service.get_city_by_name_sync(entry['city_name'])
+                if city and city.types:
+                    preferred_types.extend(city.types * entry['high_rating_count'])
         
         # Find similar cities user hasn't visited
         type_counts = {}
@@ -844,19 +855,16 @@ class MLRecommendationService:
         
         return selected
     
-    def _get_recommendation_count(self, city_name: str) -> int:
-        """Get number of times this city has been recommended (simulated)."""
-        # In real implementation, this would query actual recommendation logs
-        # For now, simulate based on city popularity
-        popular_cities = {
-            'Paris': 1000, 'Rome': 950, 'Barcelona': 800, 'Florence': 700,
-            'Venice': 650, 'Amsterdam': 600, 'Prague': 550, 'Vienna': 500
-        }
-        return popular_cities.get(city_name, random.randint(10, 100))
+    def _get_recommendation_count(self, city_name: str) -> float:
+        """Recorded trips including this city, smoothed by the popularity prior."""
+        aggregate = self.interaction_store.get_city_aggregate(city_name)
+        trip_count = aggregate['trip_count'] if aggregate else 0
+        prior_share = POPULARITY_PRIOR.get(city_name, DEFAULT_PRIOR_SHARE)
+        return trip_count + PRIOR_TRIPS * prior_share
     
-    def _get_total_recommendations(self) -> int:
-        """Get total number of recommendations made (simulated)."""
-        return 10000  # In real implementation, this would be actual count
+    def _get_total_recommendations(self) -> float:
+        """Recorded trips plus the prior's pseudo-trips, on the same scale as the per-city counts."""
+        return self.interaction_store.get_total_trips() + PRIOR_TRIPS
     
     def _calculate_recommendation_count(self, duration_days: int) -> int:
         """Calculate optimal number of city recommendations based on trip duration."""
@@ -4,12 +4,14 @@ Provides tourist attractions, points of interest, and geographical data for Euro
 """
 import os
 import asyncio
-import aiohttp
 import json
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import structlog
 from ..core.models import Coordinates
+from ..infrastructure.cache import CacheService
+from ..infrastructure.response_cache import cached_get
+from ..infrastructure.single_flight import coalesce
 
 logger = structlog.get_logger(__name__)
 
@@ -20,7 +22,11 @@ class OpenTripMapService:
     def __init__(self):
         self.api_key = os.getenv('OPENTRIPMAP_API_KEY')
         self.base_url = "https://api.opentripmap.com/0.1/en"
-        self.session = None
+        
+        # Attraction details rarely change, so they are cached by xid for a week
+        self.details_cache = CacheService(os.getenv('REDIS_URL'))
+        self.details_cache_ttl = 7 * 24 * 3600
+        self.details_concurrency = 5  # Simultaneous detail requests per city
         
         # Country bounding boxes for comprehensive data collection
         self.country_bounds = {
@@ -46,25 +52,19 @@ class OpenTripMapService:
     
     async def __aenter__(self):
         """Async context manager entry"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        return False
     
+    @coalesce('opentripmap')
     async def get_city_info(self, city_name: str, country_code: str = None) -> Optional[Dict]:
         """Get basic information about a city."""
         if not self.api_key:
             return self._get_fallback_city_info(city_name, country_code)
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/places/geoname"
             params = {
                 'name': city_name,
@@ -74,7 +74,7 @@ class OpenTripMapService:
             if country_code:
                 params['country'] = country_code
             
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, provider='opentripmap') as response:
                 if response.status == 200:
                     data = await response.json()
                     if data.get('status') == 'OK':
@@ -113,16 +113,12 @@ class OpenTripMapService:
         cities = []
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             # Approach 1: Get major cities by searching known city names
             major_cities = self._get_fallback_cities(country)
             for city in major_cities:
                 city_info = await self.get_city_info(city['name'], country_info['code'])
                 if city_info and city_info.get('source') == 'opentripmap':
                     cities.append(city_info)
-                    await asyncio.sleep(0.1)  # Rate limiting
             
             logger.info(f"Found {len(cities)} verified cities in {country}")
             
@@ -141,6 +137,7 @@ class OpenTripMapService:
             logger.error(f"OpenTripMap cities lookup error for {country}: {e}")
             return self._get_fallback_cities(country)
     
+    @coalesce('opentripmap')
     async def get_city_attractions(self, coordinates: Coordinates, radius_km: int = 10, 
                                  limit: int = 50, kinds: str = None) -> List[Dict]:
         """Get attractions and points of interest near a city."""
@@ -148,9 +145,6 @@ class OpenTripMapService:
             return self._get_fallback_attractions(coordinates, limit)
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/places/radius"
             params = {
                 'radius': radius_km * 1000,  # Convert km to meters
@@ -164,13 +158,13 @@ class OpenTripMapService:
             if kinds:
                 params['kinds'] = kinds
             
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, provider='opentripmap') as response:
                 if response.status == 200:
                     data = await response.json()
                     if isinstance(data, list):
                         attractions = []
                         for attraction in data:
-                            basic_data = {
+                            attractions.append({
                                 'xid': attraction.get('xid'),
                                 'name': attraction.get('name', ''),
                                 'kinds': attraction.get('kinds', '').split(','),
@@ -182,27 +176,10 @@ class OpenTripMapService:
                                 },
                                 'wikidata': attraction.get('wikidata'),
                                 'source': 'opentripmap'
-                            }
-                            
-                            # Fetch detailed information including images for this attraction
-                            if attraction.get('xid'):
-                                try:
-                                    detailed_info = await self.get_attraction_details(attraction.get('xid'))
-                                    if detailed_info:
-                                        # Enhance with detailed information
-                                        basic_data.update({
-                                            'wikipedia': detailed_info.get('wikipedia'),
-                                            'image': detailed_info.get('image'),
-                                            'preview': detailed_info.get('preview', {}),
-                                            'address': detailed_info.get('address', ''),
-                                            'info': detailed_info.get('info', {})
-                                        })
-                                        # Rate limiting
-                                        await asyncio.sleep(0.1)
-                                except Exception as e:
-                                    logger.warning(f"Failed to get details for attraction {attraction.get('xid')}: {e}")
-                            
-                            attractions.append(basic_data)
+                            })
+                        
+                        # Fetch detailed information including images, concurrently
+                        await self._add_attraction_details(attractions)
                         
                         return attractions
                 
@@ -213,37 +190,63 @@ class OpenTripMapService:
             logger.error(f"OpenTripMap attractions lookup error: {e}")
             return self._get_fallback_attractions(coordinates, limit)
     
+    async def _add_attraction_details(self, attractions: List[Dict]):
+        """Merge cached or freshly fetched details into attractions, fetching concurrently."""
+        semaphore = asyncio.Semaphore(self.details_concurrency)
+        
+        async def add_details(attraction: Dict):
+            async with semaphore:
+                try:
+                    details = await self.get_attraction_details(attraction['xid'])
+                except Exception as e:
+                    logger.warning(f"Failed to get details for attraction {attraction['xid']}: {e}")
+                    return
+            if details:
+                attraction.update({
+                    'wikipedia': details.get('wikipedia'),
+                    'image': details.get('image'),
+                    'preview': details.get('preview', {}),
+                    'address': details.get('address', ''),
+                    'info': details.get('info', {})
+                })
+        
+        await asyncio.gather(*(add_details(a) for a in attractions if a.get('xid')))
+    
+    @coalesce('opentripmap')
     async def get_attraction_details(self, xid: str) -> Optional[Dict]:
-        """Get detailed information about a specific attraction."""
+        """
+        Get detailed information about a specific attraction.
+        
+        Only the fields shown for attractions are kept, and results are cached
+        by xid since details rarely change.
+        """
         if not self.api_key:
             return None
         
+        cache_key = f"opentripmap:details:{xid}"
+        cached = self.details_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/places/xid/{xid}"
             params = {'apikey': self.api_key}
             
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, provider='opentripmap') as response:
                 if response.status == 200:
                     data = await response.json()
-                    return {
+                    details = {
                         'xid': data.get('xid'),
                         'name': data.get('name', ''),
                         'address': data.get('address', {}).get('country', ''),
-                        'rate': data.get('rate', 0),
-                        'kinds': data.get('kinds', '').split(','),
-                        'info': data.get('info', {}),
+                        'info': {'descr': data['info']['descr']} if data.get('info', {}).get('descr') else {},
                         'wikipedia': data.get('wikipedia'),
                         'image': data.get('image'),
-                        'preview': data.get('preview', {}),
-                        'coordinates': {
-                            'latitude': data.get('point', {}).get('lat'),
-                            'longitude': data.get('point', {}).get('lon')
-                        },
+                        'preview': {'source': data['preview']['source']} if data.get('preview', {}).get('source') else {},
                         'source': 'opentripmap'
                     }
+                    self.details_cache.set(cache_key, details, self.details_cache_ttl)
+                    return details
                 
                 logger.warning(f"OpenTripMap attraction details failed for {xid}: {response.status}")
                 return None
@@ -263,9 +266,6 @@ class OpenTripMapService:
             logger.info(f"Starting comprehensive city search for {country}")
             cities = await self.get_cities_in_country(country, limit=2000)
             results[country] = cities
-            
-            # Add a small delay to respect API rate limits
-            await asyncio.sleep(1)
         
         return results
     
@@ -9,8 +9,8 @@ from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import time
 import asyncio
-import aiohttp
 from ..core.models import City, ServiceResult, TripRequest
+from ..infrastructure.http_client import get_http_session
 from ..core.exceptions import TravelPlannerException
 
 logger = structlog.get_logger(__name__)
@@ -22,7 +22,6 @@ class RealPlacesService:
     def __init__(self):
         self.google_api_key = os.getenv('GOOGLE_PLACES_API_KEY')
         self.base_url = "https://maps.googleapis.com/maps/api/place"
-        self.session = None
         
         if not self.google_api_key:
             logger.warning("Google Places API key not configured - will use fallback data")
@@ -133,10 +132,7 @@ class RealPlacesService:
             params['keyword'] = keyword
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            async with self.session.get(url, params=params) as response:
+            async with get_http_session().get(url, params=params) as response:
                 if response.status == 200:
                     data = await response.json()
                     return data.get('results', [])
@@ -159,10 +155,7 @@ class RealPlacesService:
         }
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
-            async with self.session.get(url, params=params) as response:
+            async with get_http_session().get(url, params=params) as response:
                 if response.status == 200:
                     data = await response.json()
                     return data.get('result')
@@ -402,6 +395,4 @@ class RealPlacesService:
         ]
     
     async def close(self):
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
\ No newline at end of file
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
\ No newline at end of file
@@ -0,0 +1,415 @@
+"""
+Offline road routing over a preprocessed road graph.
+
+The graph is built from an OSM extract by scripts/build_road_graph.py and
+stored as compact CSR arrays (.npz). Point-to-point queries use A* with
+landmarks (ALT); many-to-many time matrices run one bounded Dijkstra per
+source. Cities are snapped to their nearest graph node.
+"""
+import functools
+import heapq
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from ..core.models import City
+
+logger = structlog.get_logger(__name__)
+
+EARTH_RADIUS_KM = 6371
+DEFAULT_GRAPH_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'road_graph.npz')
+
+
+@dataclass
+class RoadRoute:
+    """Result of a road graph query."""
+    duration_hours: float
+    distance_km: float
+    nodes: List[int]
+
+
+def _unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """Points on the unit sphere, so chord distance orders like great-circle distance."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class RoadGraph:
+    """
+    Directed road network in compressed sparse row form.
+    
+    Edge weights are travel time in seconds with lengths in metres alongside.
+    Optional landmark tables hold travel times from and to a few far-apart
+    nodes and give A* an admissible heuristic.
+    """
+    
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, travel_seconds: np.ndarray,
+                 length_m: np.ndarray, node_lat: np.ndarray, node_lon: np.ndarray,
+                 landmark_from: Optional[np.ndarray] = None,
+                 landmark_to: Optional[np.ndarray] = None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.travel_seconds = np.asarray(travel_seconds, dtype=np.float32)
+        self.length_m = np.asarray(length_m, dtype=np.float32)
+        self.node_lat = np.asarray(node_lat, dtype=np.float64)
+        self.node_lon = np.asarray(node_lon, dtype=np.float64)
+        self.landmark_from = landmark_from
+        self.landmark_to = landmark_to
+        
+        self._tree: Optional[cKDTree] = None
+        self._csr: Optional[csr_matrix] = None
+        self._edge_keys: Optional[np.ndarray] = None
+        self._edge_order: Optional[np.ndarray] = None
+    
+    @property
+    def node_count(self) -> int:
+        return len(self.indptr) - 1
+    
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+    
+    @classmethod
+    def from_edges(cls, node_lat, node_lon, sources, targets, travel_seconds, length_m) -> 'RoadGraph':
+        """Build CSR arrays from an edge list, keeping the fastest of parallel edges."""
+        node_count = len(node_lat)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        travel_seconds = np.asarray(travel_seconds, dtype=np.float64)
+        length_m = np.asarray(length_m, dtype=np.float64)
+        
+        # Sort by (source, target, time) and keep the first of each pair
+        order = np.lexsort((travel_seconds, targets, sources))
+        sources, targets = sources[order], targets[order]
+        travel_seconds, length_m = travel_seconds[order], length_m[order]
+        keep = np.ones(len(sources), dtype=bool)
+        keep[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        keep &= sources != targets
+        
+        sources, targets = sources[keep], targets[keep]
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+        return cls(indptr, targets, travel_seconds[keep], length_m[keep], node_lat, node_lon)
+    
+    @classmethod
+    def load(cls, path: str) -> 'RoadGraph':
+        """Load a graph written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            has_landmarks = 'landmark_from' in data.files
+            return cls(
+                data['indptr'], data['indices'], data['travel_seconds'], data['length_m'],
+                data['node_lat'], data['node_lon'],
+                data['landmark_from'] if has_landmarks else None,
+                data['landmark_to'] if has_landmarks else None
+            )
+    
+    def save(self, path: str):
+        """Write the graph as compressed arrays."""
+        arrays = {
+            'indptr': self.indptr, 'indices': self.indices,
+            'travel_seconds': self.travel_seconds, 'length_m': self.length_m,
+            'node_lat': self.node_lat, 'node_lon': self.node_lon
+        }
+        if self.landmark_from is not None:
+            arrays['landmark_from'] = self.landmark_from
+            arrays['landmark_to'] = self.landmark_to
+        np.savez_compressed(path, **arrays)
+    
+    def to_csr(self, weights: Optional[np.ndarray] = None) -> csr_matrix:
+        """SciPy view of the graph for csgraph routines."""
+        data = self.travel_seconds if weights is None else weights
+        return csr_matrix((data.astype(np.float64), self.indices, self.indptr),
+                          shape=(self.node_count, self.node_count))
+    
+    def _travel_time_csr(self) -> csr_matrix:
+        """Travel-time CSR matrix, built once since the float64 copy is O(E)."""
+        if self._csr is None:
+            self._csr = self.to_csr()
+        return self._csr
+    
+    def select_landmarks(self, count: int = 8):
+        """
+        Pick far-apart landmarks and store travel times from and to them.
+        
+        Uses farthest-point selection on travel time, which spreads landmarks
+        around the edge of the network where they give the tightest bounds.
+        """
+        forward = self._travel_time_csr()
+        backward = forward.T.tocsr()
+        
+        landmarks = [int(np.argmax(self.node_lat))]
+        from_rows = []
+        to_rows = []
+        for _ in range(count):
+            from_rows.append(dijkstra(forward, indices=landmarks[-1]))
+            to_rows.append(dijkstra(backward, indices=landmarks[-1]))
+            
+            # Next landmark: reachable node farthest from all chosen ones
+            closest = np.min(np.where(np.isfinite(from_rows), from_rows, -1), axis=0)
+            closest[landmarks] = -1
+            if closest.max() <= 0:
+                break
+            landmarks.append(int(np.argmax(closest)))
+        
+        self.landmark_from = np.asarray(from_rows, dtype=np.float32)
+        self.landmark_to = np.asarray(to_rows, dtype=np.float32)
+        logger.info("Selected road graph landmarks", count=len(from_rows))
+    
+    def nearest_node(self, latitude: float, longitude: float) -> Tuple[int, float]:
+        """Nearest graph node to a point and its great-circle distance in km."""
+        if self._tree is None:
+            self._tree = cKDTree(_unit_vectors(self.node_lat, self.node_lon))
+        
+        chord, node = self._tree.query(_unit_vectors([latitude], [longitude])[0])
+        return int(node), float(2 * EARTH_RADIUS_KM * np.arcsin(min(chord / 2, 1.0)))
+    
+    def shortest_path(self, source: int, target: int) -> Optional[RoadRoute]:
+        """Fastest route between two nodes using A* with landmarks."""
+        if source == target:
+            return RoadRoute(0.0, 0.0, [source])
+        
+        # Only the nodes the search touches are read, so a query costs nothing per graph node
+        indptr, indices, weights = self.indptr, self.indices, self.travel_seconds
+        heuristic = self._landmark_heuristic(target)
+        
+        best = {source: 0.0}
+        parent = {source: -1}
+        heap = [(heuristic(source), 0.0, source)]
+        settled = set()
+        
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if node in settled:
+                continue
+            settled.add(node)
+            
+            first, last = int(indptr[node]), int(indptr[node + 1])
+            for neighbor, weight in zip(indices[first:last].tolist(), weights[first:last].tolist()):
+                candidate = cost + weight
+                if candidate < best.get(neighbor, float('inf')):
+                    best[neighbor] = candidate
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (candidate + heuristic(neighbor), candidate, neighbor))
+        else:
+            return None
+        
+        nodes = [target]
+        while parent[nodes[-1]] != -1:
+            nodes.append(parent[nodes[-1]])
+        nodes.reverse()
+        
+        return RoadRoute(
+            duration_hours=best[target] / 3600,
+            distance_km=float(self._edge_lengths(np.array(nodes[:-1]), np.array(nodes[1:])).sum()) / 1000,
+            nodes=nodes
+        )
+    
+    def time_matrix(self, nodes: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Many-to-many travel times (hours) and distances (km) between nodes.
+        
+        Runs one Dijkstra per source, stopping once every target is settled,
+        and walks the predecessor trees back to sum edge lengths.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        graph = self._travel_time_csr()
+        hours = np.full((len(nodes), len(nodes)), np.inf)
+        km = np.full((len(nodes), len(nodes)), np.inf)
+        
+        for row, source in enumerate(nodes):
+            seconds, predecessors = dijkstra(
+                graph, indices=int(source), return_predecessors=True,
+                limit=self._search_limit(int(source), nodes)
+            )
+            hours[row] = seconds[nodes] / 3600
+            km[row] = self._path_lengths(int(source), nodes, predecessors) / 1000
+        
+        return hours, km
+    
+    def _search_limit(self, source: int, targets: np.ndarray) -> float:
+        """Upper bound on the farthest target's travel time, from landmark tables."""
+        if self.landmark_from is None:
+            return np.inf
+        
+        # d(s, t) <= d(s, L) + d(L, t) for every landmark L
+        bounds = self.landmark_to[:, source][:, None] + self.landmark_from[:, targets]
+        limit = float(np.min(bounds, axis=0).max())
+        return limit * 1.0001 if np.isfinite(limit) else np.inf
+    
+    def _landmark_heuristic(self, target: int) -> Callable[[int], float]:
+        """
+        Admissible lower bound on travel time from a node to the target.
+        
+        max over landmarks L of d(L, t) - d(L, v) and d(v, L) - d(t, L),
+        evaluated per node as the search reaches it and memoized per query.
+        """
+        if self.landmark_from is None:
+            return lambda node: 0.0
+        
+        from_target = self.landmark_from[:, target]
+        to_target = self.landmark_to[:, target]
+        bounds: Dict[int, float] = {}
+        
+        def heuristic(node: int) -> float:
+            bound = bounds.get(node)
+            if bound is None:
+                with np.errstate(invalid='ignore'):
+                    terms = np.maximum(from_target - self.landmark_from[:, node],
+                                       self.landmark_to[:, node] - to_target)
+                # Unreachable landmarks give no information
+                terms = terms[np.isfinite(terms)]
+                bound = max(float(terms.max()), 0.0) if terms.size else 0.0
+                bounds[node] = bound
+            return bound
+        
+        return heuristic
+    
+    def _edge_lengths(self, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Vectorized lookup of edge lengths by (source, target)."""
+        if self._edge_keys is None:
+            rows = np.repeat(np.arange(self.node_count, dtype=np.int64), np.diff(self.indptr))
+            keys = rows * self.node_count + self.indices
+            self._edge_order = np.argsort(keys, kind='stable')
+            self._edge_keys = keys[self._edge_order]
+        
+        position = np.searchsorted(self._edge_keys, sources * self.node_count + targets)
+        return self.length_m[self._edge_order[position]].astype(np.float64)
+    
+    def _path_lengths(self, source: int, targets: np.ndarray, predecessors: np.ndarray) -> np.ndarray:
+        """Sum edge lengths along predecessor paths to all targets at once."""
+        lengths = np.zeros(len(targets))
+        current = targets.copy()
+        active = (current != source) & (predecessors[current] >= 0)
+        lengths[(current != source) & ~active] = np.inf
+        
+        while active.any():
+            previous = predecessors[current[active]]
+            lengths[active] += self._edge_lengths(previous, current[active])
+            current[active] = previous
+            active &= current != source
+        return lengths
+
+
+class RoadGraphService:
+    """Snaps cities onto the bundled road graph and answers route queries."""
+    
+    def __init__(self, graph_path: str = None, max_snap_km: float = 25.0,
+                 access_speed_kmh: float = 40.0, snap_cache_size: int = 4096):
+        self.graph_path = graph_path or os.getenv('ROAD_GRAPH_PATH', DEFAULT_GRAPH_PATH)
+        self.max_snap_km = max_snap_km
+        self.access_speed_kmh = access_speed_kmh
+        self._graph: Optional[RoadGraph] = None
+        self._load_attempted = False
+        self._lock = threading.Lock()
+        # Bounded: candidate coordinates come from many sources over the process lifetime
+        self._snap_node = functools.lru_cache(maxsize=snap_cache_size)(self._nearest_within_reach)
+    
+    @property
+    def graph(self) -> Optional[RoadGraph]:
+        """Lazily loaded graph, or None when no graph file is bundled."""
+        if not self._load_attempted:
+            with self._lock:
+                if not self._load_attempted:
+                    self._graph = self._load_graph()
+                    self._load_attempted = True
+        return self._graph
+    
+    def is_available(self) -> bool:
+        return self.graph is not None
+    
+    def _load_graph(self) -> Optional[RoadGraph]:
+        if not os.path.exists(self.graph_path):
+            logger.info("No road graph bundled, offline routing disabled", path=self.graph_path)
+            return None
+        try:
+            graph = RoadGraph.load(self.graph_path)
+            logger.info("Road graph loaded", nodes=graph.node_count, edges=graph.edge_count,
+                        landmarks=0 if graph.landmark_from is None else len(graph.landmark_from))
+            return graph
+        except Exception as e:
+            logger.error("Failed to load road graph", path=self.graph_path, error=str(e))
+            return None
+    
+    def _snap(self, city: City) -> Optional[Tuple[int, float]]:
+        """Nearest node for a city, or None if the city is off the graph."""
+        return self._snap_node(round(city.coordinates.latitude, 5), round(city.coordinates.longitude, 5))
+    
+    def _nearest_within_reach(self, latitude: float, longitude: float) -> Optional[Tuple[int, float]]:
+        node, distance_km = self.graph.nearest_node(latitude, longitude)
+        return (node, distance_km) if distance_km <= self.max_snap_km else None
+    
+    def route(self, cities: List[City]) -> Optional[Dict]:
+        """Drive time and distance through cities in order, or None if not routable."""
+        if not self.is_available() or len(cities) < 2:
+            return None
+        
+        snapped = [self._snap(city) for city in cities]
+        if any(snap is None for snap in snapped):
+            return None
+        
+        total_hours = 0.0
+        total_km = 0.0
+        for (origin, origin_access), (destination, destination_access) in zip(snapped, snapped[1:]):
+            leg = self.graph.shortest_path(origin, destination)
+            if leg is None:
+                return None
+            access_km = origin_access + destination_access
+            total_hours += leg.duration_hours + access_km / self.access_speed_kmh
+            total_km += leg.distance_km + access_km
+        
+        return {'distance_km': total_km, 'duration_hours': total_hours}
+    
+    def leg_geometry(self, origin: City, destination: City) -> Optional[List[Tuple[float, float]]]:
+        """Road node coordinates along the fastest path between two cities."""
+        if not self.is_available():
+            return None
+        
+        snapped = [self._snap(origin), self._snap(destination)]
+        if any(snap is None for snap in snapped):
+            return None
+        
+        leg = self.graph.shortest_path(snapped[0][0], snapped[1][0])
+        if leg is None:
+            return None
+        return list(zip(self.graph.node_lat[leg.nodes].tolist(), self.graph.node_lon[leg.nodes].tolist()))
+    
+    def matrix(self, cities: List[City]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Pairwise (distance_km, duration_hours) matrices, or None if not routable."""
+        if not self.is_available():
+            return None
+        
+        snapped = [self._snap(city) for city in cities]
+        if any(snap is None for snap in snapped):
+            return None
+        
+        nodes = [node for node, _ in snapped]
+        access = np.array([distance for _, distance in snapped])
+        hours, km = self.graph.time_matrix(nodes)
+        if not np.isfinite(hours).all():
+            return None
+        
+        access_km = access[:, None] + access[None, :]
+        np.fill_diagonal(access_km, 0.0)
+        return km + access_km, hours + access_km / self.access_speed_kmh
+
+
+# Global road graph service instance
+_road_graph_service = None
+
+
+def get_road_graph_service() -> RoadGraphService:
+    """Get the global road graph service instance."""
+    global _road_graph_service
+    if _road_graph_service is None:
+        _road_graph_service = RoadGraphService()
+    return _road_graph_service
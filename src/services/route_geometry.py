@@ -0,0 +1,161 @@
+"""
+Route polyline construction, simplification and encoding.
+
+Map payloads carry Google encoded-polyline strings per zoom level instead of
+raw coordinate lists. Each level is simplified with Douglas-Peucker at a
+tolerance of about one screen pixel for that zoom.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.models import City
+
+Point = Tuple[float, float]
+
+# Web Mercator metres per pixel at zoom 0 on the equator (256 px tiles)
+METERS_PER_PIXEL_Z0 = 156543.03
+DEFAULT_ZOOM_LEVELS = (5, 8, 11, 14)
+POLYLINE_PRECISION = 5
+
+
+def encode_polyline(points: Sequence[Point], precision: int = POLYLINE_PRECISION) -> str:
+    """Encode (lat, lon) points with Google's encoded polyline algorithm."""
+    factor = 10 ** precision
+    encoded = []
+    previous_lat = previous_lon = 0
+    
+    for lat, lon in points:
+        lat_e, lon_e = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat_e - previous_lat, lon_e - previous_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous_lat, previous_lon = lat_e, lon_e
+    
+    return ''.join(encoded)
+
+
+def decode_polyline(encoded: str, precision: int = POLYLINE_PRECISION) -> List[Point]:
+    """Decode a Google encoded polyline back into (lat, lon) points."""
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    
+    return points
+
+
+def simplify_polyline(points: Sequence[Point], tolerance_m: float) -> List[Point]:
+    """
+    Douglas-Peucker simplification with a tolerance in metres.
+    
+    Points are projected onto a local equirectangular plane, which is
+    accurate enough at route scale, and the recursion runs on an explicit
+    stack with vectorized segment distances.
+    """
+    if len(points) <= 2 or tolerance_m <= 0:
+        return list(points)
+    
+    coords = np.asarray(points, dtype=np.float64)
+    mean_lat = math.radians(coords[:, 0].mean())
+    xy = np.column_stack((
+        np.radians(coords[:, 1]) * math.cos(mean_lat),
+        np.radians(coords[:, 0])
+    )) * 6371000
+    
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        
+        start, end = xy[first], xy[last]
+        segment = end - start
+        inner = xy[first + 1:last]
+        length_sq = segment @ segment
+        if length_sq == 0:
+            distances = np.linalg.norm(inner - start, axis=1)
+        else:
+            t = np.clip((inner - start) @ segment / length_sq, 0.0, 1.0)
+            distances = np.linalg.norm(inner - (start + t[:, None] * segment), axis=1)
+        
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    
+    return [tuple(point) for point in coords[keep].tolist()]
+
+
+def zoom_tolerance_m(zoom: int, latitude: float) -> float:
+    """Ground size of one screen pixel at a zoom level and latitude."""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def build_route_polyline(cities: List[City]) -> List[Point]:
+    """
+    Full-detail polyline through the cities in order.
+    
+    Uses road graph geometry for each leg when a graph is bundled and the
+    leg is routable, otherwise a straight line between the cities.
+    """
+    from .road_graph_service import get_road_graph_service
+    
+    stops = [(city.coordinates.latitude, city.coordinates.longitude) for city in cities]
+    road_graph = get_road_graph_service()
+    if len(cities) < 2 or not road_graph.is_available():
+        return stops
+    
+    polyline = [stops[0]]
+    for origin, destination, end in zip(cities, cities[1:], stops[1:]):
+        polyline.extend(road_graph.leg_geometry(origin, destination) or [])
+        polyline.append(end)
+    return polyline
+
+
+def encode_route_geometry(points: Sequence[Point],
+                          zoom_levels: Sequence[int] = DEFAULT_ZOOM_LEVELS) -> Optional[Dict]:
+    """Encoded polylines per zoom level, plus the overview points for legacy clients."""
+    if len(points) < 2:
+        return None
+    
+    latitude = float(np.mean([lat for lat, _ in points]))
+    levels = {}
+    overview = list(points)
+    for zoom in zoom_levels:
+        simplified = simplify_polyline(points, zoom_tolerance_m(zoom, latitude))
+        levels[str(zoom)] = encode_polyline(simplified)
+        if zoom == zoom_levels[0]:
+            overview = simplified
+    
+    return {
+        'encoding': 'google_polyline',
+        'precision': POLYLINE_PRECISION,
+        'levels': levels,
+        'overview': [[round(lat, POLYLINE_PRECISION), round(lon, POLYLINE_PRECISION)] for lat, lon in overview],
+        'point_count': len(points)
+    }
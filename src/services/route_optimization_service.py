@@ -5,16 +5,37 @@ Advanced algorithms for optimizing intermediate city selection and sequencing.
 Implements multiple optimization strategies for different travel scenarios.
 """
 import math
+import os
 import random
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Tuple, Callable, ClassVar, FrozenSet
+from dataclasses import dataclass, field
+from functools import cached_property
+from itertools import combinations
 from datetime import datetime, timedelta
+import numpy as np
 import structlog
 
 from ..core.models import City, Coordinates
 
 logger = structlog.get_logger(__name__)
 
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_matrix(latitudes, longitudes) -> np.ndarray:
+    """Pairwise great-circle distances in km for sequences of degrees."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
 
 @dataclass
 class RouteOptimizationConfig:
@@ -28,13 +49,38 @@ class RouteOptimizationConfig:
     balance_variety: bool = True
     
     # Algorithm-specific parameters
-    genetic_population_size: int = 50
-    genetic_generations: int = 100
+    genetic_population_size: int = 200
+    genetic_generations: int = 300
     genetic_mutation_rate: float = 0.1
     
     simulated_annealing_initial_temp: float = 1000.0
     simulated_annealing_cooling_rate: float = 0.95
     simulated_annealing_min_temp: float = 1.0
+    
+    # Parallel tempering (opt-in, for batch precomputation and long trips)
+    parallel_annealing_enabled: bool = False
+    parallel_annealing_chains: int = 4
+    parallel_annealing_workers: Optional[int] = None  # Defaults to min(chains, CPUs)
+    parallel_annealing_rounds: int = 8  # Replica exchanges per run
+    parallel_annealing_steps_per_round: int = 250
+    parallel_annealing_min_temp: float = 0.002  # Coldest chain, in route score units
+    parallel_annealing_max_temp: float = 0.2  # Hottest chain
+    
+    # Portfolio scheduling
+    time_budget_seconds: float = 1.5  # Total wall time for all algorithms
+    plateau_tolerance: float = 0.001  # Score gain below this counts as no improvement
+    plateau_patience: int = 2  # Stop after this many non-improving algorithms
+    genetic_plateau_generations: int = 15  # Stop GA after this many stale generations
+    small_instance_candidates: int = 15  # Exact subset DP is used at or below this size
+    exact_dp_max_transitions: int = 200_000  # ...and only when its state transitions fit the budget
+    local_search_max_candidates: int = 200  # Highest-quality cities tried as local search swaps
+    corridor_dp_paths_per_count: int = 5  # Corridor DP paths re-scored per stop count
+    corridor_dp_max_candidates: int = 400  # Highest-quality cities kept for corridor DP
+    
+    # Ordering local search
+    neighbor_list_size: int = 8  # Nearest cities considered per 2-opt/Or-opt move
+    or_opt_max_segment: int = 3  # Longest segment relocated by Or-opt
+    large_instance_candidates: int = 60  # Population methods are deprioritised above this
 
 
 @dataclass
@@ -46,6 +92,83 @@ class OptimizedRoute:
     optimization_method: str
     performance_metrics: Dict[str, float]
     routing_explanation: str
+    algorithm_reports: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class RouteInstance:
+    """
+    A single optimization problem over integer city indices.
+    
+    Index 0 is the start city, index 1 the end city and every index from 2
+    is a candidate. The distance matrix is built once per optimize_route
+    call and dropped with the instance, so nothing is cached across requests.
+    """
+    cities: List[City]
+    distances: np.ndarray
+    quality: np.ndarray
+    city_types: List[FrozenSet[str]]
+    
+    START: ClassVar[int] = 0
+    END: ClassVar[int] = 1
+    
+    @classmethod
+    def build(
+        cls,
+        start_city: City,
+        end_city: City,
+        candidates: List[City],
+        city_scores: Dict[str, float]
+    ) -> 'RouteInstance':
+        """Build the distance matrix and per-city arrays for one request."""
+        cities = [start_city, end_city] + list(candidates)
+        distances = haversine_matrix(
+            [city.coordinates.latitude for city in cities],
+            [city.coordinates.longitude for city in cities]
+        )
+        quality = np.array([city_scores.get(city.name, 0.5) for city in cities], dtype=np.float64)
+        city_types = [frozenset(getattr(city, 'types', None) or ()) for city in cities]
+        return cls(cities=cities, distances=distances, quality=quality, city_types=city_types)
+    
+    @property
+    def candidate_indices(self) -> List[int]:
+        return list(range(2, len(self.quality)))
+    
+    @property
+    def direct_distance(self) -> float:
+        return float(self.distances[self.START, self.END])
+    
+    @cached_property
+    def progress(self) -> np.ndarray:
+        """Distance of each city's projection along the start-end axis (law of cosines)."""
+        direct = self.direct_distance
+        from_start = self.distances[self.START]
+        to_end = self.distances[:, self.END]
+        if direct <= 0:
+            return from_start.copy()
+        return (from_start ** 2 - to_end ** 2 + direct ** 2) / (2 * direct)
+    
+    @cached_property
+    def type_matrix(self) -> np.ndarray:
+        """Boolean (cities x distinct types) matrix for vectorized variety scoring."""
+        vocabulary = sorted(set().union(*self.city_types))
+        column = {name: i for i, name in enumerate(vocabulary)}
+        matrix = np.zeros((len(self.cities), len(vocabulary)), dtype=bool)
+        for row, types in enumerate(self.city_types):
+            matrix[row, [column[name] for name in types]] = True
+        return matrix
+    
+    def path(self, stops: List[int]) -> List[int]:
+        """Full index path from start through the stops to the end."""
+        return [self.START] + list(stops) + [self.END]
+    
+    def leg_distances(self, stops: List[int]) -> np.ndarray:
+        """Distances of each consecutive leg of the full path."""
+        path = np.asarray(self.path(stops), dtype=np.intp)
+        return self.distances[path[:-1], path[1:]]
+    
+    def to_cities(self, stops: List[int]) -> List[City]:
+        return [self.cities[i] for i in stops]
 
 
 class RouteOptimizationService:
@@ -53,7 +176,6 @@ class RouteOptimizationService:
     
     def __init__(self):
         self.config = RouteOptimizationConfig()
-        self.distance_cache: Dict[Tuple[str, str], float] = {}
     
     def optimize_route(
         self,
@@ -62,12 +184,14 @@ class RouteOptimizationService:
         candidate_cities: List[City],
         max_cities: int,
         route_type: str,
-        city_scores: Dict[str, float] = None
+        city_scores: Dict[str, float] = None,
+        time_budget_seconds: Optional[float] = None
     ) -> OptimizedRoute:
         """
         Optimize route using the best available algorithm.
         
-        Tries multiple optimization approaches and returns the best result.
+        Runs a portfolio of algorithms chosen by instance size within a wall
+        time budget, stopping early once the best score plateaus.
         """
         
         if not candidate_cities:
@@ -80,183 +204,289 @@ class RouteOptimizationService:
                 routing_explanation="No candidate cities available"
             )
         
+        instance = RouteInstance.build(start_city, end_city, candidate_cities, city_scores or {})
+        
         if len(candidate_cities) <= max_cities:
             # If we have few enough candidates, use all and optimize order
-            selected_cities = candidate_cities
+            selected = instance.candidate_indices
             optimization_method = "simple_ordering"
         else:
-            # Multiple algorithms for selection and optimization
-            algorithms = [
-                self._genetic_algorithm_optimization,
-                self._simulated_annealing_optimization,
-                self._greedy_optimization_with_local_search,
-                self._dynamic_programming_optimization
-            ]
-            
-            best_result = None
-            best_score = -1
-            
-            for algorithm in algorithms:
-                try:
-                    result = algorithm(
-                        start_city, end_city, candidate_cities, max_cities, 
-                        route_type, city_scores or {}
-                    )
-                    
-                    if result.total_score > best_score:
-                        best_score = result.total_score
-                        best_result = result
-                        
-                except Exception as e:
-                    logger.warning(f"Optimization algorithm failed: {e}")
-                    continue
+            best_result = self._run_portfolio(
+                instance, max_cities, route_type,
+                time_budget_seconds if time_budget_seconds is not None
+                else self.config.time_budget_seconds
+            )
             
             if best_result:
                 return best_result
             
             # Fallback to simple greedy if all algorithms fail
-            selected_cities = self._greedy_selection(
-                start_city, end_city, candidate_cities, max_cities, city_scores or {}
-            )
+            selected = self._greedy_selection(instance, max_cities)
             optimization_method = "greedy_fallback"
         
         # Optimize the order of selected cities
-        optimized_order = self._optimize_city_order(start_city, end_city, selected_cities)
+        optimized_order = self._optimize_city_order(instance, selected)
         
-        # Calculate final metrics
-        total_distance = self._calculate_total_route_distance(
-            [start_city] + optimized_order + [end_city]
+        return self._build_result(
+            instance, optimized_order,
+            self._calculate_route_score(instance, optimized_order),
+            optimization_method,
+            self._generate_routing_explanation(instance, optimized_order, optimization_method)
         )
-        
-        total_score = self._calculate_route_score(
-            start_city, end_city, optimized_order, route_type, city_scores or {}
+    
+    def _build_result(
+        self,
+        instance: RouteInstance,
+        stops: List[int],
+        score: float,
+        method: str,
+        explanation: str
+    ) -> OptimizedRoute:
+        """Convert an index solution back into an OptimizedRoute of cities."""
+        return OptimizedRoute(
+            cities=instance.to_cities(stops),
+            total_distance=self._calculate_total_route_distance(instance, instance.path(stops)),
+            total_score=score,
+            optimization_method=method,
+            performance_metrics=self._calculate_performance_metrics(instance, stops),
+            routing_explanation=explanation
         )
+    
+    def _select_portfolio(
+        self, num_candidates: int, max_cities: int
+    ) -> List[Tuple[str, Callable[..., OptimizedRoute]]]:
+        """Choose and order algorithms for an instance of the given size."""
+        
+        greedy = ("greedy_with_local_search", self._greedy_optimization_with_local_search)
+        annealing = ("simulated_annealing", self._simulated_annealing_optimization)
+        genetic = ("genetic_algorithm", self._genetic_algorithm_optimization)
+        exact = ("dynamic_programming", self._dynamic_programming_optimization)
+        
+        if self._exact_dp_affordable(num_candidates, max_cities):
+            # Exact search is affordable; heuristics only polish ties
+            return [exact, greedy, annealing]
+        if num_candidates <= self.config.large_instance_candidates:
+            return [exact, greedy, genetic, annealing]
+        # Large pools: cheap corridor DP first, population search last
+        return [exact, greedy, annealing, genetic]
+    
+    def _run_portfolio(
+        self,
+        instance: RouteInstance,
+        max_cities: int,
+        route_type: str,
+        time_budget_seconds: float
+    ) -> Optional[OptimizedRoute]:
+        """Run the algorithm portfolio under a time budget and keep the best result."""
+        
+        num_candidates = len(instance.candidate_indices)
+        portfolio = self._select_portfolio(num_candidates, max_cities)
+        started = time.perf_counter()
+        deadline = started + time_budget_seconds
+        
+        best_result = None
+        best_score = -1.0
+        stale_runs = 0
+        reports = []
+        
+        for name, algorithm in portfolio:
+            if time.perf_counter() >= deadline:
+                reports.append({'algorithm': name, 'status': 'skipped_budget'})
+                continue
+            if stale_runs >= self.config.plateau_patience:
+                reports.append({'algorithm': name, 'status': 'skipped_plateau'})
+                continue
+            
+            algorithm_start = time.perf_counter()
+            try:
+                result = algorithm(instance, max_cities, route_type, deadline=deadline)
+            except Exception as e:
+                logger.warning(f"Optimization algorithm failed: {e}")
+                reports.append({
+                    'algorithm': name,
+                    'status': 'failed',
+                    'wall_time_ms': round((time.perf_counter() - algorithm_start) * 1000, 2),
+                    'error': str(e)
+                })
+                continue
+            
+            gain = result.total_score - best_score if best_result else result.total_score
+            reports.append({
+                'algorithm': name,
+                'status': 'completed',
+                'wall_time_ms': round((time.perf_counter() - algorithm_start) * 1000, 2),
+                'score': round(result.total_score, 6),
+                'gain': round(max(0.0, gain), 6)
+            })
+            
+            if result.total_score > best_score:
+                best_score = result.total_score
+                best_result = result
+            
+            stale_runs = stale_runs + 1 if gain < self.config.plateau_tolerance else 0
         
-        return OptimizedRoute(
-            cities=optimized_order,
-            total_distance=total_distance,
-            total_score=total_score,
-            optimization_method=optimization_method,
-            performance_metrics=self._calculate_performance_metrics(
-                start_city, end_city, optimized_order
-            ),
-            routing_explanation=self._generate_routing_explanation(
-                start_city, end_city, optimized_order, optimization_method
+        if best_result:
+            best_result.algorithm_reports = reports
+            best_result.performance_metrics['optimization_time_ms'] = round(
+                (time.perf_counter() - started) * 1000, 2
             )
-        )
+            logger.info("Route optimization portfolio finished",
+                       winner=best_result.optimization_method,
+                       candidates=num_candidates,
+                       elapsed_ms=best_result.performance_metrics['optimization_time_ms'])
+        
+        return best_result
     
     def _genetic_algorithm_optimization(
         self,
-        start_city: City,
-        end_city: City,
-        candidates: List[City],
+        instance: RouteInstance,
         max_cities: int,
         route_type: str,
-        city_scores: Dict[str, float]
+        deadline: Optional[float] = None
     ) -> OptimizedRoute:
-        """Genetic algorithm for route optimization."""
+        """
+        Genetic algorithm for route optimization.
+        
+        The population is a (population x max_cities) integer array of city
+        indices, each row ordered by progress along the corridor and padded
+        with the end index. Fitness, selection, crossover and mutation all
+        run on whole generations at once.
+        """
         
         logger.info("Using genetic algorithm for route optimization")
         
-        # Initialize population
-        population = []
-        for _ in range(self.config.genetic_population_size):
-            individual = random.sample(candidates, min(max_cities, len(candidates)))
-            population.append(individual)
+        rng = np.random.default_rng(random.getrandbits(32))
+        candidates = np.asarray(instance.candidate_indices, dtype=np.intp)
+        genes = min(max_cities, candidates.size)
+        population_size = self.config.genetic_population_size
+        elite_size = max(1, population_size // 5)
+        
+        # Initialize population with random distinct cities per row
+        initial = np.argsort(rng.random((population_size, candidates.size)), axis=1)[:, :genes]
+        membership = np.zeros((population_size, len(instance.cities)), dtype=bool)
+        np.put_along_axis(membership, candidates[initial], True, axis=1)
+        population = self._membership_to_genes(instance, membership, genes)
         
         best_individual = None
-        best_fitness = -1
+        best_fitness = -1.0
+        stale_generations = 0
         
         for generation in range(self.config.genetic_generations):
-            # Evaluate fitness for each individual
-            fitness_scores = []
-            for individual in population:
-                fitness = self._calculate_route_score(
-                    start_city, end_city, individual, route_type, city_scores
-                )
-                fitness_scores.append(fitness)
-                
-                if fitness > best_fitness:
-                    best_fitness = fitness
-                    best_individual = individual.copy()
+            if best_individual is not None and (
+                self._deadline_passed(deadline) or
+                stale_generations >= self.config.genetic_plateau_generations
+            ):
+                break
             
-            # Selection, crossover, and mutation
-            new_population = []
+            previous_best = best_fitness
+            # Evaluate fitness for the whole generation
+            fitness = self._population_fitness(instance, population)
             
-            # Keep best individuals (elitism)
-            sorted_population = sorted(
-                zip(population, fitness_scores), 
-                key=lambda x: x[1], 
-                reverse=True
-            )
+            leader = int(np.argmax(fitness))
+            if fitness[leader] > best_fitness:
+                best_fitness = float(fitness[leader])
+                best_individual = population[leader].copy()
+            
+            if best_fitness - previous_best < self.config.plateau_tolerance:
+                stale_generations += 1
+            else:
+                stale_generations = 0
             
-            elite_size = self.config.genetic_population_size // 5
-            for i in range(elite_size):
-                new_population.append(sorted_population[i][0])
+            # Keep best individuals (elitism)
+            elite = population[np.argsort(-fitness, kind='stable')[:elite_size]]
             
             # Generate offspring
-            while len(new_population) < self.config.genetic_population_size:
-                parent1 = self._tournament_selection(population, fitness_scores)
-                parent2 = self._tournament_selection(population, fitness_scores)
-                
-                offspring = self._crossover(parent1, parent2, max_cities)
-                offspring = self._mutate(offspring, candidates, max_cities)
-                
-                new_population.append(offspring)
+            offspring_count = population_size - elite_size
+            parents1 = population[self._tournament_selection(fitness, offspring_count, rng)]
+            parents2 = population[self._tournament_selection(fitness, offspring_count, rng)]
             
-            population = new_population
+            offspring = self._crossover(instance, parents1, parents2, genes, rng)
+            offspring = self._mutate(instance, offspring, candidates, genes, rng)
+            
+            population = np.vstack([elite, self._membership_to_genes(instance, offspring, genes)])
         
         # Optimize order of best individual
-        optimized_order = self._optimize_city_order(start_city, end_city, best_individual)
-        
-        total_distance = self._calculate_total_route_distance(
-            [start_city] + optimized_order + [end_city]
-        )
-        
-        return OptimizedRoute(
-            cities=optimized_order,
-            total_distance=total_distance,
-            total_score=best_fitness,
-            optimization_method="genetic_algorithm",
-            performance_metrics=self._calculate_performance_metrics(
-                start_city, end_city, optimized_order
-            ),
-            routing_explanation="Optimized using genetic algorithm for best combination of cities"
+        best_stops = [int(city) for city in best_individual if city != instance.END]
+        optimized_order = self._optimize_city_order(instance, best_stops)
+        
+        return self._build_result(
+            instance, optimized_order,
+            max(best_fitness, self._calculate_route_score(instance, optimized_order)),
+            "genetic_algorithm",
+            "Optimized using genetic algorithm for best combination of cities"
         )
     
     def _simulated_annealing_optimization(
         self,
-        start_city: City,
-        end_city: City,
-        candidates: List[City],
+        instance: RouteInstance,
         max_cities: int,
         route_type: str,
-        city_scores: Dict[str, float]
+        deadline: Optional[float] = None
     ) -> OptimizedRoute:
         """Simulated annealing optimization."""
         
+        if self.config.parallel_annealing_enabled:
+            return self._parallel_tempering_optimization(instance, max_cities, deadline)
+        
         logger.info("Using simulated annealing for route optimization")
         
+        candidates = instance.candidate_indices
+        
         # Initial solution
         current_solution = random.sample(candidates, min(max_cities, len(candidates)))
-        current_score = self._calculate_route_score(
-            start_city, end_city, current_solution, route_type, city_scores
+        current_score = self._calculate_route_score(instance, current_solution)
+        
+        chain = self._anneal(
+            instance, current_solution, current_score, max_cities,
+            temperature=self.config.simulated_annealing_initial_temp,
+            cooling_rate=self.config.simulated_annealing_cooling_rate,
+            deadline=deadline
         )
+        best_solution, best_score = chain['best_solution'], chain['best_score']
+        
+        # Optimize order
+        optimized_order = self._optimize_city_order(instance, best_solution)
         
+        return self._build_result(
+            instance, optimized_order, best_score, "simulated_annealing",
+            "Optimized using simulated annealing for balanced exploration"
+        )
+    
+    def _anneal(
+        self,
+        instance: RouteInstance,
+        current_solution: List[int],
+        current_score: float,
+        max_cities: int,
+        temperature: float,
+        cooling_rate: float = 1.0,
+        max_steps: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Run one annealing chain from a given state.
+        
+        Stops when the temperature falls below the configured minimum, after
+        max_steps, or at the deadline. A cooling rate of 1.0 keeps the
+        temperature fixed, as parallel tempering chains do.
+        """
+        
+        candidates = instance.candidate_indices
         best_solution = current_solution.copy()
         best_score = current_score
+        steps = 0
         
-        temperature = self.config.simulated_annealing_initial_temp
-        
-        while temperature > self.config.simulated_annealing_min_temp:
+        while temperature > self.config.simulated_annealing_min_temp or cooling_rate >= 1.0:
+            if self._deadline_passed(deadline) or (max_steps is not None and steps >= max_steps):
+                break
+            steps += 1
+            
             # Generate neighbor solution
             neighbor = self._generate_neighbor_solution(
                 current_solution, candidates, max_cities
             )
             
-            neighbor_score = self._calculate_route_score(
-                start_city, end_city, neighbor, route_type, city_scores
-            )
+            neighbor_score = self._calculate_route_score(instance, neighbor)
             
             # Accept or reject the neighbor
             if neighbor_score > current_score:
@@ -275,256 +505,627 @@ class RouteOptimizationService:
                     current_score = neighbor_score
             
             # Cool down
-            temperature *= self.config.simulated_annealing_cooling_rate
+            temperature *= cooling_rate
         
-        # Optimize order
-        optimized_order = self._optimize_city_order(start_city, end_city, best_solution)
+        return {
+            'solution': current_solution,
+            'score': current_score,
+            'best_solution': best_solution,
+            'best_score': best_score,
+            'temperature': temperature
+        }
+    
+    def _parallel_tempering_optimization(
+        self,
+        instance: RouteInstance,
+        max_cities: int,
+        deadline: Optional[float] = None
+    ) -> OptimizedRoute:
+        """
+        Multi-start parallel annealing with replica exchange.
         
-        total_distance = self._calculate_total_route_distance(
-            [start_city] + optimized_order + [end_city]
-        )
+        K chains with different seeds run at fixed temperatures on a
+        geometric ladder in a process pool, reading the distance matrix from
+        shared memory. Between rounds, neighbouring temperatures swap states
+        with the Metropolis criterion and the coldest chain restarts from
+        the best solution found so far.
+        """
         
-        return OptimizedRoute(
-            cities=optimized_order,
-            total_distance=total_distance,
-            total_score=best_score,
-            optimization_method="simulated_annealing",
-            performance_metrics=self._calculate_performance_metrics(
-                start_city, end_city, optimized_order
-            ),
-            routing_explanation="Optimized using simulated annealing for balanced exploration"
+        chain_count = max(2, self.config.parallel_annealing_chains)
+        logger.info("Using parallel tempering for route optimization", chains=chain_count)
+        
+        temperatures = np.geomspace(
+            self.config.parallel_annealing_min_temp,
+            self.config.parallel_annealing_max_temp,
+            chain_count
+        ).tolist()
+        
+        candidates = instance.candidate_indices
+        genes = min(max_cities, len(candidates))
+        states = []
+        for _ in range(chain_count):
+            solution = random.sample(candidates, genes)
+            states.append((solution, self._calculate_route_score(instance, solution)))
+        
+        best_solution, best_score = max(states, key=lambda state: state[1])
+        best_solution = best_solution.copy()
+        
+        shared = shared_memory.SharedMemory(create=True, size=instance.distances.nbytes)
+        try:
+            shared_distances = np.ndarray(instance.distances.shape, dtype=np.float64, buffer=shared.buf)
+            shared_distances[:] = instance.distances
+            payload = {
+                'shm_name': shared.name,
+                'shape': instance.distances.shape,
+                'quality': instance.quality,
+                'city_types': instance.city_types,
+                'config': self.config,
+                'max_cities': max_cities,
+                'steps': self.config.parallel_annealing_steps_per_round
+            }
+            
+            workers = self.config.parallel_annealing_workers or min(chain_count, os.cpu_count() or 1)
+            pool = ProcessPoolExecutor(max_workers=workers)
+            try:
+                for round_number in range(self.config.parallel_annealing_rounds):
+                    if self._deadline_passed(deadline):
+                        break
+                    
+                    # perf_counter is per process, so chains get the deadline in wall-clock time
+                    time_left = self._time_left(deadline)
+                    payload['wall_deadline'] = None if time_left is None else time.time() + time_left
+                    jobs = [
+                        pool.submit(_run_annealing_chain, payload, state[0], state[1],
+                                    temperatures[k], random.getrandbits(32))
+                        for k, state in enumerate(states)
+                    ]
+                    try:
+                        # Chains stop at the deadline themselves; the grace covers returning their state
+                        results = [
+                            job.result(timeout=None if deadline is None else self._time_left(deadline) + 0.1)
+                            for job in jobs
+                        ]
+                    except FutureTimeoutError:
+                        logger.info("Parallel tempering stopped at the deadline", rounds=round_number)
+                        break
+                    states = [(r['solution'], r['score']) for r in results]
+                    
+                    for r in results:
+                        if r['best_score'] > best_score:
+                            best_solution, best_score = r['best_solution'], r['best_score']
+                    
+                    # Replica exchange between neighbouring temperatures
+                    for k in range(chain_count - 1):
+                        (_, score_cold), (_, score_hot) = states[k], states[k + 1]
+                        exponent = (score_hot - score_cold) * (1 / temperatures[k] - 1 / temperatures[k + 1])
+                        if exponent >= 0 or random.random() < math.exp(exponent):
+                            states[k], states[k + 1] = states[k + 1], states[k]
+                    
+                    # Coldest chain intensifies around the global best
+                    states[0] = (best_solution.copy(), best_score)
+            finally:
+                # Never wait on chains still running past the deadline
+                pool.shutdown(wait=False, cancel_futures=True)
+        finally:
+            shared.close()
+            shared.unlink()
+        
+        optimized_order = self._optimize_city_order(instance, best_solution)
+        
+        return self._build_result(
+            instance, optimized_order,
+            max(best_score, self._calculate_route_score(instance, optimized_order)),
+            "parallel_tempering",
+            "Optimized using parallel annealing chains with replica exchange"
         )
     
     def _greedy_optimization_with_local_search(
         self,
-        start_city: City,
-        end_city: City,
-        candidates: List[City],
+        instance: RouteInstance,
         max_cities: int,
         route_type: str,
-        city_scores: Dict[str, float]
+        deadline: Optional[float] = None
     ) -> OptimizedRoute:
         """Greedy optimization with local search improvement."""
         
         logger.info("Using greedy optimization with local search")
         
         # Initial greedy selection
-        selected = self._greedy_selection(
-            start_city, end_city, candidates, max_cities, city_scores
-        )
+        selected = self._greedy_selection(instance, max_cities)
         
         # Local search improvement
-        improved = self._local_search_improvement(
-            start_city, end_city, selected, candidates, route_type, city_scores
-        )
+        improved = self._local_search_improvement(instance, selected, deadline=deadline)
         
         # Optimize order
-        optimized_order = self._optimize_city_order(start_city, end_city, improved)
+        optimized_order = self._optimize_city_order(instance, improved)
         
-        total_distance = self._calculate_total_route_distance(
-            [start_city] + optimized_order + [end_city]
-        )
-        
-        total_score = self._calculate_route_score(
-            start_city, end_city, optimized_order, route_type, city_scores
-        )
-        
-        return OptimizedRoute(
-            cities=optimized_order,
-            total_distance=total_distance,
-            total_score=total_score,
-            optimization_method="greedy_with_local_search",
-            performance_metrics=self._calculate_performance_metrics(
-                start_city, end_city, optimized_order
-            ),
-            routing_explanation="Greedy selection with local search refinement"
+        return self._build_result(
+            instance, optimized_order,
+            self._calculate_route_score(instance, optimized_order),
+            "greedy_with_local_search",
+            "Greedy selection with local search refinement"
         )
     
     def _dynamic_programming_optimization(
         self,
-        start_city: City,
-        end_city: City,
-        candidates: List[City],
+        instance: RouteInstance,
         max_cities: int,
         route_type: str,
-        city_scores: Dict[str, float]
+        deadline: Optional[float] = None
     ) -> OptimizedRoute:
-        """Dynamic programming optimization for smaller problems."""
+        """
+        Prize-collecting path DP: start -> end through at most max_cities stops.
+        
+        Small pools are solved exactly with a bitmask DP over subsets; larger
+        pools use a forward-only DP along the start-end corridor. Candidate
+        paths from either DP are re-scored with the full route score.
+        """
         
-        if len(candidates) > 15:  # DP is exponential, limit size
-            raise ValueError("Too many candidates for dynamic programming")
+        candidates = instance.candidate_indices
         
         logger.info("Using dynamic programming for route optimization")
         
-        # This is a simplified DP approach for the TSP-like problem
-        # For production, you'd want a more sophisticated implementation
+        if self._exact_dp_affordable(len(candidates), max_cities):
+            paths = self._subset_dp_paths(instance, candidates, max_cities, deadline)
+            explanation = "Optimal solution using dynamic programming"
+        else:
+            paths = self._corridor_dp_paths(instance, candidates, max_cities, deadline)
+            explanation = "Best forward route along the corridor using dynamic programming"
+        
+        # Branch and bound: every term but spacing is exact for a given path,
+        # so evaluate in bound order and stop once no path can win
+        quality = instance.quality.tolist()
+        bounded = sorted(
+            ((self._route_score_upper_bound(instance, path, length, quality), path)
+             for path, length in paths),
+            key=lambda item: item[0],
+            reverse=True
+        )
         
-        best_combination = None
-        best_score = -1
+        best_order: List[int] = []
+        best_score = -1.0
         
-        # Try all combinations of cities up to max_cities
-        from itertools import combinations
+        for upper_bound, path in bounded:
+            if upper_bound <= best_score:
+                break
+            score = self._calculate_route_score(instance, path)
+            if score > best_score:
+                best_score = score
+                best_order = path
         
-        for r in range(1, min(max_cities + 1, len(candidates) + 1)):
-            for combination in combinations(candidates, r):
-                cities_list = list(combination)
-                score = self._calculate_route_score(
-                    start_city, end_city, cities_list, route_type, city_scores
-                )
-                
-                if score > best_score:
-                    best_score = score
-                    best_combination = cities_list
+        return self._build_result(
+            instance, best_order, best_score, "dynamic_programming", explanation
+        )
+    
+    def _exact_dp_affordable(self, num_candidates: int, max_cities: int) -> bool:
+        """Whether the subset DP fits the budget: it makes about C(n, k) * k^2 transitions per size k."""
+        if num_candidates > self.config.small_instance_candidates:
+            return False
+        transitions = sum(
+            math.comb(num_candidates, size) * size * size
+            for size in range(1, min(max_cities, num_candidates) + 1)
+        )
+        return transitions <= self.config.exact_dp_max_transitions
+    
+    def _route_score_upper_bound(
+        self,
+        instance: RouteInstance,
+        path: List[int],
+        length: float,
+        quality: List[float]
+    ) -> float:
+        """Upper bound on _calculate_route_score assuming perfect spacing."""
         
-        if not best_combination:
-            best_combination = []
+        if not path:
+            return 0.0
         
-        # Optimize order
-        optimized_order = self._optimize_city_order(start_city, end_city, best_combination)
+        direct_distance = instance.direct_distance
+        detour_ratio = length / direct_distance if direct_distance > 0 else 1.0
+        distance_score = max(0.0, 1.0 - (detour_ratio - 1.0) / self.config.max_detour_ratio)
         
-        total_distance = self._calculate_total_route_distance(
-            [start_city] + optimized_order + [end_city]
+        return (
+            sum(quality[i] for i in path) / len(path) * 0.4 +
+            distance_score * 0.3 +
+            0.2 +
+            self._calculate_variety_score(instance, path) * 0.1
         )
+    
+    def _subset_dp_paths(
+        self,
+        instance: RouteInstance,
+        candidates: List[int],
+        max_cities: int,
+        deadline: Optional[float] = None
+    ) -> List[Tuple[List[int], float]]:
+        """
+        Held-Karp style bitmask DP returning the shortest ordering of every
+        subset of at most max_cities candidates.
         
-        return OptimizedRoute(
-            cities=optimized_order,
-            total_distance=total_distance,
-            total_score=best_score,
-            optimization_method="dynamic_programming",
-            performance_metrics=self._calculate_performance_metrics(
-                start_city, end_city, optimized_order
-            ),
-            routing_explanation="Optimal solution using dynamic programming"
-        )
+        best[mask][last] memoizes the shortest partial path from the start
+        through exactly the cities in mask, ending at last.
+        """
+        
+        n = len(candidates)
+        distances = instance.distances.tolist()
+        start, end = instance.START, instance.END
+        
+        best: Dict[int, Dict[int, Tuple[float, int]]] = {}
+        for pos, city in enumerate(candidates):
+            best[1 << pos] = {pos: (distances[start][city], -1)}
+        
+        for size in range(2, min(max_cities, n) + 1):
+            if self._deadline_passed(deadline):
+                break
+            for members in combinations(range(n), size):
+                # Masks of a partly finished size are complete on their own, so stopping here is safe
+                if self._deadline_passed(deadline):
+                    break
+                mask = 0
+                for pos in members:
+                    mask |= 1 << pos
+                
+                states = {}
+                for last in members:
+                    previous = best[mask ^ (1 << last)]
+                    city = candidates[last]
+                    states[last] = min(
+                        (length + distances[candidates[prev]][city], prev)
+                        for prev, (length, _) in previous.items()
+                    )
+                best[mask] = states
+        
+        paths = []
+        for mask, states in best.items():
+            last = min(
+                states,
+                key=lambda pos: states[pos][0] + distances[candidates[pos]][end]
+            )
+            length = states[last][0] + distances[candidates[last]][end]
+            
+            # Walk parent pointers back to the start
+            order = []
+            while last != -1:
+                order.append(candidates[last])
+                parent = states[last][1]
+                mask ^= 1 << last
+                last = parent
+                states = best.get(mask, {})
+            paths.append((order[::-1], length))
+        
+        return paths
     
-    def _greedy_selection(
+    def _corridor_dp_paths(
         self,
-        start_city: City,
-        end_city: City,
-        candidates: List[City],
+        instance: RouteInstance,
+        candidates: List[int],
         max_cities: int,
-        city_scores: Dict[str, float]
-    ) -> List[City]:
+        deadline: Optional[float] = None
+    ) -> List[Tuple[List[int], float]]:
+        """
+        Forward-only orienteering DP along the start-end axis.
+        
+        For each stop count c the quality and distance terms of the route
+        score are additive: 0.4 * sum(quality) / c minus a penalty linear
+        in route length. Restricting stops to increasing progress along the
+        corridor makes that exactly solvable in O(c * n^2) per count.
+        """
+        
+        cand = np.asarray(candidates, dtype=np.intp)
+        direct = instance.direct_distance
+        if direct <= 0 or cand.size == 0:
+            stops = list(candidates[:max_cities])
+            return [(stops, self._calculate_total_route_distance(instance, instance.path(stops)))]
+        
+        from_start = instance.distances[instance.START, cand]
+        to_end = instance.distances[cand, instance.END]
+        
+        # Cities that alone exceed the detour budget cannot earn a distance score
+        within_budget = from_start + to_end <= direct * (1.0 + self.config.max_detour_ratio)
+        if within_budget.sum() >= max_cities:
+            cand, from_start, to_end = cand[within_budget], from_start[within_budget], to_end[within_budget]
+        
+        # Very large pools keep only the strongest cities to bound the O(n^2) step
+        if cand.size > self.config.corridor_dp_max_candidates:
+            keep = np.argsort(-instance.quality[cand], kind='stable')[:self.config.corridor_dp_max_candidates]
+            cand, from_start, to_end = cand[keep], from_start[keep], to_end[keep]
+        
+        # Visit cities in order of progress along the corridor
+        order = np.argsort(instance.progress[cand], kind='stable')
+        cand, from_start, to_end = cand[order], from_start[order], to_end[order]
+        
+        n = cand.size
+        prize = instance.quality[cand]
+        # leg_in[j, i] is the leg i -> j; backward moves get an infinite length
+        leg_in = np.where(
+            np.tril(np.ones((n, n), dtype=bool), k=-1),
+            instance.distances[np.ix_(cand, cand)],
+            np.inf
+        )
+        length_weight = 0.3 / (direct * self.config.max_detour_ratio)
+        
+        paths = []
+        for count in range(1, min(max_cities, n) + 1):
+            if paths and self._deadline_passed(deadline):
+                break
+            
+            # Value per unit route length, in units of summed quality
+            penalty = length_weight * count / 0.4
+            value = prize - penalty * from_start
+            parents = []
+            
+            for _ in range(count - 1):
+                transitions = value[None, :] - penalty * leg_in
+                parent = transitions.argmax(axis=1)
+                value = transitions[np.arange(n), parent] + prize
+                parents.append(parent)
+            
+            final = value - penalty * to_end
+            for last in np.argsort(final)[::-1][:self.config.corridor_dp_paths_per_count]:
+                if not np.isfinite(final[last]):
+                    break
+                path = [int(last)]
+                for parent in reversed(parents):
+                    path.append(int(parent[path[-1]]))
+                stops = [int(cand[pos]) for pos in reversed(path)]
+                length = (final[last] - prize[path].sum()) / -penalty
+                paths.append((stops, float(length)))
+        
+        return paths
+    
+    def _greedy_selection(self, instance: RouteInstance, max_cities: int) -> List[int]:
         """Greedy selection of cities."""
         
-        selected = []
-        remaining = candidates.copy()
+        selected: List[int] = []
+        remaining = np.asarray(instance.candidate_indices, dtype=np.intp)
+        
+        # Quality and detour depend only on the candidate, so score them once
+        city_score = instance.quality[remaining]
+        detour_score = self._calculate_detour_scores(instance, remaining)
         
-        while len(selected) < max_cities and remaining:
-            best_candidate = None
-            best_score = -1
+        while len(selected) < max_cities and remaining.size:
+            spacing_score = self._calculate_spacing_scores(instance, remaining, selected)
             
-            for candidate in remaining:
-                # Calculate composite score
-                city_score = city_scores.get(candidate.name, 0.5)
-                spacing_score = self._calculate_spacing_score(
-                    candidate, selected, start_city, end_city
-                )
-                detour_score = self._calculate_detour_score(
-                    candidate, start_city, end_city
-                )
-                
-                composite_score = (
-                    city_score * 0.5 + 
-                    spacing_score * 0.3 + 
-                    detour_score * 0.2
-                )
-                
-                if composite_score > best_score:
-                    best_score = composite_score
-                    best_candidate = candidate
+            composite_score = (
+                city_score * 0.5 +
+                spacing_score * 0.3 +
+                detour_score * 0.2
+            )
             
-            if best_candidate:
-                selected.append(best_candidate)
-                remaining.remove(best_candidate)
-            else:
-                break
+            best = int(np.argmax(composite_score))
+            selected.append(int(remaining[best]))
+            
+            keep = np.arange(remaining.size) != best
+            remaining = remaining[keep]
+            city_score = city_score[keep]
+            detour_score = detour_score[keep]
         
         return selected
     
-    def _optimize_city_order(
-        self, start_city: City, end_city: City, cities: List[City]
-    ) -> List[City]:
+    def optimize_visit_order(self, distances: np.ndarray) -> List[int]:
+        """
+        Order a fixed list of cities given their pairwise distance matrix.
+        
+        Row 0 is the start and the last row the end; both stay in place and
+        the cities in between are ordered with the same local search used
+        for optimized routes. Returns the visiting order as row indices.
+        """
+        n = len(distances)
+        if n <= 3:
+            return list(range(n))
+        
+        # Reindex so start and end take RouteInstance slots 0 and 1
+        rows = np.array([0, n - 1] + list(range(1, n - 1)), dtype=np.intp)
+        instance = RouteInstance(
+            cities=[],
+            distances=np.asarray(distances, dtype=np.float64)[np.ix_(rows, rows)],
+            quality=np.zeros(n),
+            city_types=[frozenset()] * n
+        )
+        stops = self._optimize_city_order(instance, instance.candidate_indices)
+        return [0] + [int(rows[i]) for i in stops] + [n - 1]
+    
+    def _optimize_city_order(self, instance: RouteInstance, stops: List[int]) -> List[int]:
         """Optimize the order of cities along the route."""
         
-        if len(cities) <= 1:
-            return cities
+        if len(stops) <= 1:
+            return list(stops)
         
         # Use nearest neighbor heuristic for ordering
-        ordered_cities = []
-        remaining = cities.copy()
-        current_position = start_city.coordinates
+        ordered: List[int] = []
+        remaining = list(stops)
+        current = instance.START
         
         while remaining:
-            nearest_city = min(
-                remaining,
-                key=lambda city: self._calculate_distance(current_position, city.coordinates)
-            )
-            
-            ordered_cities.append(nearest_city)
-            remaining.remove(nearest_city)
-            current_position = nearest_city.coordinates
-        
-        # Try to improve with 2-opt optimization
-        improved_order = self._two_opt_optimization(start_city, end_city, ordered_cities)
+            nearest = remaining.pop(int(np.argmin(instance.distances[current, remaining])))
+            ordered.append(nearest)
+            current = nearest
         
-        return improved_order
+        # Improve with 2-opt and Or-opt moves
+        return self._two_opt_optimization(instance, ordered)
     
-    def _two_opt_optimization(
-        self, start_city: City, end_city: City, cities: List[City]
-    ) -> List[City]:
-        """2-opt optimization for city ordering."""
+    def _two_opt_optimization(self, instance: RouteInstance, stops: List[int]) -> List[int]:
+        """
+        2-opt plus Or-opt local search for city ordering.
+        
+        Works on positions 0..m-1 of the full path (start and end fixed)
+        with a local distance table, so every move is evaluated from the
+        changed edges only. Candidate moves come from each city's nearest
+        neighbors, and segment reversals happen in place.
+        """
         
-        if len(cities) < 3:
-            return cities
+        if len(stops) < 2:
+            return list(stops)
+        
+        route = instance.path(stops)
+        path_index = np.asarray(route, dtype=np.intp)
+        local = instance.distances[np.ix_(path_index, path_index)]
+        dist = local.tolist()
+        
+        m = len(route)
+        neighbor_count = min(self.config.neighbor_list_size, m - 1)
+        neighbors = [
+            [c for c in row if c != a][:neighbor_count]
+            for a, row in enumerate(np.argsort(local, axis=1, kind='stable').tolist())
+        ]
+        
+        tour = list(range(m))
+        pos = list(range(m))
         
-        route = [start_city] + cities + [end_city]
+        improved = True
+        while improved:
+            improved = self._two_opt_pass(dist, neighbors, tour, pos)
+            improved = self._or_opt_pass(dist, neighbors, tour, pos) or improved
+        
+        # Return without start and end cities
+        return [route[node] for node in tour[1:-1]]
+    
+    @staticmethod
+    def _reverse_segment(tour: List[int], pos: List[int], left: int, right: int):
+        """Reverse tour[left..right] in place and update positions."""
+        while left < right:
+            tour[left], tour[right] = tour[right], tour[left]
+            pos[tour[left]] = left
+            pos[tour[right]] = right
+            left += 1
+            right -= 1
+    
+    def _two_opt_pass(
+        self,
+        dist: List[List[float]],
+        neighbors: List[List[int]],
+        tour: List[int],
+        pos: List[int]
+    ) -> bool:
+        """Apply improving 2-opt moves until none remain; True if any applied."""
+        
+        eps = 1e-9
+        last = len(tour) - 1
+        any_improved = False
         improved = True
         
         while improved:
             improved = False
+            for a in range(len(tour)):
+                i = pos[a]
+                
+                # Replace the edge to a's successor with a -> c
+                if i < last:
+                    b = tour[i + 1]
+                    d_ab = dist[a][b]
+                    for c in neighbors[a]:
+                        d_ac = dist[a][c]
+                        if d_ac >= d_ab - eps:
+                            break
+                        j = pos[c]
+                        if j <= i + 1 or j >= last:
+                            continue
+                        e = tour[j + 1]
+                        if d_ac + dist[b][e] - d_ab - dist[c][e] < -eps:
+                            self._reverse_segment(tour, pos, i + 1, j)
+                            improved = True
+                            break
+                    if improved:
+                        break
+                
+                # Replace the edge from a's predecessor with c -> a
+                if i > 0:
+                    p = tour[i - 1]
+                    d_pa = dist[p][a]
+                    for c in neighbors[a]:
+                        d_ca = dist[c][a]
+                        if d_ca >= d_pa - eps:
+                            break
+                        j = pos[c]
+                        if j >= i - 1 or j <= 0:
+                            continue
+                        cp = tour[j - 1]
+                        if d_ca + dist[cp][p] - d_pa - dist[cp][c] < -eps:
+                            self._reverse_segment(tour, pos, j, i - 1)
+                            improved = True
+                            break
+                    if improved:
+                        break
             
-            for i in range(1, len(route) - 2):
-                for j in range(i + 1, len(route) - 1):
-                    # Try swapping edges
-                    new_route = route.copy()
-                    new_route[i:j+1] = reversed(new_route[i:j+1])
-                    
-                    if self._calculate_total_route_distance(new_route) < self._calculate_total_route_distance(route):
-                        route = new_route
-                        improved = True
+            any_improved = any_improved or improved
         
-        # Return without start and end cities
-        return route[1:-1]
+        return any_improved
     
-    def _calculate_route_score(
+    def _or_opt_pass(
         self,
-        start_city: City,
-        end_city: City,
-        cities: List[City],
-        route_type: str,
-        city_scores: Dict[str, float]
-    ) -> float:
+        dist: List[List[float]],
+        neighbors: List[List[int]],
+        tour: List[int],
+        pos: List[int]
+    ) -> bool:
+        """Move one improving segment of up to or_opt_max_segment cities; True if moved."""
+        
+        eps = 1e-9
+        last = len(tour) - 1
+        
+        for length in range(1, self.config.or_opt_max_segment + 1):
+            for s in range(1, last - length + 1):
+                seg_start, seg_end = tour[s], tour[s + length - 1]
+                p, n = tour[s - 1], tour[s + length]
+                removal_gain = dist[p][seg_start] + dist[seg_end][n] - dist[p][n]
+                if removal_gain <= eps:
+                    continue
+                
+                segment = set(tour[s:s + length])
+                best_delta, best_move = -eps, None
+                
+                for x in neighbors[seg_start] + neighbors[seg_end]:
+                    if x in segment:
+                        continue
+                    k = pos[x]
+                    # Insert on the edge after x or the edge before x
+                    for u_pos in (k, k - 1):
+                        if u_pos < 0 or u_pos >= last:
+                            continue
+                        u, v = tour[u_pos], tour[u_pos + 1]
+                        if u in segment or v in segment:
+                            continue
+                        forward = dist[u][seg_start] + dist[seg_end][v]
+                        backward = dist[u][seg_end] + dist[seg_start][v]
+                        delta = min(forward, backward) - dist[u][v] - removal_gain
+                        if delta < best_delta:
+                            best_delta, best_move = delta, (u, backward < forward)
+                
+                if best_move:
+                    u, reverse = best_move
+                    moved = tour[s:s + length]
+                    if reverse:
+                        moved.reverse()
+                    del tour[s:s + length]
+                    insert_at = tour.index(u) + 1
+                    tour[insert_at:insert_at] = moved
+                    for index, node in enumerate(tour):
+                        pos[node] = index
+                    return True
+        
+        return False
+    
+    def _calculate_route_score(self, instance: RouteInstance, stops: List[int]) -> float:
         """Calculate overall score for a route."""
         
-        if not cities:
+        if not stops:
             return 0.0
         
         # City quality score
-        quality_score = sum(city_scores.get(city.name, 0.5) for city in cities) / len(cities)
+        quality_score = float(instance.quality[stops].mean())
         
         # Distance efficiency score
-        direct_distance = self._calculate_distance(start_city.coordinates, end_city.coordinates)
-        route_distance = self._calculate_total_route_distance([start_city] + cities + [end_city])
+        legs = instance.leg_distances(stops)
+        direct_distance = instance.direct_distance
+        route_distance = float(legs.sum())
         
         detour_ratio = route_distance / direct_distance if direct_distance > 0 else 1.0
         distance_score = max(0.0, 1.0 - (detour_ratio - 1.0) / self.config.max_detour_ratio)
         
         # Spacing score
-        spacing_score = self._calculate_overall_spacing_score(start_city, end_city, cities)
+        spacing_score = self._spacing_score_from_legs(legs)
         
         # Variety score
-        variety_score = self._calculate_variety_score(cities)
+        variety_score = self._calculate_variety_score(instance, stops)
         
         # Combine scores
         total_score = (
@@ -536,18 +1137,20 @@ class RouteOptimizationService:
         
         return total_score
     
+    @staticmethod
+    def _time_left(deadline: Optional[float]) -> Optional[float]:
+        """Seconds until a portfolio deadline, or None without one."""
+        return None if deadline is None else max(0.0, deadline - time.perf_counter())
+    
+    @staticmethod
+    def _deadline_passed(deadline: Optional[float]) -> bool:
+        """Check whether a portfolio deadline (perf_counter seconds) has passed."""
+        return deadline is not None and time.perf_counter() >= deadline
+    
     def _calculate_distance(self, coord1: Coordinates, coord2: Coordinates) -> float:
         """Calculate distance between two coordinates."""
         
-        # Create cache key
-        key = (f"{coord1.latitude},{coord1.longitude}", f"{coord2.latitude},{coord2.longitude}")
-        
-        if key in self.distance_cache:
-            return self.distance_cache[key]
-        
         # Haversine formula
-        R = 6371  # Earth's radius in km
-        
         lat1, lon1 = math.radians(coord1.latitude), math.radians(coord1.longitude)
         lat2, lon2 = math.radians(coord2.latitude), math.radians(coord2.longitude)
         
@@ -557,112 +1160,89 @@ class RouteOptimizationService:
         a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
         c = 2 * math.asin(math.sqrt(a))
         
-        distance = R * c
-        
-        # Cache the result
-        self.distance_cache[key] = distance
-        return distance
+        return EARTH_RADIUS_KM * c
     
-    def _calculate_total_route_distance(self, cities: List[City]) -> float:
-        """Calculate total distance for a route."""
+    def _calculate_total_route_distance(self, instance: RouteInstance, path: List[int]) -> float:
+        """Calculate total distance for a full index path."""
         
-        if len(cities) < 2:
+        if len(path) < 2:
             return 0.0
         
-        total_distance = 0.0
-        for i in range(len(cities) - 1):
-            total_distance += self._calculate_distance(
-                cities[i].coordinates, cities[i + 1].coordinates
-            )
-        
-        return total_distance
+        path = np.asarray(path, dtype=np.intp)
+        return float(instance.distances[path[:-1], path[1:]].sum())
     
-    def _calculate_spacing_score(
-        self, candidate: City, selected: List[City], start_city: City, end_city: City
-    ) -> float:
-        """Calculate spacing score for a candidate city."""
+    def _calculate_spacing_scores(
+        self, instance: RouteInstance, candidates: np.ndarray, selected: List[int]
+    ) -> np.ndarray:
+        """Calculate spacing scores for an array of candidate cities."""
         
         if not selected:
-            return 0.8
-        
-        total_distance = self._calculate_distance(start_city.coordinates, end_city.coordinates)
-        ideal_spacing = total_distance / (len(selected) + 2)
+            return np.full(candidates.size, 0.8)
         
-        min_distance = float('inf')
-        for selected_city in selected:
-            distance = self._calculate_distance(candidate.coordinates, selected_city.coordinates)
-            min_distance = min(min_distance, distance)
-        
-        if min_distance == float('inf'):
-            return 0.8
+        ideal_spacing = instance.direct_distance / (len(selected) + 2)
+        if ideal_spacing <= 0:
+            return np.full(candidates.size, 0.3)
         
+        min_distance = instance.distances[np.ix_(candidates, selected)].min(axis=1)
         spacing_ratio = min_distance / ideal_spacing
         
-        if 0.5 <= spacing_ratio <= 1.5:
-            return 1.0
-        elif 0.3 <= spacing_ratio <= 2.0:
-            return 0.7
-        else:
-            return 0.3
+        return np.select(
+            [(spacing_ratio >= 0.5) & (spacing_ratio <= 1.5),
+             (spacing_ratio >= 0.3) & (spacing_ratio <= 2.0)],
+            [1.0, 0.7],
+            default=0.3
+        )
     
-    def _calculate_detour_score(self, city: City, start_city: City, end_city: City) -> float:
-        """Calculate detour score (lower penalty for less detour)."""
+    def _calculate_detour_scores(self, instance: RouteInstance, candidates: np.ndarray) -> np.ndarray:
+        """Calculate detour scores (lower penalty for less detour) for an array of cities."""
+        
+        direct_distance = instance.direct_distance
+        if direct_distance <= 0:
+            return np.full(candidates.size, 1.0)
         
-        direct_distance = self._calculate_distance(start_city.coordinates, end_city.coordinates)
         detour_distance = (
-            self._calculate_distance(start_city.coordinates, city.coordinates) +
-            self._calculate_distance(city.coordinates, end_city.coordinates)
+            instance.distances[instance.START, candidates] +
+            instance.distances[candidates, instance.END]
         )
+        detour_ratio = detour_distance / direct_distance
         
-        detour_ratio = detour_distance / direct_distance if direct_distance > 0 else 1.0
-        
-        if detour_ratio <= 1.2:
-            return 1.0  # Minimal detour
-        elif detour_ratio <= 1.5:
-            return 0.8  # Acceptable detour
-        elif detour_ratio <= 2.0:
-            return 0.5  # Significant detour
-        else:
-            return 0.2  # Large detour
+        return np.select(
+            [detour_ratio <= 1.2, detour_ratio <= 1.5, detour_ratio <= 2.0],
+            [1.0, 0.8, 0.5],  # Minimal, acceptable, significant detour
+            default=0.2  # Large detour
+        )
     
-    def _calculate_overall_spacing_score(
-        self, start_city: City, end_city: City, cities: List[City]
-    ) -> float:
-        """Calculate overall spacing score for the route."""
+    @staticmethod
+    def _spacing_score_from_legs(legs: np.ndarray) -> float:
+        """Score how evenly the legs of a route are spaced."""
         
-        if not cities:
+        if legs.size == 0:
             return 1.0
         
-        all_cities = [start_city] + cities + [end_city]
-        distances = []
-        
-        for i in range(len(all_cities) - 1):
-            distance = self._calculate_distance(
-                all_cities[i].coordinates, all_cities[i + 1].coordinates
-            )
-            distances.append(distance)
-        
-        if not distances:
+        mean_distance = float(legs.mean())
+        if mean_distance == 0:
             return 1.0
         
-        mean_distance = sum(distances) / len(distances)
-        variance = sum((d - mean_distance) ** 2 for d in distances) / len(distances)
-        
         # Lower variance means more even spacing
-        spacing_score = 1.0 / (1.0 + variance / (mean_distance ** 2))
+        return 1.0 / (1.0 + float(legs.var()) / (mean_distance ** 2))
+    
+    def _calculate_overall_spacing_score(self, instance: RouteInstance, stops: List[int]) -> float:
+        """Calculate overall spacing score for the route."""
+        
+        if not stops:
+            return 1.0
         
-        return spacing_score
+        return self._spacing_score_from_legs(instance.leg_distances(stops))
     
-    def _calculate_variety_score(self, cities: List[City]) -> float:
+    def _calculate_variety_score(self, instance: RouteInstance, stops: List[int]) -> float:
         """Calculate variety score based on city types."""
         
-        if not cities:
+        if not stops:
             return 0.0
         
         all_types = set()
-        for city in cities:
-            if hasattr(city, 'types') and city.types:
-                all_types.update(city.types)
+        for index in stops:
+            all_types.update(instance.city_types[index])
         
         # More unique types means more variety
         variety_score = min(len(all_types) / 10.0, 1.0)  # Normalize to max 10 types
@@ -670,41 +1250,42 @@ class RouteOptimizationService:
         return variety_score
     
     def _calculate_performance_metrics(
-        self, start_city: City, end_city: City, cities: List[City]
+        self, instance: RouteInstance, stops: List[int]
     ) -> Dict[str, float]:
         """Calculate performance metrics for the route."""
         
-        direct_distance = self._calculate_distance(start_city.coordinates, end_city.coordinates)
-        route_distance = self._calculate_total_route_distance([start_city] + cities + [end_city])
+        direct_distance = instance.direct_distance
+        route_distance = self._calculate_total_route_distance(instance, instance.path(stops))
         
         return {
             'detour_ratio': route_distance / direct_distance if direct_distance > 0 else 1.0,
-            'avg_stop_distance': route_distance / (len(cities) + 1) if cities else 0.0,
-            'spacing_efficiency': self._calculate_overall_spacing_score(start_city, end_city, cities),
-            'variety_score': self._calculate_variety_score(cities),
-            'total_cities': len(cities)
+            'avg_stop_distance': route_distance / (len(stops) + 1) if stops else 0.0,
+            'spacing_efficiency': self._calculate_overall_spacing_score(instance, stops),
+            'variety_score': self._calculate_variety_score(instance, stops),
+            'total_cities': len(stops)
         }
     
     def _generate_routing_explanation(
-        self, start_city: City, end_city: City, cities: List[City], method: str
+        self, instance: RouteInstance, stops: List[int], method: str
     ) -> str:
         """Generate human-readable explanation of the routing."""
         
-        if not cities:
+        if not stops:
             return "Direct route with no intermediate stops."
         
         explanations = {
             'genetic_algorithm': "Selected using genetic algorithm to find optimal combination of cities that balances quality, distance, and variety.",
             'simulated_annealing': "Optimized using simulated annealing to explore different city combinations while avoiding local optima.",
+            'parallel_tempering': "Optimized using parallel annealing chains at several temperatures that exchange their best combinations.",
             'greedy_with_local_search': "Greedy selection refined with local search to improve spacing and reduce unnecessary detours.",
-            'dynamic_programming': "Mathematically optimal selection considering all possible combinations.",
+            'dynamic_programming': "Selected with a prize-collecting path dynamic program that trades city quality against detour.",
             'simple_ordering': "Direct ordering of available cities for optimal routing."
         }
         
         base_explanation = explanations.get(method, "Optimized using advanced routing algorithms.")
         
         # Add specific details
-        performance = self._calculate_performance_metrics(start_city, end_city, cities)
+        performance = self._calculate_performance_metrics(instance, stops)
         
         details = []
         if performance['detour_ratio'] < 1.3:
@@ -721,62 +1302,138 @@ class RouteOptimizationService:
     
     # Helper methods for genetic algorithm
     
-    def _tournament_selection(self, population: List[List[City]], fitness_scores: List[float]) -> List[City]:
-        """Tournament selection for genetic algorithm."""
-        tournament_size = 3
-        tournament_indices = random.sample(range(len(population)), min(tournament_size, len(population)))
-        
-        best_index = max(tournament_indices, key=lambda i: fitness_scores[i])
-        return population[best_index]
+    def _membership_to_genes(
+        self, instance: RouteInstance, membership: np.ndarray, genes: int
+    ) -> np.ndarray:
+        """Turn (population x cities) membership into corridor-ordered gene rows."""
+        
+        keys = np.where(membership, instance.progress[None, :], np.inf)
+        order = np.argsort(keys, axis=1, kind='stable')[:, :genes]
+        chosen = np.take_along_axis(keys, order, axis=1)
+        return np.where(np.isfinite(chosen), order, instance.END)
     
-    def _crossover(self, parent1: List[City], parent2: List[City], max_cities: int) -> List[City]:
-        """Crossover operation for genetic algorithm."""
-        # Simple uniform crossover
-        all_cities = list(set(parent1 + parent2))
-        
-        offspring = []
-        for city in all_cities:
-            if len(offspring) >= max_cities:
-                break
-            
-            # Include city if it's in both parents or randomly from one parent
-            if city in parent1 and city in parent2:
-                offspring.append(city)
-            elif city in parent1 and random.random() < 0.5:
-                offspring.append(city)
-            elif city in parent2 and random.random() < 0.5:
-                offspring.append(city)
+    def _population_fitness(self, instance: RouteInstance, population: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_route_score for every row of a gene array."""
+        
+        rows = population.shape[0]
+        valid = population != instance.END
+        lengths = valid.sum(axis=1)
+        
+        # Padding uses the end index, and END -> END legs have zero length
+        paths = np.hstack([
+            np.full((rows, 1), instance.START, dtype=np.intp),
+            population,
+            np.full((rows, 1), instance.END, dtype=np.intp)
+        ])
+        legs = instance.distances[paths[:, :-1], paths[:, 1:]]
+        leg_count = lengths + 1
+        valid_legs = np.arange(legs.shape[1])[None, :] < leg_count[:, None]
+        
+        safe_lengths = np.maximum(lengths, 1)
+        quality_score = (instance.quality[population] * valid).sum(axis=1) / safe_lengths
+        
+        direct_distance = instance.direct_distance
+        route_distance = legs.sum(axis=1)
+        if direct_distance > 0:
+            detour_ratio = route_distance / direct_distance
+        else:
+            detour_ratio = np.ones(rows)
+        distance_score = np.maximum(0.0, 1.0 - (detour_ratio - 1.0) / self.config.max_detour_ratio)
+        
+        mean_leg = route_distance / leg_count
+        variance = (((legs - mean_leg[:, None]) ** 2) * valid_legs).sum(axis=1) / leg_count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spacing_score = np.where(mean_leg > 0, 1.0 / (1.0 + variance / mean_leg ** 2), 1.0)
+        
+        type_matrix = instance.type_matrix
+        if type_matrix.shape[1]:
+            present = (type_matrix[population] & valid[:, :, None]).any(axis=1)
+            variety_score = np.minimum(present.sum(axis=1) / 10.0, 1.0)
+        else:
+            variety_score = np.zeros(rows)
         
+        total_score = (
+            quality_score * 0.4 +
+            distance_score * 0.3 +
+            spacing_score * 0.2 +
+            variety_score * 0.1
+        )
+        return np.where(lengths > 0, total_score, 0.0)
+    
+    def _tournament_selection(
+        self, fitness_scores: np.ndarray, count: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """Tournament selection for genetic algorithm; returns population row indices."""
+        tournament_size = min(3, fitness_scores.size)
+        tournaments = rng.integers(0, fitness_scores.size, size=(count, tournament_size))
+        winners = fitness_scores[tournaments].argmax(axis=1)
+        return tournaments[np.arange(count), winners]
+    
+    def _crossover(
+        self,
+        instance: RouteInstance,
+        parents1: np.ndarray,
+        parents2: np.ndarray,
+        max_cities: int,
+        rng: np.random.Generator
+    ) -> np.ndarray:
+        """Uniform crossover on gene arrays; returns offspring membership."""
+        
+        rows = parents1.shape[0]
+        in_parent1 = np.zeros((rows, len(instance.cities)), dtype=bool)
+        in_parent2 = np.zeros_like(in_parent1)
+        np.put_along_axis(in_parent1, parents1, True, axis=1)
+        np.put_along_axis(in_parent2, parents2, True, axis=1)
+        in_parent1[:, instance.END] = in_parent2[:, instance.END] = False
+        
+        # Include city if it's in both parents or randomly from one parent
+        in_both = in_parent1 & in_parent2
+        take = in_both | ((in_parent1 ^ in_parent2) & (rng.random(in_parent1.shape) < 0.5))
+        
+        # Cap at max_cities, keeping shared cities first
+        priority = np.where(take, in_both + rng.random(take.shape), -1.0)
+        keep = np.argsort(-priority, axis=1, kind='stable')[:, :max_cities]
+        offspring = np.zeros_like(take)
+        np.put_along_axis(offspring, keep, np.take_along_axis(take, keep, axis=1), axis=1)
         return offspring
     
-    def _mutate(self, individual: List[City], candidates: List[City], max_cities: int) -> List[City]:
-        """Mutation operation for genetic algorithm."""
-        if random.random() > self.config.genetic_mutation_rate:
-            return individual
-        
-        # Random mutation: add, remove, or replace a city
-        mutation_type = random.choice(['add', 'remove', 'replace'])
-        
-        if mutation_type == 'add' and len(individual) < max_cities:
-            available = [city for city in candidates if city not in individual]
-            if available:
-                individual.append(random.choice(available))
-        
-        elif mutation_type == 'remove' and individual:
-            individual.remove(random.choice(individual))
-        
-        elif mutation_type == 'replace' and individual:
-            available = [city for city in candidates if city not in individual]
-            if available:
-                old_city = random.choice(individual)
-                new_city = random.choice(available)
-                individual[individual.index(old_city)] = new_city
-        
-        return individual
+    def _mutate(
+        self,
+        instance: RouteInstance,
+        membership: np.ndarray,
+        candidates: np.ndarray,
+        max_cities: int,
+        rng: np.random.Generator
+    ) -> np.ndarray:
+        """Mutation for genetic algorithm: add, remove, or replace a city per row."""
+        
+        rows = membership.shape[0]
+        mutating = rng.random(rows) < self.config.genetic_mutation_rate
+        mutation_type = rng.integers(0, 3, size=rows)  # 0 add, 1 remove, 2 replace
+        counts = membership.sum(axis=1)
+        
+        is_candidate = np.zeros(membership.shape[1], dtype=bool)
+        is_candidate[candidates] = True
+        
+        # Random member / non-member per row via random keys
+        noise = rng.random(membership.shape)
+        member = np.where(membership, noise, -1.0).argmax(axis=1)
+        outsider_keys = np.where(~membership & is_candidate[None, :], noise, -1.0)
+        outsider = outsider_keys.argmax(axis=1)
+        has_outsider = outsider_keys.max(axis=1) >= 0
+        
+        add = mutating & (mutation_type == 0) & (counts < max_cities) & has_outsider
+        remove = mutating & (mutation_type == 1) & (counts > 0)
+        replace = mutating & (mutation_type == 2) & (counts > 0) & has_outsider
+        
+        row_index = np.arange(rows)
+        membership[row_index[remove | replace], member[remove | replace]] = False
+        membership[row_index[add | replace], outsider[add | replace]] = True
+        return membership
     
     def _generate_neighbor_solution(
-        self, current: List[City], candidates: List[City], max_cities: int
-    ) -> List[City]:
+        self, current: List[int], candidates: List[int], max_cities: int
+    ) -> List[int]:
         """Generate neighbor solution for simulated annealing."""
         neighbor = current.copy()
         
@@ -806,35 +1463,39 @@ class RouteOptimizationService:
     
     def _local_search_improvement(
         self,
-        start_city: City,
-        end_city: City,
-        selected: List[City],
-        candidates: List[City],
-        route_type: str,
-        city_scores: Dict[str, float]
-    ) -> List[City]:
+        instance: RouteInstance,
+        selected: List[int],
+        deadline: Optional[float] = None
+    ) -> List[int]:
         """Local search improvement for greedy algorithm."""
         
+        candidates = np.asarray(instance.candidate_indices, dtype=np.intp)
+        if candidates.size > self.config.local_search_max_candidates:
+            # Each round scores every swap, so only the strongest cities are tried
+            keep = np.argsort(-instance.quality[candidates], kind='stable')
+            candidates = candidates[keep[:self.config.local_search_max_candidates]]
+        candidates = candidates.tolist()
+        
         current_solution = selected.copy()
         improved = True
         
-        while improved:
+        while improved and not self._deadline_passed(deadline):
             improved = False
-            current_score = self._calculate_route_score(
-                start_city, end_city, current_solution, route_type, city_scores
-            )
+            current_score = self._calculate_route_score(instance, current_solution)
             
             # Try replacing each city with an available alternative
             for i, city in enumerate(current_solution):
-                available = [c for c in candidates if c not in current_solution]
+                in_solution = set(current_solution)
+                available = [c for c in candidates if c not in in_solution]
                 
                 for replacement in available:
+                    if self._deadline_passed(deadline):
+                        return current_solution
+                    
                     test_solution = current_solution.copy()
                     test_solution[i] = replacement
                     
-                    test_score = self._calculate_route_score(
-                        start_city, end_city, test_solution, route_type, city_scores
-                    )
+                    test_score = self._calculate_route_score(instance, test_solution)
                     
                     if test_score > current_score:
                         current_solution = test_solution
@@ -848,6 +1509,59 @@ class RouteOptimizationService:
         return current_solution
 
 
+# Shared-memory views attached by parallel annealing workers, keyed by segment name
+_worker_segments: Dict[str, Tuple[shared_memory.SharedMemory, RouteInstance]] = {}
+
+
+def _release_worker_segments():
+    """Detach from the segments of earlier optimizations."""
+    while _worker_segments:
+        _, (segment, instance) = _worker_segments.popitem()
+        # The distance view must be released before the mapping can close
+        del instance
+        try:
+            segment.close()
+        except BufferError:
+            logger.debug("Shared distance view still referenced, leaving segment open", segment=segment.name)
+
+
+def _run_annealing_chain(
+    payload: Dict[str, Any],
+    solution: List[int],
+    score: float,
+    temperature: float,
+    seed: int
+) -> Dict[str, Any]:
+    """Process pool entry point: run one fixed-temperature annealing segment."""
+    random.seed(seed)
+    
+    name = payload['shm_name']
+    if name not in _worker_segments:
+        segment = shared_memory.SharedMemory(name=name)
+        distances = np.ndarray(payload['shape'], dtype=np.float64, buffer=segment.buf)
+        instance = RouteInstance(
+            cities=[],  # Only indices cross the process boundary
+            distances=distances,
+            quality=payload['quality'],
+            city_types=payload['city_types']
+        )
+        _release_worker_segments()
+        _worker_segments[name] = (segment, instance)
+    instance = _worker_segments[name][1]
+    
+    wall_deadline = payload.get('wall_deadline')
+    deadline = None if wall_deadline is None else time.perf_counter() + (wall_deadline - time.time())
+    
+    service = RouteOptimizationService()
+    service.config = payload['config']
+    return service._anneal(
+        instance, solution, score, payload['max_cities'],
+        temperature=temperature,
+        max_steps=payload['steps'],
+        deadline=deadline
+    )
+
+
 # Global service instance
 _route_optimization_service = None
 
@@ -856,4 +1570,4 @@ def get_route_optimization_service() -> RouteOptimizationService:
     global _route_optimization_service
     if _route_optimization_service is None:
         _route_optimization_service = RouteOptimizationService()
-    return _route_optimization_service
\ No newline at end of file
+    return _route_optimization_service
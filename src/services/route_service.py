@@ -1,16 +1,23 @@
 """
 Route calculation service with proper error handling and optimization.
 """
+import itertools
 from typing import List, Optional, Dict, Any, Tuple
 from geopy.distance import geodesic
+import numpy as np
 import structlog
 from ..core.interfaces import RouteService
 from ..core.models import City, ServiceResult, RouteSegment, TravelRoute, RouteType
 from ..core.exceptions import ExternalServiceError
 from ..infrastructure.config import SecureConfigurationService
+from .road_graph_service import get_road_graph_service
+from .route_optimization_service import get_route_optimization_service, haversine_matrix
 
 logger = structlog.get_logger(__name__)
 
+DEFAULT_PROFILE = 'driving-car'
+MAX_CACHED_LEGS = 50000
+
 
 class ProductionRouteService(RouteService):
     """Production route service with real API integrations and fallbacks."""
@@ -18,13 +25,18 @@ class ProductionRouteService(RouteService):
     def __init__(self, config_service: SecureConfigurationService):
         self.config_service = config_service
         self.api_config = config_service.get_api_config()
-        self._route_cache: Dict[str, Dict] = {}
+        self._leg_cache: Dict[Tuple[str, str, str], Tuple[float, float, str]] = {}
+        self.road_graph = get_road_graph_service()
     
     def calculate_route(self, start: City, end: City, 
                        waypoints: List[City] = None) -> ServiceResult:
         """Calculate route with real API integration and fallback."""
         try:
-            # Try external routing service first
+            # Prefer the bundled offline road graph, then an external routing service
+            route_data = self._calculate_with_road_graph(start, end, waypoints)
+            if route_data:
+                return ServiceResult.success_result(route_data)
+            
             route_data = self._calculate_with_external_api(start, end, waypoints)
             if route_data:
                 return ServiceResult.success_result(route_data)
@@ -43,54 +55,50 @@ class ProductionRouteService(RouteService):
                 "ROUTE_CALCULATION_ERROR"
             )
     
-    def optimize_multi_city_route(self, cities: List[City]) -> ServiceResult:
-        """Optimize route through multiple cities using TSP approximation."""
+    def optimize_multi_city_route(self, cities: List[City],
+                                  profile: str = DEFAULT_PROFILE) -> ServiceResult:
+        """
+        Optimize route through multiple cities.
+        
+        The first and last cities stay fixed. All pairwise legs come from a
+        single batched matrix computation, the intermediate order is solved
+        with the route optimizer's 2-opt/Or-opt local search, and segments
+        are read back from the same matrix.
+        """
         if len(cities) < 2:
             return ServiceResult.error_result("Need at least 2 cities")
         
-        # Debug: Log city coordinates
-        logger.info(f"Optimizing route through {len(cities)} cities:")
-        for i, city in enumerate(cities):
-            coords_info = "NO COORDS"
-            if city.coordinates:
-                if city.coordinates.latitude is not None and city.coordinates.longitude is not None:
-                    coords_info = f"({city.coordinates.latitude}, {city.coordinates.longitude})"
-                else:
-                    coords_info = f"(lat={city.coordinates.latitude}, lon={city.coordinates.longitude})"
-            logger.info(f"  {i+1}. {city.name} - {coords_info}")
-        
         # Filter out cities with invalid coordinates
-        valid_cities = []
-        for city in cities:
-            if city.coordinates and city.coordinates.latitude is not None and city.coordinates.longitude is not None:
-                valid_cities.append(city)
+        valid_cities = [city for city in cities if self._has_coordinates(city)]
+        
+        logger.info("Optimizing multi-city route",
+                    cities=len(cities), skipped=len(cities) - len(valid_cities))
         
         if len(valid_cities) < 2:
             return ServiceResult.error_result("Need at least 2 cities with valid coordinates")
         
         try:
-            # Use nearest neighbor algorithm for TSP approximation
-            optimized_order = self._nearest_neighbor_tsp(valid_cities)
+            matrix_result = self.calculate_route_matrix(valid_cities, profile)
+            if not matrix_result.success:
+                return matrix_result
+            
+            distances = matrix_result.data['distance_km']
+            durations = matrix_result.data['duration_hours']
+            
+            order = get_route_optimization_service().optimize_visit_order(distances)
+            optimized_order = [valid_cities[i] for i in order]
             
             # Calculate segments for optimized route
             segments = []
             total_distance = 0
             total_duration = 0
             
-            for i in range(len(optimized_order) - 1):
-                current = optimized_order[i]
-                next_city = optimized_order[i + 1]
-                
-                segment_result = self.calculate_route(current, next_city)
-                if not segment_result.success:
-                    return segment_result
-                
-                segment_data = segment_result.data
+            for current, next_index in zip(order, order[1:]):
                 segment = RouteSegment(
-                    start=current,
-                    end=next_city,
-                    distance_km=segment_data['distance_km'],
-                    duration_hours=segment_data['duration_hours']
+                    start=valid_cities[current],
+                    end=valid_cities[next_index],
+                    distance_km=round(float(distances[current, next_index]), 1),
+                    duration_hours=round(float(durations[current, next_index]), 1)
                 )
                 segments.append(segment)
                 total_distance += segment.distance_km
@@ -107,6 +115,135 @@ class ProductionRouteService(RouteService):
             logger.error("Route optimization failed", error=str(e))
             return ServiceResult.error_result(f"Route optimization failed: {e}")
     
+    def calculate_route_matrix(self, cities: List[City],
+                               profile: str = DEFAULT_PROFILE) -> ServiceResult:
+        """
+        Calculate all pairwise legs between cities in one batch.
+        
+        Legs are cached by (city, city, profile). When any leg is missing the
+        whole matrix is fetched with one routing backend request, or computed
+        with one vectorized geometric call as fallback. The offline road graph
+        is used first when one is bundled.
+        """
+        try:
+            keys = [self._city_key(city) for city in cities]
+            n = len(cities)
+            
+            missing = any(
+                (keys[i], keys[j], profile) not in self._leg_cache
+                for i in range(n) for j in range(n) if i != j
+            )
+            if missing:
+                matrix = self._calculate_matrix_with_road_graph(cities, profile)
+                if matrix is None:
+                    matrix = self._calculate_matrix_with_external_api(cities, profile)
+                if matrix is None:
+                    matrix = self._calculate_geometric_matrix(cities)
+                self._store_legs(keys, profile, *matrix)
+            
+            distances = np.zeros((n, n))
+            durations = np.zeros((n, n))
+            route_types = set()
+            for i in range(n):
+                for j in range(n):
+                    if i != j:
+                        distances[i, j], durations[i, j], route_type = \
+                            self._leg_cache[(keys[i], keys[j], profile)]
+                        route_types.add(route_type)
+            
+            return ServiceResult.success_result({
+                'distance_km': distances,
+                'duration_hours': durations,
+                'route_type': route_types.pop() if len(route_types) == 1 else 'mixed'
+            })
+        
+        except Exception as e:
+            logger.error("Route matrix calculation failed", cities=len(cities), error=str(e))
+            return ServiceResult.error_result(
+                f"Route matrix calculation failed: {e}",
+                "ROUTE_CALCULATION_ERROR"
+            )
+    
+    def _store_legs(self, keys: List[str], profile: str, distances: np.ndarray,
+                    durations: np.ndarray, route_type: str):
+        """Cache every leg of a matrix, evicting the oldest legs when full."""
+        for i, origin in enumerate(keys):
+            for j, destination in enumerate(keys):
+                if i != j:
+                    self._leg_cache[(origin, destination, profile)] = (
+                        float(distances[i, j]), float(durations[i, j]), route_type
+                    )
+        
+        overflow = len(self._leg_cache) - MAX_CACHED_LEGS
+        if overflow > 0:
+            for key in list(itertools.islice(self._leg_cache, overflow)):
+                del self._leg_cache[key]
+    
+    def _calculate_matrix_with_external_api(
+        self, cities: List[City], profile: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, str]]:
+        """Calculate the leg matrix with one routing API matrix request."""
+        # In production, this would POST all coordinates once to the
+        # OpenRouteService /v2/matrix/{profile} endpoint
+        api_key = self.config_service.get_api_key('openroute')
+        if not api_key:
+            logger.debug("No OpenRoute API key configured for matrix request")
+            return None
+        
+        return None
+    
+    def _calculate_geometric_matrix(self, cities: List[City]) -> Tuple[np.ndarray, np.ndarray, str]:
+        """Great-circle leg matrix as fallback, in one vectorized call."""
+        distances = haversine_matrix(
+            [city.coordinates.latitude for city in cities],
+            [city.coordinates.longitude for city in cities]
+        )
+        
+        # Same driving time estimate as the per-leg fallback
+        return distances, distances / 70.0, 'geometric_fallback'
+    
+    @staticmethod
+    def _city_key(city: City) -> str:
+        """Cache identifier for a city."""
+        return f"{city.name}|{city.country}"
+    
+    @staticmethod
+    def _has_coordinates(city: City) -> bool:
+        return bool(city.coordinates and city.coordinates.latitude is not None
+                    and city.coordinates.longitude is not None)
+    
+    def _calculate_with_road_graph(self, start: City, end: City,
+                                   waypoints: List[City] = None) -> Optional[Dict]:
+        """Calculate route over the bundled offline road graph."""
+        cities = [start] + (waypoints or []) + [end]
+        if not all(self._has_coordinates(city) for city in cities):
+            return None
+        
+        route = self.road_graph.route(cities)
+        if route is None:
+            return None
+        
+        return {
+            'distance_km': round(route['distance_km'], 1),
+            'duration_hours': round(route['duration_hours'], 1),
+            'waypoints': waypoints or [],
+            'route_type': 'road_graph'
+        }
+    
+    def _calculate_matrix_with_road_graph(
+        self, cities: List[City], profile: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, str]]:
+        """Calculate the leg matrix over the offline road graph (car profiles only)."""
+        if not profile.startswith('driving'):
+            return None
+        
+        matrix = self.road_graph.matrix(cities)
+        if matrix is None:
+            return None
+        
+        distances, durations = matrix
+        return distances, durations, 'road_graph'
+    
     def _calculate_with_external_api(self, start: City, end: City, 
                                    waypoints: List[City] = None) -> Optional[Dict]:
         """Calculate route using external routing API."""
@@ -160,49 +297,6 @@ class ProductionRouteService(RouteService):
             'route_type': 'geometric_fallback'
         }
     
-    def _nearest_neighbor_tsp(self, cities: List[City]) -> List[City]:
-        """Approximate TSP solution using nearest neighbor algorithm."""
-        if not cities:
-            return []
-        
-        # Ensure the starting city has valid coordinates
-        if not cities[0].coordinates or cities[0].coordinates.latitude is None or cities[0].coordinates.longitude is None:
-            logger.warning(f"Starting city {cities[0].name} has invalid coordinates, skipping TSP")
-            return cities  # Return original order if first city has no coordinates
-        
-        unvisited = cities[1:]  # Start with first city
-        route = [cities[0]]
-        current = cities[0]
-        
-        while unvisited:
-            # Ensure current city has valid coordinates
-            if not current.coordinates or current.coordinates.latitude is None or current.coordinates.longitude is None:
-                logger.warning(f"Current city {current.name} has invalid coordinates, stopping TSP")
-                # Add remaining cities to route without optimization
-                route.extend(unvisited)
-                break
-            
-            # Filter cities with valid coordinates for comparison
-            valid_unvisited = [c for c in unvisited if c.coordinates and 
-                             c.coordinates.latitude is not None and 
-                             c.coordinates.longitude is not None]
-            
-            if not valid_unvisited:
-                # Add remaining cities (even with invalid coordinates) to preserve route
-                route.extend(unvisited)
-                break
-                
-            nearest = min(valid_unvisited, key=lambda c: geodesic(
-                (current.coordinates.latitude, current.coordinates.longitude),
-                (c.coordinates.latitude, c.coordinates.longitude)
-            ).kilometers)
-            
-            route.append(nearest)
-            unvisited.remove(nearest)
-            current = nearest
-        
-        return route
-    
     def generate_route_variants(self, start: City, end: City) -> List[TravelRoute]:
         """Generate different route variants for different travel styles."""
         variants = []
@@ -7,6 +7,7 @@ import structlog
 from ..core.interfaces import TravelPlannerService
 from ..core.models import TripRequest, ServiceResult, TravelRoute, RouteType
 from ..core.exceptions import TravelPlannerException
+from ..infrastructure.http_client import run_sync
 from .google_places_city_service import GooglePlacesCityService
 from .route_service import ProductionRouteService
 from .validation_service import ValidationService
@@ -45,8 +46,8 @@ class TravelPlannerServiceImpl(TravelPlannerService):
                 logger.info("Already in event loop, using sync fallback for route generation")
                 return self._generate_routes_sync(request)
             except RuntimeError:
-                # No running loop, can use asyncio.run
-                return asyncio.run(self._generate_routes_async(request))
+                # No running loop, can use run_sync
+                return run_sync(self._generate_routes_async(request))
         except Exception as e:
             logger.error("Route generation failed", error=str(e))
             return ServiceResult.error_result(f"Route generation failed: {e}")
@@ -357,36 +358,13 @@ class TravelPlannerServiceImpl(TravelPlannerService):
                                               request: TripRequest, max_cities: int) -> List:
         """Synchronous wrapper for enhanced intermediate city selection."""
         try:
-            # Check if we can run async
-            try:
-                loop = asyncio.get_running_loop()
-                # We're in an event loop, create a task
-                logger.info("Using thread pool for enhanced city selection")
-                import concurrent.futures
-                
-                def run_async():
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    try:
-                        return new_loop.run_until_complete(
-                            self.enhanced_intermediate_service.find_optimal_intermediate_cities(
-                                start_city, end_city, request, strategy['type'], max_cities
-                            )
-                        )
-                    finally:
-                        new_loop.close()
-                
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(run_async)
-                    return future.result(timeout=30)  # 30 second timeout
-                    
-            except RuntimeError:
-                # No running loop, can use asyncio.run directly
-                return asyncio.run(
-                    self.enhanced_intermediate_service.find_optimal_intermediate_cities(
-                        start_city, end_city, request, strategy['type'], max_cities
-                    )
-                )
+            # Runs on this thread's worker loop, or a helper thread's if a loop is already running
+            return run_sync(
+                self.enhanced_intermediate_service.find_optimal_intermediate_cities(
+                    start_city, end_city, request, strategy['type'], max_cities
+                ),
+                timeout=30
+            )
                 
         except Exception as e:
             logger.error(f"Enhanced city selection failed: {e}")
@@ -681,9 +659,8 @@ class TravelPlannerServiceImpl(TravelPlannerService):
         
         # Generate complete day-by-day itinerary for this specific route (sync version)
         try:
-            # Use asyncio.run for the async itinerary generation
-            import asyncio
-            itinerary_data = asyncio.run(self.itinerary_generator._create_daily_itinerary(
+            # Use run_sync for the async itinerary generation
+            itinerary_data = run_sync(self.itinerary_generator._create_daily_itinerary(
                 start_city, end_city, intermediate_cities_for_itinerary, request
             ))
             enriched_route['daily_itinerary'] = itinerary_data
@@ -0,0 +1,197 @@
+"""
+Background prefetch of trip data for freshly generated routes.
+
+After trip planning returns, the frontend almost always requests
+/api/trip-data for the cities of the top routes. The prefetcher queues
+the hotel, restaurant, attraction and event fetches for those cities as soon
+as the routes exist, so the response cache is warm when that request arrives.
+
+Jobs run on a dedicated background event loop from a bounded priority
+queue ordered by route rank. When the queue is full, a new job displaces the
+lowest-ranked queued job or is dropped if it ranks no better. Jobs that
+wait longer than ``max_job_age_seconds`` are discarded as no longer useful.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from ..core.models import Coordinates
+from .trip_data_service import TripDataService, get_trip_data_service
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(order=True)
+class PrefetchJob:
+    """One provider fetch for one city."""
+    priority: Tuple[int, int]  # (route rank, enqueue order)
+    key: Tuple = field(compare=False)
+    fetch: Callable[[], Awaitable[Any]] = field(compare=False)
+    created_at: float = field(default_factory=time.time, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class TripDataPrefetcher:
+    """Bounded, rank-ordered background queue of trip data fetches."""
+    
+    def __init__(self, trip_data_service: Optional[TripDataService] = None, max_queue: int = 200,
+                 workers: int = 4, top_routes: int = 3, job_timeout_seconds: float = 20.0,
+                 max_job_age_seconds: float = 120.0):
+        self.trip_data_service = trip_data_service or get_trip_data_service()
+        self.max_queue = max_queue
+        self.workers = workers
+        self.top_routes = top_routes
+        self.job_timeout_seconds = job_timeout_seconds
+        self.max_job_age_seconds = max_job_age_seconds
+        self.enabled = os.getenv('TRIP_DATA_PREFETCH', 'true').lower() == 'true'
+        
+        # Queue state is only touched on the background loop
+        self._heap: List[PrefetchJob] = []
+        self._queued: Dict[Tuple, PrefetchJob] = {}
+        self._running: Set[Tuple] = set()
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._available: Optional[asyncio.Event] = None
+        self._start_lock = threading.Lock()
+        self.stats = {'enqueued': 0, 'duplicates': 0, 'displaced': 0, 'rejected': 0,
+                      'expired': 0, 'completed': 0, 'failed': 0}
+    
+    def prefetch_routes(self, routes: List[Dict[str, Any]]):
+        """Queue trip data fetches for the cities of the top routes, best-ranked first."""
+        if not self.enabled or not routes:
+            return
+        
+        jobs = []
+        for rank, route in enumerate(routes[:self.top_routes]):
+            # Same cities the trip details page requests: stops plus destination
+            for city in list(route.get('intermediate_cities') or []) + [route.get('end_city') or {}]:
+                target = self._city_target(city)
+                if target is None:
+                    continue
+                city_name, coordinates = target
+                fetches = self.trip_data_service.provider_fetches(city_name, coordinates)
+                for kind, fetch in fetches.items():
+                    key = (kind, city_name, round(coordinates.latitude, 4), round(coordinates.longitude, 4))
+                    jobs.append((rank, key, fetch))
+        
+        if jobs:
+            loop = self._ensure_started()
+            loop.call_soon_threadsafe(self._enqueue_all, jobs)
+    
+    def _city_target(self, city: Dict[str, Any]) -> Optional[Tuple[str, Coordinates]]:
+        name = city.get('name')
+        coordinates = city.get('coordinates')
+        if isinstance(coordinates, dict):
+            coordinates = [coordinates.get('latitude'), coordinates.get('longitude')]
+        if not name or not coordinates or len(coordinates) < 2 or None in coordinates[:2]:
+            return None
+        return name, Coordinates(latitude=coordinates[0], longitude=coordinates[1])
+    
+    def _enqueue_all(self, jobs: List[Tuple[int, Tuple, Callable[[], Awaitable[Any]]]]):
+        for rank, key, fetch in jobs:
+            self._enqueue(PrefetchJob(priority=(rank, next(self._sequence)), key=key, fetch=fetch))
+        self._available.set()
+    
+    def _enqueue(self, job: PrefetchJob):
+        if job.key in self._running:
+            self.stats['duplicates'] += 1
+            return
+        
+        existing = self._queued.get(job.key)
+        if existing is not None:
+            if existing.priority[0] <= job.priority[0]:
+                self.stats['duplicates'] += 1
+                return
+            # Re-queued by a better-ranked route: replace the old entry
+            existing.cancelled = True
+            del self._queued[job.key]
+        
+        if len(self._queued) >= self.max_queue:
+            worst = max(self._queued.values())
+            if worst.priority[0] <= job.priority[0]:
+                self.stats['rejected'] += 1
+                return
+            worst.cancelled = True
+            del self._queued[worst.key]
+            self.stats['displaced'] += 1
+        
+        heapq.heappush(self._heap, job)
+        self._queued[job.key] = job
+        self.stats['enqueued'] += 1
+    
+    async def _next_job(self) -> PrefetchJob:
+        while True:
+            while self._heap:
+                job = heapq.heappop(self._heap)
+                if job.cancelled:
+                    continue
+                del self._queued[job.key]
+                if time.time() - job.created_at > self.max_job_age_seconds:
+                    self.stats['expired'] += 1
+                    continue
+                return job
+            self._available.clear()
+            await self._available.wait()
+    
+    async def _worker(self):
+        while True:
+            job = await self._next_job()
+            self._running.add(job.key)
+            try:
+                await asyncio.wait_for(job.fetch(), timeout=self.job_timeout_seconds)
+                self.stats['completed'] += 1
+            except asyncio.CancelledError:
+                # A cancelled fetch fails the job; only cancelling the worker itself stops it
+                if asyncio.current_task().cancelling():
+                    raise
+                self.stats['failed'] += 1
+                logger.debug("Prefetch job cancelled", key=job.key)
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.debug("Prefetch job failed", key=job.key, error=str(e))
+            finally:
+                self._running.discard(job.key)
+    
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+                
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._available = asyncio.Event()
+                    for _ in range(self.workers):
+                        loop.create_task(self._worker())
+                    started.set()
+                    loop.run_forever()
+                
+                threading.Thread(target=run, name='trip-data-prefetch', daemon=True).start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'queued': len(self._queued), 'running': len(self._running)}
+
+
+# Global prefetcher instance
+_trip_data_prefetcher = None
+_trip_data_prefetcher_lock = threading.Lock()
+
+
+def get_trip_data_prefetcher() -> TripDataPrefetcher:
+    """Get the global trip data prefetcher."""
+    global _trip_data_prefetcher
+    if _trip_data_prefetcher is None:
+        with _trip_data_prefetcher_lock:
+            if _trip_data_prefetcher is None:
+                _trip_data_prefetcher = TripDataPrefetcher()
+    return _trip_data_prefetcher
@@ -0,0 +1,205 @@
+"""
+Trip data aggregation: hotels, restaurants and activities for every city of a trip.
+
+All cities and all providers are fetched concurrently in one event loop.
+Each provider call has its own timeout; a provider that fails or times out
+is replaced by its fallback data and reported, so the rest of the trip data
+is still returned.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import structlog
+
+from ..core.models import Coordinates
+from .amadeus_service import AmadeusHotelService, get_amadeus_service
+from .eventbrite_service import EventbriteService, get_eventbrite_service
+from .foursquare_service import FoursquareService
+from .opentripmap_service import OpenTripMapService, get_opentripmap_service
+
+logger = structlog.get_logger(__name__)
+
+# Seconds to wait for each provider before falling back
+DEFAULT_PROVIDER_TIMEOUTS = {
+    'amadeus': 8.0,  # Token, hotel list and offers are three round trips
+    'foursquare': 5.0,
+    'opentripmap': 6.0,  # Includes attraction details
+    'eventbrite': 5.0
+}
+
+ATTRACTION_KINDS = 'cultural,historic,architecture,museums,churches,monuments'
+
+KIND_CATEGORIES = {
+    'religion': 'Religious Site',
+    'churches': 'Church',
+    'museums': 'Museum',
+    'monuments': 'Monument',
+    'architecture': 'Architecture',
+    'historic': 'Historic Site',
+    'cultural': 'Cultural Site',
+    'bridges': 'Bridge',
+    'castles': 'Castle',
+    'palaces': 'Palace',
+    'squares': 'Square',
+    'parks': 'Park'
+}
+
+
+def get_category_from_kinds(kinds: List[str]) -> str:
+    """Convert OpenTripMap kinds to display category."""
+    if not kinds:
+        return 'Attraction'
+    
+    for kind in kinds:
+        if kind in KIND_CATEGORIES:
+            return KIND_CATEGORIES[kind]
+    
+    return kinds[0].title().replace('_', ' ')
+
+
+class TripDataService:
+    """Fetches hotels, restaurants and activities for the cities of a trip."""
+    
+    def __init__(self, amadeus_service: AmadeusHotelService = None,
+                 foursquare_service: FoursquareService = None,
+                 opentripmap_service: OpenTripMapService = None,
+                 eventbrite_service: EventbriteService = None,
+                 timeouts: Optional[Dict[str, float]] = None):
+        self.amadeus_service = amadeus_service or get_amadeus_service()
+        self.foursquare_service = foursquare_service or FoursquareService()
+        self.opentripmap_service = opentripmap_service or get_opentripmap_service()
+        self.eventbrite_service = eventbrite_service or get_eventbrite_service()
+        self.timeouts = {**DEFAULT_PROVIDER_TIMEOUTS, **(timeouts or {})}
+    
+    async def fetch_trip_data(self, cities: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Fetch data for every city concurrently.
+        
+        Cities are dicts with ``name`` and ``coordinates`` ([lat, lon]); entries
+        missing either are skipped. ``failed`` maps city names to the providers
+        that were replaced by fallback data.
+        """
+        targets = []
+        for city in cities:
+            city_name = city.get('name', '')
+            coordinates = city.get('coordinates', [])
+            if city_name and coordinates and len(coordinates) >= 2:
+                targets.append((city_name, Coordinates(latitude=coordinates[0], longitude=coordinates[1])))
+        
+        results = await asyncio.gather(*(self.fetch_city(name, coords) for name, coords in targets))
+        
+        trip_data = {'hotels': {}, 'restaurants': {}, 'activities': {}, 'failed': {}}
+        for (city_name, _), result in zip(targets, results):
+            trip_data['hotels'][city_name] = result['hotels']
+            trip_data['restaurants'][city_name] = result['restaurants']
+            trip_data['activities'][city_name] = result['activities']
+            if result['failed']:
+                trip_data['failed'][city_name] = result['failed']
+        return trip_data
+    
+    def provider_fetches(self, city_name: str, coordinates: Coordinates) -> Dict[str, Callable[[], Awaitable[List[Dict]]]]:
+        """
+        Provider calls for one city, keyed by data kind.
+        
+        The prefetcher runs these same calls, so its results land under the
+        cache keys this service reads.
+        """
+        return {
+            'hotels': lambda: self.amadeus_service.find_hotels(coordinates, city_name),
+            'restaurants': lambda: self.foursquare_service.find_restaurants(coordinates, city_name, limit=10),
+            'attractions': lambda: self.opentripmap_service.get_city_attractions(
+                coordinates=coordinates, radius_km=5, limit=10, kinds=ATTRACTION_KINDS),
+            'events': lambda: self.eventbrite_service.find_events_by_location(
+                coordinates=coordinates, city_name=city_name, limit=5)
+        }
+    
+    async def fetch_city(self, city_name: str, coordinates: Coordinates) -> Dict[str, Any]:
+        """Fetch all providers for one city concurrently."""
+        failed: List[str] = []
+        fetches = self.provider_fetches(city_name, coordinates)
+        
+        hotels, restaurants, attractions, events = await asyncio.gather(
+            self._call('amadeus', city_name, failed, fetches['hotels'],
+                       lambda: self.amadeus_service._get_fallback_hotels(city_name, 10)),
+            self._call('foursquare', city_name, failed, fetches['restaurants'],
+                       lambda: self.foursquare_service._get_fallback_restaurants(city_name, 10)),
+            self._call('opentripmap', city_name, failed, fetches['attractions'], list),
+            self._call('eventbrite', city_name, failed, fetches['events'], list)
+        )
+        
+        activities = [
+            self._format_attraction(attraction, city_name)
+            for attraction in attractions if attraction.get('xid')
+        ]
+        activities.extend(events)
+        
+        # Top up with Foursquare activities when the attraction sources came back thin
+        if len(activities) < 5:
+            activities.extend(await self._call(
+                'foursquare', city_name, failed,
+                lambda: self.foursquare_service.find_activities(coordinates, city_name, limit=10),
+                lambda: self.foursquare_service._get_fallback_activities(city_name, 10)
+            ))
+        
+        logger.info("Fetched trip data for city", city=city_name, hotels=len(hotels),
+                    restaurants=len(restaurants), activities=len(activities), failed=failed)
+        return {'hotels': hotels, 'restaurants': restaurants, 'activities': activities, 'failed': failed}
+    
+    async def _call(self, provider: str, city_name: str, failed: List[str],
+                    call: Callable[[], Awaitable[List[Dict]]], fallback: Callable[[], List[Dict]]) -> List[Dict]:
+        """Await a provider call under its timeout, substituting fallback data on failure."""
+        try:
+            return await asyncio.wait_for(call(), timeout=self.timeouts[provider])
+        except asyncio.TimeoutError:
+            logger.warning("Provider timed out", provider=provider, city=city_name,
+                           timeout=self.timeouts[provider])
+        except asyncio.CancelledError:
+            # Only a cancellation aimed at this request propagates; one leaking out of
+            # a call shared with another request is just a provider failure here
+            if asyncio.current_task().cancelling():
+                raise
+            logger.warning("Provider call cancelled", provider=provider, city=city_name)
+        except Exception as e:
+            logger.warning("Provider failed", provider=provider, city=city_name, error=str(e))
+        
+        if provider not in failed:
+            failed.append(provider)
+        return fallback()
+    
+    def _format_attraction(self, attraction: Dict, city_name: str) -> Dict:
+        """Shape an OpenTripMap attraction like the other activity sources."""
+        photo_url = attraction.get('image') or attraction.get('preview', {}).get('source', '')
+        address = attraction.get('address', '')
+        if not address:
+            address = f"{city_name}, {', '.join(attraction.get('kinds', [])[:2])}"
+        description = attraction.get('info', {}).get('descr', '')
+        
+        return {
+            'name': attraction.get('name', 'Unknown Attraction'),
+            'rating': attraction.get('rating', 4),
+            'price_level': 0,  # Most attractions are free
+            'address': address,
+            'category': get_category_from_kinds(attraction.get('kinds', [])),
+            'website': attraction.get('wikipedia') or '',
+            'url': attraction.get('wikipedia') or '',
+            'hours': 'Check local listings',
+            'photo': photo_url,
+            'source': 'opentripmap',
+            'description': description[:200] + '....' if description else f"Historic attraction in {city_name}"
+        }
+
+
+# Global trip data service instance
+_trip_data_service = None
+_trip_data_service_lock = threading.Lock()
+
+
+def get_trip_data_service() -> TripDataService:
+    """Get the global trip data service instance."""
+    global _trip_data_service
+    if _trip_data_service is None:
+        with _trip_data_service_lock:
+            if _trip_data_service is None:
+                _trip_data_service = TripDataService()
+    return _trip_data_service
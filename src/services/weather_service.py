@@ -3,11 +3,14 @@ Weather service for real-time weather data and travel optimization.
 """
 import os
 import asyncio
-import aiohttp
-from typing import Dict, List, Optional, Any
+import math
+import time
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import structlog
 from ..core.models import Coordinates
+from ..infrastructure.response_cache import CachePolicy, cached_get
+from ..infrastructure.single_flight import coalesce
 
 logger = structlog.get_logger(__name__)
 
@@ -17,20 +20,22 @@ class WeatherService:
     def __init__(self):
         self.api_key = os.getenv('OPENWEATHER_API_KEY')  # Free OpenWeatherMap API
         self.base_url = "https://api.openweathermap.org/data/2.5"
-        self.session = None
+        
+        # Route weather is fetched per grid cell and time bucket, so nearby
+        # cities (Nice, Cannes, Monaco) share one upstream forecast call
+        self.grid_degrees = float(os.getenv('WEATHER_GRID_DEGREES', 0.5))
+        self.bucket_seconds = 30 * 60
         
         if not self.api_key:
             logger.warning("Weather API key not configured - using fallback data")
     
+    @coalesce('openweathermap')
     async def get_current_weather(self, coordinates: Coordinates, city_name: str) -> Dict:
         """Get current weather for a location."""
         if not self.api_key:
             return self._get_fallback_weather(city_name)
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/weather"
             params = {
                 'lat': coordinates.latitude,
@@ -39,7 +44,7 @@ class WeatherService:
                 'units': 'metric'
             }
             
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, provider='openweathermap') as response:
                 if response.status == 200:
                     data = await response.json()
                     return self._format_current_weather(data, city_name)
@@ -51,15 +56,13 @@ class WeatherService:
             logger.error(f"Weather fetch error: {e}")
             return self._get_fallback_weather(city_name)
     
+    @coalesce('openweathermap')
     async def get_weather_forecast(self, coordinates: Coordinates, city_name: str, days: int = 5) -> Dict:
         """Get weather forecast for a location."""
         if not self.api_key:
             return self._get_fallback_forecast(city_name, days)
         
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
-            
             url = f"{self.base_url}/forecast"
             params = {
                 'lat': coordinates.latitude,
@@ -69,7 +72,7 @@ class WeatherService:
                 'cnt': days * 8  # 8 forecasts per day (3-hour intervals)
             }
             
-            async with self.session.get(url, params=params) as response:
+            async with cached_get(url, params=params, provider='openweathermap') as response:
                 if response.status == 200:
                     data = await response.json()
                     return self._format_forecast(data, city_name)
@@ -82,36 +85,80 @@ class WeatherService:
             return self._get_fallback_forecast(city_name, days)
     
     async def get_route_weather(self, route_cities: List[Dict]) -> Dict:
-        """Get weather data for all cities in a route."""
-        weather_data = {}
-        
+        """Get weather data for all cities in a route, one forecast call per grid cell."""
+        city_cells = {}
         for city in route_cities:
             city_name = city.get('name', '')
             coordinates = city.get('coordinates', [])
-            
             if city_name and coordinates:
-                try:
-                    from ..core.models import Coordinates
-                    city_coords = Coordinates(latitude=coordinates[0], longitude=coordinates[1])
-                    
-                    # Get both current weather and forecast
-                    current = await self.get_current_weather(city_coords, city_name)
-                    forecast = await self.get_weather_forecast(city_coords, city_name)
-                    
-                    weather_data[city_name] = {
-                        'current': current,
-                        'forecast': forecast
-                    }
-                    
-                except Exception as e:
-                    logger.warning(f"Weather fetch failed for {city_name}: {e}")
+                city_cells[city_name] = self.weather_cell(coordinates[0], coordinates[1])
+        
+        cells = list(set(city_cells.values()))
+        if self.api_key:
+            results = await asyncio.gather(*(self._get_cell_forecast(cell) for cell in cells),
+                                           return_exceptions=True)
+        else:
+            results = [None] * len(cells)
+        cell_forecasts = dict(zip(cells, results))
+        
+        weather_data = {}
+        for city_name, cell in city_cells.items():
+            data = cell_forecasts.get(cell)
+            try:
+                if isinstance(data, dict) and data.get('list'):
                     weather_data[city_name] = {
-                        'current': self._get_fallback_weather(city_name),
-                        'forecast': self._get_fallback_forecast(city_name, 5)
+                        'current': self._current_from_forecast(data, city_name),
+                        'forecast': self._format_forecast(data, city_name)
                     }
+                    continue
+                if isinstance(data, Exception):
+                    logger.warning(f"Weather fetch failed for {city_name}: {data}")
+            except Exception as e:
+                logger.warning(f"Weather fetch failed for {city_name}: {e}")
+            
+            weather_data[city_name] = {
+                'current': self._get_fallback_weather(city_name),
+                'forecast': self._get_fallback_forecast(city_name, 5)
+            }
         
+        logger.info("Route weather fetched", cities=len(city_cells), cells=len(cells))
         return weather_data
     
+    def weather_cell(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        """Centre of the grid cell containing a point."""
+        size = self.grid_degrees
+        return (
+            round((math.floor(latitude / size) + 0.5) * size, 4),
+            round((math.floor(longitude / size) + 0.5) * size, 4)
+        )
+    
+    @coalesce('openweathermap')
+    async def _get_cell_forecast(self, cell: Tuple[float, float]) -> Optional[Dict]:
+        """Raw 5-day forecast for a grid cell, cached until the end of the current time bucket."""
+        now = time.time()
+        bucket_end = (now // self.bucket_seconds + 1) * self.bucket_seconds
+        policy = CachePolicy(ttl_seconds=int(bucket_end - now) + 1, stale_seconds=self.bucket_seconds)
+        
+        params = {
+            'lat': cell[0],
+            'lon': cell[1],
+            'appid': self.api_key,
+            'units': 'metric',
+            'cnt': 40  # Five days of 3-hour steps
+        }
+        async with cached_get(f"{self.base_url}/forecast", params=params, policy=policy,
+                              provider='openweathermap') as response:
+            if response.status == 200:
+                return await response.json()
+            logger.warning(f"Weather forecast API error: {response.status}")
+            return None
+    
+    def _current_from_forecast(self, data: Dict, city_name: str) -> Dict:
+        """Current conditions from the forecast step closest to now."""
+        now = time.time()
+        step = min(data['list'], key=lambda entry: abs(entry['dt'] - now))
+        return self._format_current_weather(step, city_name)
+    
     def analyze_travel_conditions(self, weather_data: Dict) -> Dict:
         """Analyze weather conditions for travel optimization."""
         analysis = {
@@ -360,9 +407,7 @@ class WeatherService:
         }
     
     async def close(self):
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
+        """Nothing to release; the pooled HTTP session is closed at shutdown."""
 
 # Global service instance
 _weather_service = None
@@ -4,8 +4,7 @@ Enhanced Flask application with AI features, user accounts, and advanced functio
 import os
 import json
 import asyncio
-from typing import List
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, stream_with_context
 from werkzeug.exceptions import BadRequest, InternalServerError
 try:
     import structlog
@@ -19,6 +18,8 @@ from datetime import datetime, timedelta
 # Import existing services
 from ...infrastructure.config import SecureConfigurationService
 from ...infrastructure.logging import configure_logging, SecurityLogger
+from ...infrastructure.ai_scheduler import AISchedulerBusy, get_ai_scheduler, set_ai_user
+from ...infrastructure.http_client import iter_sync, run_sync
 from ...services.google_places_city_service import GooglePlacesCityService
 from ...services.route_service import ProductionRouteService
 from ...services.validation_service import ValidationService
@@ -37,6 +38,8 @@ from ...services.memory_service import get_memory_service
 from ...services.opentripmap_service import get_opentripmap_service
 from ...services.amadeus_service import get_amadeus_service
 from ...services.eventbrite_service import get_eventbrite_service
+from ...services.trip_data_service import TripDataService
+from ...services.trip_data_prefetcher import TripDataPrefetcher
 from ...services.ml_recommendation_service import MLRecommendationService, TripPreference
 from ...core.exceptions import TravelPlannerException, ValidationError
 
@@ -49,34 +52,19 @@ configure_logging(
 logger = structlog.get_logger(__name__)
 security_logger = SecurityLogger()
 
-def get_category_from_kinds(kinds: List[str]) -> str:
-    """Convert OpenTripMap kinds to display category."""
-    if not kinds:
-        return 'Attraction'
-    
-    # Map kinds to user-friendly categories
-    kind_mapping = {
-        'religion': 'Religious Site',
-        'churches': 'Church',
-        'museums': 'Museum',
-        'monuments': 'Monument',
-        'architecture': 'Architecture',
-        'historic': 'Historic Site',
-        'cultural': 'Cultural Site',
-        'bridges': 'Bridge',
-        'castles': 'Castle',
-        'palaces': 'Palace',
-        'squares': 'Square',
-        'parks': 'Park'
-    }
-    
-    # Find first matching category
-    for kind in kinds:
-        if kind in kind_mapping:
-            return kind_mapping[kind]
+def stream_text_response(chunks, on_complete=None) -> Response:
+    """Server-sent events response: one ``{"delta": ...}`` event per chunk, then ``{"done": true}``."""
+    def events():
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        if on_complete:
+            on_complete(''.join(received))
+        yield f"data: {json.dumps({'done': True, 'timestamp': datetime.now().isoformat()})}\n\n"
     
-    # Default fallback
-    return kinds[0].title().replace('_', ' ') if kinds else 'Attraction'
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 def enhance_route_with_calculations(route, start_city, end_city):
     """Enhance route with missing distance, duration, and cost calculations."""
@@ -98,13 +86,23 @@ def enhance_route_with_calculations(route, start_city, end_city):
         ('Berlin', 'London'): 1100
     }
     
+    # Prefer the planner's segment totals, which come from the offline road graph when bundled
+    if not route.get('total_distance') and route.get('total_distance_km'):
+        route['total_distance'] = route['total_distance_km']
+        if not route.get('total_duration') and route.get('total_duration_hours'):
+            route['total_duration'] = int(route['total_duration_hours'] * 60)
+    
     # Get or calculate total distance
     if 'total_distance' not in route or route['total_distance'] is None or route['total_distance'] == 0:
         # Try to get distance from our map
         route_key = (start_city, end_city)
         reverse_key = (end_city, start_city)
+        road_route = _road_graph_route(route)
         
-        if route_key in distance_map:
+        if road_route:
+            total_distance = round(road_route['distance_km'])
+            route['total_duration'] = int(road_route['duration_hours'] * 60)
+        elif route_key in distance_map:
             total_distance = distance_map[route_key]
         elif reverse_key in distance_map:
             total_distance = distance_map[reverse_key]
@@ -146,12 +144,54 @@ def enhance_route_with_calculations(route, start_city, end_city):
     if not isinstance(route['estimated_fuel_cost'], (int, float)) or route['estimated_fuel_cost'] <= 0:
         route['estimated_fuel_cost'] = int((distance / 100) * 7 * 1.50)
     
-    # Ensure route has proper coordinates for map display
-    if 'coordinates' not in route or not route['coordinates']:
+    # Polyline through the actual cities, simplified per zoom level and encoded
+    stop_cities = _route_stop_cities(route)
+    if stop_cities and 'polyline' not in route:
+        from ...services.route_geometry import build_route_polyline, encode_route_geometry
+        geometry = encode_route_geometry(build_route_polyline(stop_cities))
+        if geometry:
+            overview = geometry.pop('overview')
+            route['polyline'] = geometry
+            # The raw point list duplicates the encoded levels; only old clients need it
+            if os.getenv('ROUTE_LEGACY_COORDINATES', 'false').lower() == 'true':
+                route['coordinates'] = overview
+            else:
+                route.pop('coordinates', None)
+    
+    # Ensure routes without a polyline have coordinates for map display
+    if 'polyline' not in route and not route.get('coordinates'):
         route['coordinates'] = generate_route_coordinates(start_city, end_city)
     
     return route
 
+def _route_stop_cities(route):
+    """Start, intermediate and end cities of a route payload, if all have coordinates."""
+    from ...core.models import City, Coordinates
+    
+    stops = [route.get('start_city')] + list(route.get('intermediate_cities') or []) + [route.get('end_city')]
+    cities = []
+    for stop in stops:
+        coordinates = stop.get('coordinates') if isinstance(stop, dict) else None
+        if not coordinates or len(coordinates) != 2:
+            return None
+        cities.append(City(stop.get('name', ''), Coordinates(coordinates[0], coordinates[1]), ''))
+    return cities
+
+def _road_graph_route(route):
+    """Drive time and distance through the route's cities over the offline road graph."""
+    from ...services.road_graph_service import get_road_graph_service
+    
+    road_graph = get_road_graph_service()
+    cities = _route_stop_cities(route)
+    if not cities or not road_graph.is_available():
+        return None
+    
+    try:
+        return road_graph.route(cities)
+    except Exception as e:
+        logger.warning("Road graph routing failed", error=str(e))
+        return None
+
 def generate_route_coordinates(start_city, end_city):
     """Generate approximate route coordinates for map display."""
     # Simplified coordinate generation for common European routes
@@ -234,6 +274,10 @@ def create_app() -> Flask:
     opentripmap_service = get_opentripmap_service()
     amadeus_service = get_amadeus_service()
     eventbrite_service = get_eventbrite_service()
+    trip_data_service = TripDataService(
+        amadeus_service, foursquare_service, opentripmap_service, eventbrite_service
+    )
+    trip_data_prefetcher = TripDataPrefetcher(trip_data_service)
     
     travel_planner = TravelPlannerServiceImpl(
         city_service, route_service, validation_service
@@ -260,6 +304,11 @@ def create_app() -> Flask:
             user_agent=request.headers.get('User-Agent', '')[:100]
         )
     
+    @app.before_request
+    def attribute_ai_jobs():
+        """Attribute AI jobs to the caller so the scheduler can share capacity fairly."""
+        set_ai_user(session.get('session_token') or session.get('session_id') or request.remote_addr)
+    
     @app.after_request
     def add_security_headers(response):
         """Add security headers to all responses."""
@@ -470,6 +519,12 @@ def create_app() -> Flask:
                 'travel_style': primary_travel_style
             }
             
+            # Warm /api/trip-data for the top routes while the user reads the results
+            try:
+                trip_data_prefetcher.prefetch_routes(routes_data.get('routes', []))
+            except Exception as e:
+                logger.warning(f"Trip data prefetch failed: {e}")
+            
             # Sanitize output
             response_data = validation_service.sanitize_output(routes_data)
             
@@ -552,6 +607,11 @@ def create_app() -> Flask:
             # Sanitize the data to handle JSON serialization issues (like Season enum)
             response_data = validation_service.sanitize_output(plan_result.data)
             
+            try:
+                trip_data_prefetcher.prefetch_routes(response_data.get('routes', []))
+            except Exception as e:
+                logger.warning(f"Trip data prefetch failed: {e}")
+            
             # Save search to history
             try:
                 session_id = session.get('session_id', 'anonymous')
@@ -598,161 +658,18 @@ def create_app() -> Flask:
             if not cities:
                 return jsonify({'error': 'Cities data required'}), 400
             
-            # Fetch real data from multiple sources
-            hotels_data = {}
-            restaurants_data = {}
-            activities_data = {}
-            
-            # Use asyncio to fetch data concurrently
-            for city in cities:
-                city_name = city.get('name', '')
-                coordinates = city.get('coordinates', [])
-                
-                if city_name and coordinates:
-                    try:
-                        # Fetch hotels
-                        from ...core.models import Coordinates
-                        city_coords = Coordinates(latitude=coordinates[0], longitude=coordinates[1])
-                        try:
-                            # Use Amadeus service - run async call properly
-                            import asyncio
-                            
-                            # Create a proper async function to call Amadeus
-                            async def get_amadeus_hotels():
-                                async with amadeus_service:
-                                    return await amadeus_service.find_hotels(city_coords, city_name)
-                            
-                            # Run the async call and get results
-                            try:
-                                hotels = asyncio.run(get_amadeus_hotels())
-                                hotels_data[city_name] = hotels
-                                
-                                # Check if we got real data or fallback data
-                                if hotels and hotels[0].get('source') == 'amadeus':
-                                    logger.info(f"Successfully fetched {len(hotels)} REAL hotels from Amadeus for {city_name}")
-                                else:
-                                    logger.warning(f"Using {len(hotels)} FALLBACK hotels for {city_name} - Amadeus API returned no real data")
-                                    
-                            except Exception as e:
-                                logger.warning(f"Amadeus API failed for {city_name}: {e}")
-                                # Only use fallback if Amadeus fails
-                                hotels_data[city_name] = amadeus_service._get_fallback_hotels(city_name, 10)
-                                logger.warning(f"Using {len(hotels_data[city_name])} FALLBACK hotels for {city_name} due to API error")
-                                
-                        except Exception as e:
-                            logger.error(f"Critical error fetching hotels for {city_name}: {e}")
-                            # If everything fails, use fallback data
-                            hotels_data[city_name] = amadeus_service._get_fallback_hotels(city_name, 10)
-                        
-                        # Fetch restaurants and activities
-                        try:
-                            # Use async methods for Foursquare, OpenTripMap, and Eventbrite
-                            async def get_combined_data():
-                                # Get restaurants from Foursquare
-                                restaurants = await foursquare_service.find_restaurants(city_coords, city_name, limit=10)
-                                
-                                # Get activities from OpenTripMap (better for attractions)
-                                async with opentripmap_service:
-                                    opentripmap_activities = await opentripmap_service.get_city_attractions(
-                                        coordinates=city_coords,
-                                        radius_km=5,
-                                        limit=10,
-                                        kinds='cultural,historic,architecture,museums,churches,monuments'
-                                    )
-                                
-                                # Get events from Eventbrite
-                                async with eventbrite_service:
-                                    eventbrite_events = await eventbrite_service.find_events_by_location(
-                                        coordinates=city_coords,
-                                        city_name=city_name,
-                                        limit=5
-                                    )
-                                
-                                # Format OpenTripMap data to match expected format
-                                formatted_activities = []
-                                for attraction in opentripmap_activities:
-                                    if attraction.get('xid'):  # Real OpenTripMap data
-                                        # Get the best available image
-                                        photo_url = ''
-                                        if attraction.get('image'):
-                                            photo_url = attraction.get('image')
-                                        elif attraction.get('preview', {}).get('source'):
-                                            photo_url = attraction.get('preview', {}).get('source')
-                                        
-                                        # Get better address information
-                                        address = attraction.get('address', '')
-                                        if not address:
-                                            address = f"{city_name}, {', '.join(attraction.get('kinds', [])[:2])}"
-                                        
-                                        formatted_activities.append({
-                                            'name': attraction.get('name', 'Unknown Attraction'),
-                                            'rating': attraction.get('rating', 4),
-                                            'price_level': 0,  # Most attractions are free
-                                            'address': address,
-                                            'category': get_category_from_kinds(attraction.get('kinds', [])),
-                                            'website': attraction.get('wikipedia') or '',
-                                            'url': attraction.get('wikipedia') or '',
-                                            'hours': 'Check local listings',
-                                            'photo': photo_url,
-                                            'source': 'opentripmap',
-                                            'description': attraction.get('info', {}).get('descr', '')[:200] + '....' if attraction.get('info', {}).get('descr') else f"Historic attraction in {city_name}"
-                                        })
-                                
-                                # Add Eventbrite events to activities
-                                for event in eventbrite_events:
-                                    formatted_activities.append(event)
-                                
-                                # If no real OpenTripMap data, try Foursquare activities as backup
-                                if len(formatted_activities) < 5:  # Only add Foursquare if we need more activities
-                                    foursquare_activities = await foursquare_service.find_activities(city_coords, city_name, limit=10)
-                                    formatted_activities.extend(foursquare_activities)
-                                
-                                return restaurants, formatted_activities
-                            
-                            restaurants, activities = asyncio.run(get_combined_data())
-                            
-                            # Check if we got real data or fallback data
-                            if restaurants and restaurants[0].get('source') == 'foursquare':
-                                logger.info(f"Successfully fetched {len(restaurants)} REAL restaurants from Foursquare for {city_name}")
-                            else:
-                                logger.warning(f"Using {len(restaurants)} FALLBACK restaurants for {city_name} - Foursquare API returned no real data")
-                                
-                            # Count different types of activities
-                            opentripmap_count = sum(1 for a in activities if a.get('source') == 'opentripmap')
-                            eventbrite_count = sum(1 for a in activities if a.get('source') == 'eventbrite')
-                            foursquare_count = sum(1 for a in activities if a.get('source') == 'foursquare')
-                            fallback_count = sum(1 for a in activities if a.get('source') == 'fallback')
-                            
-                            if opentripmap_count > 0:
-                                logger.info(f"Successfully fetched {opentripmap_count} REAL attractions from OpenTripMap for {city_name}")
-                            if eventbrite_count > 0:
-                                logger.info(f"Successfully fetched {eventbrite_count} REAL events from Eventbrite for {city_name}")
-                            if foursquare_count > 0:
-                                logger.info(f"Successfully fetched {foursquare_count} REAL activities from Foursquare for {city_name}")
-                            if fallback_count > 0:
-                                logger.warning(f"Using {fallback_count} FALLBACK activities for {city_name} - Some APIs returned no real data")
-                                
-                        except Exception as e:
-                            logger.warning(f"Combined API calls failed for {city_name}: {e}")
-                            # Use fallback data if both APIs fail
-                            restaurants = foursquare_service._get_fallback_restaurants(city_name, 10)
-                            activities = foursquare_service._get_fallback_activities(city_name, 10)
-                            logger.warning(f"Using {len(restaurants)} FALLBACK restaurants and {len(activities)} FALLBACK activities for {city_name} due to API errors")
-                        
-                        restaurants_data[city_name] = restaurants
-                        activities_data[city_name] = activities
-                        
-                    except Exception as e:
-                        logger.warning(f"Data fetch failed for {city_name}: {e}")
-                        continue
+            # Every city and provider is fetched concurrently; failed providers fall back
+            trip_data = run_sync(trip_data_service.fetch_trip_data(cities))
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'hotels': hotels_data,
-                    'restaurants': restaurants_data,
-                    'activities': activities_data
-                }
+                    'hotels': trip_data['hotels'],
+                    'restaurants': trip_data['restaurants'],
+                    'activities': trip_data['activities']
+                },
+                'partial': bool(trip_data['failed']),
+                'failed_providers': trip_data['failed']
             })
             
         except Exception as e:
@@ -791,6 +708,32 @@ def create_app() -> Flask:
                     'travel_preferences': user.get('travel_preferences', '{}')
                 }
             
+            def save_chat_history(response):
+                """Save both sides of the exchange if the user is logged in."""
+                if not user:
+                    return
+                with get_database().get_connection() as conn:
+                    # Save user message
+                    conn.execute('''
+                        INSERT INTO ai_chat_history (user_id, session_id, message_type, message_content)
+                        VALUES (?, ?, ?, ?)
+                    ''', (user['id'], session_id, 'user', user_message))
+                    
+                    # Save assistant response
+                    conn.execute('''
+                        INSERT INTO ai_chat_history (user_id, session_id, message_type, message_content)
+                        VALUES (?, ?, ?, ?)
+                    ''', (user['id'], session_id, 'assistant', response))
+                    
+                    conn.commit()
+            
+            session_id = session.get('session_id', 'anonymous')
+            if data.get('stream'):
+                return stream_text_response(
+                    iter_sync(claude_service.stream_chat_assistant(user_message, chat_history, user_context)),
+                    on_complete=save_chat_history
+                )
+            
             # Get AI response
             try:
                 # Use sync version since we're in a Flask route
@@ -801,8 +744,8 @@ def create_app() -> Flask:
                     # We're in an event loop, need to handle differently
                     response = "I'm currently unable to process your request. Please try again later."
                 except RuntimeError:
-                    # No running loop, can use asyncio.run
-                    response = asyncio.run(claude_service.travel_chat_assistant(
+                    # No running loop, can use run_sync
+                    response = run_sync(claude_service.travel_chat_assistant(
                         user_message, chat_history, user_context
                     ))
             except Exception as e:
@@ -810,23 +753,7 @@ def create_app() -> Flask:
                 # Provide fallback response
                 response = "I'm currently unable to process your request. Please try again later."
             
-            # Save chat history if user is logged in
-            if user:
-                session_id = session.get('session_id', 'anonymous')
-                with get_database().get_connection() as conn:
-                    # Save user message
-                    conn.execute('''
-                        INSERT INTO ai_chat_history (user_id, session_id, message_type, message_content)
-                        VALUES (?, ?, ?, ?)
-                    ''', (user['id'], session_id, 'user', user_message))
-                    
-                    # Save assistant response
-                    conn.execute('''
-                        INSERT INTO ai_chat_history (user_id, session_id, message_type, message_content)
-                        VALUES (?, ?, ?, ?)
-                    ''', (user['id'], session_id, 'assistant', response))
-                    
-                    conn.commit()
+            save_chat_history(response)
             
             return jsonify({
                 'success': True,
@@ -948,7 +875,7 @@ def create_app() -> Flask:
             route_cities = data.get('cities', [])
             
             try:
-                weather_data = weather_service.get_route_weather(route_cities)
+                weather_data = run_sync(weather_service.get_route_weather(route_cities))
                 analysis = weather_service.analyze_travel_conditions(weather_data)
             except:
                 # Fallback weather data
@@ -1354,10 +1281,16 @@ def create_app() -> Flask:
             # Get Claude service
             claude_service = get_claude_service()
             
+            if data.get('stream'):
+                return stream_text_response(iter_sync(claude_service.stream_chat_assistant(
+                    user_message=user_message,
+                    chat_history=chat_history
+                )))
+            
             # Run async chat in sync context
             import asyncio
             try:
-                response = asyncio.run(claude_service.travel_chat_assistant(
+                response = run_sync(claude_service.travel_chat_assistant(
                     user_message=user_message,
                     chat_history=chat_history
                 ))
@@ -1416,7 +1349,7 @@ def create_app() -> Flask:
             # Run async analysis in sync context
             import asyncio
             try:
-                analysis = asyncio.run(claude_service.analyze_travel_preferences(user_data))
+                analysis = run_sync(claude_service.analyze_travel_preferences(user_data))
                 
                 return jsonify({
                     'success': True,
@@ -1455,7 +1388,7 @@ def create_app() -> Flask:
             # Run async itinerary generation in sync context
             import asyncio
             try:
-                itinerary = asyncio.run(claude_service.generate_smart_itinerary(
+                itinerary = run_sync(claude_service.generate_smart_itinerary(
                     route_data=route_data,
                     user_preferences=user_preferences,
                     days=days
@@ -1562,14 +1495,8 @@ def create_app() -> Flask:
                 interests=data.get('interests', [])
             )
             
-            # Run matching asynchronously
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                matched_trips = loop.run_until_complete(matcher.match_trips(constraints))
-            finally:
-                loop.close()
+            # Several route generations per request: run them as one batch AI job
+            matched_trips = run_sync(get_ai_scheduler().run(lambda: matcher.match_trips(constraints), lane='batch'))
             
             # Convert to JSON-serializable format
             trips_json = []
@@ -1591,6 +1518,8 @@ def create_app() -> Flask:
                 'message': f'Found {len(trips_json)} matched trips for your criteria'
             })
             
+        except AISchedulerBusy:
+            return jsonify({'error': 'Trip matching is busy, please try again shortly'}), 503, {'Retry-After': '30'}
         except Exception as e:
             logger.error(f"AI trip matcher error: {e}")
             return jsonify({'error': 'Trip matching service unavailable'}), 500
@@ -1816,7 +1745,7 @@ def create_app() -> Flask:
             # Run async insights generation in sync context
             import asyncio
             try:
-                insights = asyncio.run(claude_service.generate_travel_insights(analytics))
+                insights = run_sync(claude_service.generate_travel_insights(analytics))
                 
                 return jsonify({
                     'success': True,
@@ -1873,7 +1802,7 @@ def create_app() -> Flask:
                     )
             
             # Run async function
-            hotels = asyncio.run(get_hotels_async())
+            hotels = run_sync(get_hotels_async())
             
             # Filter out hotels with no meaningful data
             filtered_hotels = [
@@ -1925,7 +1854,7 @@ def create_app() -> Flask:
                 )
             
             # Run async function
-            restaurants = asyncio.run(get_restaurants_async())
+            restaurants = run_sync(get_restaurants_async())
             
             # Filter out restaurants with no meaningful data
             filtered_restaurants = [
@@ -1978,7 +1907,7 @@ def create_app() -> Flask:
                     )
             
             # Run async function
-            events = asyncio.run(get_events_async())
+            events = run_sync(get_events_async())
             
             # Filter out events with no meaningful data
             filtered_events = [
@@ -2019,7 +1948,7 @@ def create_app() -> Flask:
                     return await enhanced_service.enrich_city_data(city_name, country_code)
             
             # Run async function
-            enrichment = asyncio.run(get_enriched_data())
+            enrichment = run_sync(get_enriched_data())
             
             return jsonify({
                 'success': True,
@@ -2058,7 +1987,7 @@ def create_app() -> Flask:
                 return True
             
             # Run async population
-            success = asyncio.run(run_population())
+            success = run_sync(run_population())
             
             return jsonify({
                 'success': True,
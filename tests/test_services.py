@@ -1,16 +1,45 @@
 """
 Integration tests for service layer.
 """
+import asyncio
+import json
+import threading
+import time
+import numpy as np
 import pytest
+from scipy.sparse.csgraph import dijkstra
 from unittest.mock import Mock, patch
 from src.services.city_service import CityService
 from src.services.route_service import ProductionRouteService
 from src.services.travel_planner import TravelPlannerServiceImpl
 from src.services.validation_service import ValidationService
-from src.infrastructure.config import SecureConfigurationService
+from src.services.interaction_store import InteractionStore
+from src.services.bulk_city_cache import BulkCityCache
+from src.services.corridor_pool_store import CorridorPool, CorridorPoolStore, learning_fingerprint
+from src.services.trip_data_service import TripDataService
+from src.services.trip_data_prefetcher import PrefetchJob, TripDataPrefetcher
+from src.services.claude_ai_service import ClaudeAIService
+from src.services.route_optimization_service import RouteOptimizationService, RouteInstance
+from src.services.road_graph_service import RoadGraph
+from src.services.route_geometry import encode_polyline, decode_polyline, simplify_polyline
+from src.infrastructure.config import APIConfig, SecureConfigurationService
+from src.infrastructure.http_client import HttpClient, get_http_client, run_sync
+from src.infrastructure.ai_scheduler import AIJobScheduler, AISchedulerBusy, set_ai_user
+from src.infrastructure.rate_limiter import RateLimiter
+from src.infrastructure.single_flight import SingleFlight
+from src.infrastructure.response_cache import CachePolicy, ResponseCache
 from src.core.models import TripRequest, Season, City, Coordinates
 
 
+@pytest.fixture(autouse=True)
+def isolated_data_files(tmp_path, monkeypatch):
+    """Keep stores opened by the services under test out of the data directory."""
+    monkeypatch.setenv('INTERACTION_STORE_PATH', str(tmp_path / 'interactions.db'))
+    monkeypatch.setenv('BULK_CITY_CACHE_PATH', str(tmp_path / 'bulk_cities.db'))
+    monkeypatch.setenv('HTTP_CACHE_PATH', str(tmp_path / 'http_cache.db'))
+    monkeypatch.setenv('RATE_LIMIT_DB_PATH', str(tmp_path / 'rate_limits.db'))
+
+
 class TestCityService:
     """Test city service functionality."""
     
@@ -103,6 +132,166 @@ class TestRouteService:
         assert len(result.data['optimized_cities']) == 4
         assert result.data['total_distance_km'] > 0
         assert len(result.data['segments']) == 3  # n-1 segments for n cities
+    
+    def test_multi_city_route_keeps_endpoints_and_caches_legs(self):
+        """Test batched leg matrix ordering with fixed start and end."""
+        cities = [
+            City('Paris', Coordinates(48.8566, 2.3522), 'France'),
+            City('Milan', Coordinates(45.4642, 9.1900), 'Italy'),
+            City('Lyon', Coordinates(45.7640, 4.8357), 'France'),
+            City('Venice', Coordinates(45.4408, 12.3155), 'Italy')
+        ]
+        
+        result = self.route_service.optimize_multi_city_route(cities)
+        
+        assert result.success
+        assert [c.name for c in result.data['optimized_cities']] == ['Paris', 'Lyon', 'Milan', 'Venice']
+        assert len(self.route_service._leg_cache) == 12  # every ordered pair, one profile
+        
+        with patch.object(self.route_service, '_calculate_geometric_matrix') as geometric:
+            cached = self.route_service.optimize_multi_city_route(cities)
+        
+        geometric.assert_not_called()
+        assert cached.data['total_distance_km'] == result.data['total_distance_km']
+
+
+class TestRoadGraph:
+    """Test offline road graph routing."""
+    
+    def setup_method(self):
+        """Build a 4x4 grid with a fast ring road and one-way diagonal."""
+        latitudes = [45 + row * 0.1 for row in range(4) for _ in range(4)]
+        longitudes = [7 + col * 0.1 for _ in range(4) for col in range(4)]
+        sources, targets, seconds, lengths = [], [], [], []
+        for node in range(16):
+            row, col = divmod(node, 4)
+            for neighbor in ([node + 1] if col < 3 else []) + ([node + 4] if row < 3 else []):
+                ring = row in (0, 3) and neighbor // 4 in (0, 3) or col in (0, 3) and neighbor % 4 in (0, 3)
+                for a, b in ((node, neighbor), (neighbor, node)):
+                    sources.append(a)
+                    targets.append(b)
+                    seconds.append(300 if ring else 600)
+                    lengths.append(10000)
+        sources.append(0)
+        targets.append(15)
+        seconds.append(4000)
+        lengths.append(40000)
+        
+        self.graph = RoadGraph.from_edges(latitudes, longitudes, sources, targets, seconds, lengths)
+        self.graph.select_landmarks(3)
+    
+    def test_shortest_path_matches_dijkstra(self):
+        """Test A* with landmarks against a plain Dijkstra."""
+        reference = dijkstra(self.graph.to_csr())
+        for source in range(16):
+            for target in range(16):
+                route = self.graph.shortest_path(source, target)
+                assert route.duration_hours * 3600 == pytest.approx(reference[source, target])
+    
+    def test_time_matrix_uses_fastest_path_lengths(self):
+        """Test many-to-many times and the lengths of the chosen paths."""
+        hours, km = self.graph.time_matrix([0, 5, 15])
+        
+        assert hours[0, 2] == pytest.approx(1800 / 3600)  # Six ring edges beat the diagonal
+        assert km[0, 2] == pytest.approx(60)
+        assert hours[2, 0] == pytest.approx(1800 / 3600)
+        assert hours[0, 0] == 0 and km[1, 1] == 0
+
+
+class TestRouteGeometry:
+    """Test polyline simplification and encoding."""
+    
+    def test_encode_polyline_reference(self):
+        """Test against Google's documented example."""
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        
+        encoded = encode_polyline(points)
+        
+        assert encoded == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+        assert decode_polyline(encoded) == points
+    
+    def test_simplify_keeps_corners(self):
+        """Test Douglas-Peucker drops collinear points but keeps real turns."""
+        line = [(45.0, 7.0 + i * 0.01) for i in range(51)] + [(45.0 + i * 0.01, 7.5) for i in range(1, 50)]
+        
+        simplified = simplify_polyline(line, tolerance_m=50)
+        
+        assert simplified == [line[0], (45.0, 7.5), line[-1]]
+
+
+class TestRouteOptimizationService:
+    """Test route optimization algorithms."""
+    
+    def setup_method(self):
+        """Setup test fixtures."""
+        self.optimizer = RouteOptimizationService()
+        self.start = City('Paris', Coordinates(48.8566, 2.3522), 'France')
+        self.end = City('Rome', Coordinates(41.9028, 12.4964), 'Italy')
+        self.candidates = [
+            City('Lyon', Coordinates(45.7640, 4.8357), 'France', types=['culinary']),
+            City('Dijon', Coordinates(47.3220, 5.0415), 'France', types=['wine']),
+            City('Geneva', Coordinates(46.2044, 6.1432), 'Switzerland', types=['lakes']),
+            City('Turin', Coordinates(45.0703, 7.6869), 'Italy', types=['cultural']),
+            City('Milan', Coordinates(45.4642, 9.1900), 'Italy', types=['fashion']),
+            City('Genoa', Coordinates(44.4056, 8.9463), 'Italy', types=['coastal']),
+            City('Bologna', Coordinates(44.4949, 11.3426), 'Italy', types=['culinary']),
+            City('Florence', Coordinates(43.7696, 11.2558), 'Italy', types=['artistic']),
+            City('Siena', Coordinates(43.3188, 11.3308), 'Italy', types=['historic']),
+        ]
+    
+    def test_distance_matrix(self):
+        """Test the per-request distance matrix."""
+        instance = RouteInstance.build(self.start, self.end, self.candidates, {})
+        
+        assert instance.distances.shape == (11, 11)
+        assert (instance.distances == instance.distances.T).all()
+        assert 1100 < instance.direct_distance < 1130  # Paris-Rome great circle
+    
+    def test_optimize_route_respects_max_cities(self):
+        """Test that the optimizer selects at most max_cities stops."""
+        scores = {city.name: 0.5 + i * 0.05 for i, city in enumerate(self.candidates)}
+        
+        result = self.optimizer.optimize_route(
+            self.start, self.end, self.candidates, 4, 'cultural', scores
+        )
+        
+        assert 0 < len(result.cities) <= 4
+        assert len({city.name for city in result.cities}) == len(result.cities)
+        assert result.total_distance >= 1100
+        assert result.algorithm_reports
+    
+    def test_portfolio_stays_within_time_budget(self):
+        """Test that large pools and wide subset DPs respect the wall time budget."""
+        rng = np.random.default_rng(7)
+        candidates = [
+            City(f'Stop {i}', Coordinates(float(lat), float(lon)), 'France', types=['historic'])
+            for i, (lat, lon) in enumerate(zip(rng.uniform(42, 48, 2000), rng.uniform(3, 12, 2000)))
+        ]
+        scores = {city.name: float(score) for city, score in zip(candidates, rng.uniform(0.3, 1.0, 2000))}
+        
+        started = time.perf_counter()
+        result = self.optimizer.optimize_route(
+            self.start, self.end, candidates, 8, 'cultural', scores, time_budget_seconds=0.3
+        )
+        
+        # Generous margin for loaded CI machines; the unbounded portfolio took ~2s
+        assert time.perf_counter() - started < 1.0
+        assert 0 < len(result.cities) <= 8
+        assert not self.optimizer._exact_dp_affordable(15, 12)
+        assert self.optimizer._exact_dp_affordable(9, 4)
+    
+    def test_parallel_tempering_stops_waiting_at_deadline(self):
+        """Test that slow annealing rounds cannot hold the optimizer past its deadline."""
+        instance = RouteInstance.build(self.start, self.end, self.candidates, {})
+        self.optimizer.config.parallel_annealing_chains = 2
+        self.optimizer.config.parallel_annealing_workers = 2
+        self.optimizer.config.parallel_annealing_steps_per_round = 10_000_000
+        
+        started = time.perf_counter()
+        result = self.optimizer._parallel_tempering_optimization(instance, 3, deadline=started + 0.5)
+        
+        assert time.perf_counter() - started < 3.0
+        assert 0 < len(result.cities) <= 3
 
 
 class TestTravelPlannerIntegration:
@@ -189,6 +378,834 @@ class TestTravelPlannerIntegration:
         assert any('winter' in tip.lower() for tip in tips)
 
 
+class TestCandidateGathering:
+    """Test concurrent candidate gathering."""
+    
+    def test_slow_source_is_bounded_by_its_timeout(self):
+        """Test that a hung source neither blocks nor drops the other sources."""
+        from src.services.enhanced_intermediate_city_service import EnhancedIntermediateCityService
+        
+        city_service = CityService(Mock())
+        service = EnhancedIntermediateCityService(city_service)
+        service.source_timeouts = {'enhanced': 0.2, 'opentripmap': 0.2, 'fallback': 5.0}
+        start = city_service.get_city_by_name('Aix-en-Provence')
+        end = city_service.get_city_by_name('Venice')
+        request = TripRequest(start_city='Aix-en-Provence', end_city='Venice', travel_days=7,
+                              nights_at_destination=3, season=Season.SUMMER)
+        
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(30)
+        
+        fallback = [city_service.get_city_by_name('Genoa')]
+        with patch.object(service, '_get_enhanced_service_candidates', hang), \
+                patch.object(service, '_get_opentripmap_candidates', hang), \
+                patch.object(service, '_get_fallback_candidates', return_value=fallback):
+            started = time.monotonic()
+            candidates = asyncio.run(service._gather_candidate_cities(start, end, request, 'scenic'))
+        
+        assert time.monotonic() - started < 2
+        assert [city.name for city in candidates] == ['Genoa']
+    
+    def test_opentripmap_candidates_merge_in_country_order(self):
+        """Test that countries finishing out of order still merge in route country order."""
+        from src.services.enhanced_intermediate_city_service import EnhancedIntermediateCityService
+        
+        class FakeOpenTripMap:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def get_cities_in_country(self, country, limit=100):
+                await asyncio.sleep({'FR': 0.06, 'IT': 0.03, 'CH': 0.0}[country])
+                return [{'name': f'{country} town'}]
+        
+        service = EnhancedIntermediateCityService(CityService(Mock()))
+        service.opentripmap_service = FakeOpenTripMap()
+        sink = []
+        with patch.object(service, '_determine_countries_for_route', return_value=['FR', 'IT', 'CH']), \
+                patch.object(service, '_matches_route_type', return_value=True), \
+                patch.object(service, '_convert_to_city_object', side_effect=lambda data, source: data['name']):
+            asyncio.run(service._get_opentripmap_candidates(None, None, 'scenic', sink=sink))
+        
+        assert sink == ['FR town', 'IT town', 'CH town']
+    
+    def test_deduplicate_matches_pairwise_check(self):
+        """Test that grid deduplication keeps the same cities as a pairwise scan."""
+        import random
+        from src.services.enhanced_intermediate_city_service import EnhancedIntermediateCityService
+        
+        service = EnhancedIntermediateCityService(CityService(Mock()))
+        rng = random.Random(7)
+        candidates = [
+            City(name=f"Town {i % 150}", coordinates=Coordinates(rng.uniform(43.0, 46.0), rng.uniform(4.0, 10.0)),
+                 country="France")
+            for i in range(400)
+        ]
+        
+        expected, names = [], set()
+        for city in candidates:
+            key = city.name.lower().replace(' ', '').replace('-', '')
+            if key in names or any(service._calculate_distance(city.coordinates, kept.coordinates) < 10
+                                   for kept in expected):
+                continue
+            expected.append(city)
+            names.add(key)
+        
+        assert service._deduplicate_candidates(candidates) == expected
+
+
+class TestOpenTripMapDetails:
+    """Test concurrent, cached attraction detail fetching."""
+    
+    def test_details_are_fetched_concurrently_and_cached(self, tmp_path):
+        """Test that details run in parallel and repeat lookups hit the cache."""
+        from src.services.opentripmap_service import OpenTripMapService
+        
+        calls = []
+        
+        class FakeResponse:
+            status = 200
+            headers = {}
+            
+            def __init__(self, xid):
+                self.xid = xid
+            
+            async def __aenter__(self):
+                calls.append(self.xid)
+                await asyncio.sleep(0.05)
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def text(self):
+                return json.dumps({'xid': self.xid, 'name': self.xid, 'image': f'{self.xid}.jpg',
+                                   'info': {'descr': 'Old town', 'src': 'wikidata'}, 'kinds': 'museums'})
+        
+        session = Mock()
+        session.get = lambda url, params=None, headers=None: FakeResponse(url.rsplit('/', 1)[-1])
+        
+        with patch.dict('os.environ', {'OPENTRIPMAP_API_KEY': 'test'}):
+            service = OpenTripMapService()
+        limiter = RateLimiter(APIConfig(provider_rate_limits={'opentripmap': 60000}))
+        response_cache = ResponseCache(path=str(tmp_path / 'http_cache.db'))
+        attractions = [{'xid': f'N{i}'} for i in range(10)]
+        
+        with patch('src.infrastructure.response_cache.get_http_session', return_value=session), \
+                patch('src.infrastructure.response_cache.get_rate_limiter', return_value=limiter), \
+                patch('src.infrastructure.response_cache.get_response_cache', return_value=response_cache):
+            started = time.monotonic()
+            asyncio.run(service._add_attraction_details(attractions))
+            elapsed = time.monotonic() - started
+            asyncio.run(service._add_attraction_details([{'xid': 'N3'}]))
+        
+        assert elapsed < 0.4
+        assert len(calls) == 10
+        assert attractions[3]['image'] == 'N3.jpg'
+        assert attractions[3]['info'] == {'descr': 'Old town'}
+
+
+class TestInteractionStore:
+    """Test durable trip interaction storage."""
+    
+    def setup_method(self):
+        """Setup test fixtures."""
+        self.store = None
+    
+    def teardown_method(self):
+        """Stop the background writer."""
+        if self.store:
+            self.store.close()
+    
+    def test_record_trip_updates_aggregates(self, tmp_path):
+        """Test that flushed trips are folded into per-city counters."""
+        self.store = InteractionStore(str(tmp_path / 'interactions.db'))
+        
+        self.store.record_trip('user-1', ['Lyon', 'Nice'], rating=5)
+        self.store.record_trip('user-2', ['Lyon'], rating=3)
+        self.store.flush()
+        
+        lyon = self.store.get_city_aggregate('Lyon')
+        assert lyon['trip_count'] == 2
+        assert lyon['avg_rating'] == 4.0
+        assert lyon['high_rating_count'] == 1
+        assert self.store.get_total_trips() == 2
+    
+    def test_aggregates_survive_restart(self, tmp_path):
+        """Test that a new store instance sees previously written trips."""
+        db_path = str(tmp_path / 'interactions.db')
+        first = InteractionStore(db_path)
+        first.record_trip('user-1', ['Turin'], rating=4)
+        first.close()
+        
+        self.store = InteractionStore(db_path)
+        history = self.store.get_user_city_history('user-1')
+        assert [entry['city_name'] for entry in history] == ['Turin']
+        assert self.store.get_city_aggregate('Turin')['trip_count'] == 1
+
+
+class TestBulkCityCache:
+    """Test the persistent bulk city cache."""
+    
+    def test_cached_cities_are_shared_between_instances(self, tmp_path):
+        """Test that one worker's refresh becomes visible to another."""
+        db_path = str(tmp_path / 'bulk.db')
+        reader = BulkCityCache(db_path, refresh_enabled=False, reload_interval_seconds=0)
+        writer = BulkCityCache(db_path, refresh_enabled=False)
+        
+        assert reader.get_cities() == []
+        assert writer.stale_countries()[0] == 'FR'
+        
+        writer.store_country('IT', [{'name': 'Turin'}])
+        writer.store_country('FR', [{'name': 'Lyon'}])
+        
+        assert [city['name'] for city in reader.get_cities()] == ['Lyon', 'Turin']
+        assert 'FR' not in writer.stale_countries()
+    
+    def test_failed_refresh_backs_off_instead_of_retrying_per_request(self, tmp_path):
+        """Test that requests on an empty cache do not re-trigger a failing refresh."""
+        cache = BulkCityCache(str(tmp_path / 'bulk.db'), refresh_enabled=True, retry_backoff_seconds=60)
+        try:
+            with patch.object(cache, 'refresh_stale', side_effect=RuntimeError('GeoNames down')) as refresh:
+                cache.get_cities()
+                for _ in range(50):
+                    if refresh.call_count and cache._retry_at:
+                        break
+                    time.sleep(0.01)
+                for _ in range(5):
+                    cache.get_cities()
+                time.sleep(0.05)
+                
+                assert refresh.call_count == 1
+                assert cache._retry_at > time.time() + 30
+        finally:
+            cache.close()
+
+
+class TestCorridorPoolStore:
+    """Test precomputed corridor candidate pools."""
+    
+    def test_pool_round_trip_and_catalog_invalidation(self, tmp_path):
+        """Test that saved pools are served until the catalog fingerprint changes."""
+        store = CorridorPoolStore(str(tmp_path / 'pools.json.gz'), reload_interval_seconds=0)
+        city = City(name='Genoa', coordinates=Coordinates(44.4056, 8.9463), country='Italy',
+                    types=['coastal', 'historic'], population=580000)
+        pool = CorridorPool('Aix-en-Provence', 'Venice', 'scenic', [city],
+                            {'Genoa': {'distance': 0.8, 'diversity': 0.5, 'popularity': 0.4, 'accessibility': 0.82}})
+        
+        with patch('src.services.corridor_pool_store.catalog_fingerprint', return_value='v1'):
+            store.save([pool])
+            hit = store.get('aix-en-provence', 'Venice', 'scenic')
+            assert store.get('Aix-en-Provence', 'Venice', 'cultural') is None
+        
+        assert hit.cities == [city]
+        assert hit.static_scores['Genoa']['distance'] == 0.8
+        
+        with patch('src.services.corridor_pool_store.catalog_fingerprint', return_value='v2'):
+            assert store.get('Aix-en-Provence', 'Venice', 'scenic') is None
+        assert store.stats == {'hits': 1, 'misses': 1, 'stale': 1}
+        
+        # Lookups within the reload interval reuse the catalog fingerprint
+        cached = CorridorPoolStore(str(tmp_path / 'pools.json.gz'))
+        with patch('src.services.corridor_pool_store.catalog_fingerprint', return_value='v1') as fingerprint:
+            assert all(cached.get('Aix-en-Provence', 'Venice', 'scenic') for _ in range(3))
+        assert fingerprint.call_count == 1
+    
+    def test_learning_fingerprint_tracks_interaction_aggregates(self):
+        """Test that recorded trips make previously built pools stale."""
+        before = learning_fingerprint()
+        store = InteractionStore()
+        try:
+            store.record_trip('user-1', ['Lyon', 'Turin'], rating=5)
+            store.flush()
+        finally:
+            store.close()
+        
+        assert learning_fingerprint() != before
+
+
+class TestHttpClient:
+    """Test the shared pooled HTTP client."""
+    
+    def test_session_is_reused_across_sync_calls(self):
+        """Test that run_sync keeps one pooled session per thread loop."""
+        client = HttpClient()
+        
+        async def current_session():
+            return client.session()
+        
+        first = run_sync(current_session())
+        second = run_sync(current_session())
+        other_loop = asyncio.run(current_session())
+        
+        assert first is second
+        assert other_loop is not first
+        assert first.connector.limit_per_host == client.config.limit_per_host
+        assert client.stats['sessions_created'] == 2
+        client.close_all()
+        assert first.closed
+    
+    def test_nested_run_sync_neither_deadlocks_nor_outlives_timeout(self):
+        """Test sync-over-async calls made from inside a running loop."""
+        async def nested(depth):
+            return 'done' if depth == 0 else run_sync(nested(depth - 1))
+        
+        cancelled = []
+        
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        
+        async def blocking_caller():
+            return run_sync(slow(), timeout=0.05)
+        
+        assert run_sync(nested(8)) == 'done'
+        with pytest.raises(asyncio.TimeoutError):
+            run_sync(blocking_caller())
+        assert cancelled
+
+
+class TestRateLimiter:
+    """Test per-provider token-bucket rate limiting."""
+    
+    def test_burst_then_paced_waits(self, tmp_path):
+        """Test that requests beyond the burst wait for refill and are counted."""
+        config = APIConfig(provider_rate_limits={'nominatim': 60})
+        limiter = RateLimiter(config)
+        
+        delays = [limiter.reserve('nominatim') for _ in range(3)]
+        assert delays[0] == 0
+        assert delays[1] == pytest.approx(1.0, abs=0.05)
+        assert delays[2] == pytest.approx(2.0, abs=0.05)
+        assert limiter.reserve('wikidata') == 0
+        
+        stats = limiter.get_stats()['nominatim']
+        assert stats['requests'] == 3
+        assert stats['delayed'] == 2
+        assert stats['max_wait_ms'] == pytest.approx(2000, abs=50)
+        
+        # Two limiters on one database share the quota like separate workers
+        db_path = str(tmp_path / 'limits.db')
+        first = RateLimiter(config, shared_db_path=db_path)
+        second = RateLimiter(config, shared_db_path=db_path)
+        assert first.reserve('nominatim') == 0
+        assert second.reserve('nominatim') == pytest.approx(1.0, abs=0.05)
+
+
+class TestSingleFlight:
+    """Test coalescing of identical in-flight calls."""
+    
+    def test_concurrent_identical_calls_share_one_execution(self):
+        """Test that only the first of several identical calls runs."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def fetch(city):
+            calls.append(city)
+            await asyncio.sleep(0.05)
+            return {'city': city, 'attractions': []}
+        
+        async def run():
+            return await asyncio.gather(
+                *(flight.do('opentripmap', ('Paris',), lambda: fetch('Paris')) for _ in range(5)),
+                flight.do('opentripmap', ('Rome',), lambda: fetch('Rome'))
+            )
+        
+        results = asyncio.run(run())
+        
+        assert sorted(calls) == ['Paris', 'Rome']
+        assert all(result == {'city': 'Paris', 'attractions': []} for result in results[:5])
+        assert results[0] is not results[1]
+        stats = flight.get_stats()['opentripmap']
+        assert stats['calls'] == 6
+        assert stats['executed'] == 2
+        assert stats['deduplicated'] == 4
+        assert stats['in_flight'] == 0
+    
+    def test_caller_timeout_does_not_cancel_shared_call(self):
+        """Test that the leader or a follower timing out leaves the others their result."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return {'temp': 21}
+        
+        async def run():
+            impatient = [
+                asyncio.wait_for(flight.do('weather', ('Paris',), fetch), timeout=0.02)
+                for _ in range(2)
+            ]
+            return await asyncio.gather(
+                *impatient,
+                flight.do('weather', ('Paris',), fetch),
+                flight.do('weather', ('Paris',), fetch),
+                return_exceptions=True
+            )
+        
+        leader, follower, *patient = asyncio.run(run())
+        
+        assert isinstance(leader, asyncio.TimeoutError)
+        assert isinstance(follower, asyncio.TimeoutError)
+        assert patient == [{'temp': 21}, {'temp': 21}]
+        assert len(calls) == 1
+        assert flight.get_stats()['weather']['in_flight'] == 0
+    
+    def test_leader_timeout_on_another_thread_does_not_strand_followers(self):
+        """Test that a leader whose run_sync loop stops still finishes the call for followers."""
+        flight = SingleFlight()
+        leader_errors = []
+        
+        async def fetch():
+            await asyncio.sleep(0.3)
+            return {'temp': 21}
+        
+        def leader():
+            try:
+                run_sync(flight.do('weather', ('Paris',), fetch), timeout=0.05)
+            except Exception as e:
+                leader_errors.append(e)
+        
+        thread = threading.Thread(target=leader)
+        thread.start()
+        time.sleep(0.02)
+        started = time.monotonic()
+        result = run_sync(flight.do('weather', ('Paris',), fetch), timeout=2.0)
+        thread.join()
+        
+        assert result == {'temp': 21}
+        assert time.monotonic() - started < 1.0
+        assert [type(e) for e in leader_errors] == [asyncio.TimeoutError]
+        assert flight.get_stats()['weather']['executed'] == 1
+
+
+class TestResponseCache:
+    """Test the persistent HTTP response cache."""
+    
+    def test_stale_while_revalidate_with_etag(self, tmp_path):
+        """Test fresh hits, stale serving and conditional background refresh."""
+        requests = []
+        
+        class FakeResponse:
+            def __init__(self, headers):
+                self.status = 304 if headers.get('If-None-Match') == '"v1"' else 200
+                self.headers = {'ETag': '"v1"'}
+            
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def text(self):
+                return '{"temp": 21}'
+        
+        def fake_get(url, params=None, headers=None):
+            requests.append(dict(headers or {}))
+            return FakeResponse(headers or {})
+        
+        session = Mock()
+        session.get = fake_get
+        cache = ResponseCache(path=str(tmp_path / 'http_cache.db'))
+        policy = CachePolicy(ttl_seconds=60, stale_seconds=60)
+        url = 'https://api.openweathermap.org/data/2.5/weather'
+        
+        async def fetch():
+            return await cache.get(url, params={'lat': 48.85}, policy=policy)
+        
+        with patch('src.infrastructure.response_cache.get_http_session', return_value=session):
+            first = asyncio.run(fetch())
+            second = asyncio.run(fetch())
+            
+            # Expire the entry, then expect the stale body while a refresh runs
+            import sqlite3
+            with sqlite3.connect(cache.path) as conn:
+                conn.execute('UPDATE http_response_cache SET expires_at = ?', (time.time() - 1,))
+            stale = asyncio.run(fetch())
+            for _ in range(50):
+                if cache.stats['not_modified']:
+                    break
+                time.sleep(0.02)
+        
+        assert not first.from_cache and second.from_cache and stale.from_cache
+        assert asyncio.run(stale.json()) == {'temp': 21}
+        assert len(requests) == 2
+        assert requests[1]['If-None-Match'] == '"v1"'
+        assert cache.stats['hits'] == 1
+        assert cache.stats['stale_hits'] == 1
+        assert cache.stats['not_modified'] == 1
+    
+    def test_upstream_error_serves_expired_entry(self, tmp_path):
+        """Test that a 429/5xx on revalidation returns the expired body, not the error."""
+        statuses = [200, 503, 429]
+        
+        class FakeResponse:
+            def __init__(self):
+                self.status = statuses.pop(0)
+                self.headers = {}
+            
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def text(self):
+                return '{"temp": 21}' if self.status == 200 else '{"error": "unavailable"}'
+        
+        session = Mock()
+        session.get = lambda url, params=None, headers=None: FakeResponse()
+        cache = ResponseCache(path=str(tmp_path / 'http_cache.db'))
+        policy = CachePolicy(ttl_seconds=0)
+        url = 'https://api.openweathermap.org/data/2.5/weather'
+        
+        async def fetch():
+            return await cache.get(url, params={'lat': 48.85}, policy=policy)
+        
+        with patch('src.infrastructure.response_cache.get_http_session', return_value=session):
+            responses = [asyncio.run(fetch()) for _ in range(3)]
+        
+        assert [response.status for response in responses] == [200, 200, 200]
+        assert all(asyncio.run(response.json()) == {'temp': 21} for response in responses)
+        assert responses[1].from_cache and responses[2].from_cache
+        assert cache.stats['errors'] == 2
+
+
+class TestTripDataService:
+    """Test concurrent trip data fan-out."""
+    
+    def test_cities_fetched_concurrently_with_partial_results(self):
+        """Test that a slow provider falls back without holding up the others."""
+        async def slow_hotels(coordinates, city_name):
+            await asyncio.sleep(1)
+            return []
+        
+        async def delayed(result):
+            await asyncio.sleep(0.1)
+            return result
+        
+        amadeus = Mock()
+        amadeus.find_hotels = slow_hotels
+        amadeus._get_fallback_hotels = lambda city_name, limit: [{'name': f'{city_name} Inn', 'source': 'fallback'}]
+        foursquare = Mock()
+        foursquare.find_restaurants = lambda coordinates, city_name, limit: delayed([{'name': 'Bistro'}])
+        opentripmap = Mock()
+        opentripmap.get_city_attractions = lambda **kwargs: delayed(
+            [{'xid': f'N{i}', 'name': f'Sight {i}', 'kinds': ['museums']} for i in range(5)]
+        )
+        eventbrite = Mock()
+        eventbrite.find_events_by_location = lambda **kwargs: delayed([])
+        
+        service = TripDataService(amadeus, foursquare, opentripmap, eventbrite, timeouts={'amadeus': 0.3})
+        cities = [{'name': name, 'coordinates': [45.0 + i, 7.0]}
+                  for i, name in enumerate(['Lyon', 'Turin', 'Milan', 'Verona', 'Venice', 'Trieste'])]
+        
+        started = time.monotonic()
+        data = asyncio.run(service.fetch_trip_data(cities + [{'name': 'Nowhere'}]))
+        elapsed = time.monotonic() - started
+        
+        assert elapsed < 0.6
+        assert sorted(data['hotels']) == sorted(city['name'] for city in cities)
+        assert data['hotels']['Lyon'][0]['source'] == 'fallback'
+        assert data['restaurants']['Venice'] == [{'name': 'Bistro'}]
+        assert data['activities']['Milan'][0]['category'] == 'Museum'
+        assert data['failed']['Turin'] == ['amadeus']
+    
+    def test_cancellation_from_shared_call_falls_back(self):
+        """Test that a CancelledError not aimed at this request counts as a provider failure."""
+        async def cancelled_elsewhere(**kwargs):
+            raise asyncio.CancelledError()
+        
+        async def empty(*args, **kwargs):
+            return []
+        
+        amadeus = Mock()
+        amadeus.find_hotels = empty
+        foursquare = Mock()
+        foursquare.find_restaurants = empty
+        foursquare.find_activities = empty
+        opentripmap = Mock()
+        opentripmap.get_city_attractions = cancelled_elsewhere
+        eventbrite = Mock()
+        eventbrite.find_events_by_location = empty
+        
+        service = TripDataService(amadeus, foursquare, opentripmap, eventbrite)
+        data = asyncio.run(service.fetch_city('Lyon', Coordinates(45.76, 4.84)))
+        
+        assert 'opentripmap' in data['failed']
+        assert data['hotels'] == []
+
+
+class TestTripDataPrefetcher:
+    """Test background prefetching of trip data."""
+    
+    def test_queue_saturation_keeps_best_ranked_jobs(self):
+        """Test that a full queue displaces lower-ranked jobs and rejects worse ones."""
+        prefetcher = TripDataPrefetcher(Mock(), max_queue=2)
+        noop = Mock()
+        
+        prefetcher._enqueue(PrefetchJob((1, 0), ('hotels', 'Lyon'), noop))
+        prefetcher._enqueue(PrefetchJob((2, 1), ('hotels', 'Turin'), noop))
+        prefetcher._enqueue(PrefetchJob((0, 2), ('hotels', 'Milan'), noop))
+        prefetcher._enqueue(PrefetchJob((3, 3), ('hotels', 'Verona'), noop))
+        prefetcher._enqueue(PrefetchJob((1, 4), ('hotels', 'Lyon'), noop))
+        
+        assert set(prefetcher._queued) == {('hotels', 'Lyon'), ('hotels', 'Milan')}
+        assert prefetcher.stats['displaced'] == 1
+        assert prefetcher.stats['rejected'] == 1
+        assert prefetcher.stats['duplicates'] == 1
+    
+    def test_route_cities_fetched_in_rank_order(self):
+        """Test that the top routes' cities are fetched once each, best route first."""
+        executed = []
+        
+        class FakeTripData:
+            def provider_fetches(self, city_name, coordinates):
+                async def fetch():
+                    executed.append(city_name)
+                return {'hotels': fetch}
+        
+        venice = {'name': 'Venice', 'coordinates': {'latitude': 45.44, 'longitude': 12.32}}
+        routes = [
+            {'intermediate_cities': [{'name': 'Lyon', 'coordinates': [45.76, 4.83]}], 'end_city': venice},
+            {'intermediate_cities': [{'name': 'Turin', 'coordinates': [45.07, 7.69]}], 'end_city': venice},
+            {'intermediate_cities': [{'name': 'Genoa', 'coordinates': [44.41, 8.93]}], 'end_city': venice}
+        ]
+        prefetcher = TripDataPrefetcher(FakeTripData(), workers=1, top_routes=2)
+        prefetcher.prefetch_routes(routes)
+        
+        for _ in range(50):
+            if prefetcher.stats['completed'] == 3:
+                break
+            time.sleep(0.02)
+        
+        assert executed == ['Lyon', 'Venice', 'Turin']
+        assert prefetcher.get_stats()['queued'] == 0
+    
+    def test_cancelled_fetch_does_not_stop_worker(self):
+        """Test that a fetch cancelled from elsewhere fails its job and the worker carries on."""
+        executed = []
+        
+        class FakeTripData:
+            def provider_fetches(self, city_name, coordinates):
+                async def fetch():
+                    if city_name == 'Lyon':
+                        raise asyncio.CancelledError()
+                    executed.append(city_name)
+                return {'hotels': fetch}
+        
+        routes = [{'intermediate_cities': [{'name': 'Lyon', 'coordinates': [45.76, 4.83]}],
+                   'end_city': {'name': 'Venice', 'coordinates': [45.44, 12.32]}}]
+        prefetcher = TripDataPrefetcher(FakeTripData(), workers=1)
+        prefetcher.prefetch_routes(routes)
+        
+        for _ in range(50):
+            if prefetcher.stats['completed'] == 1:
+                break
+            time.sleep(0.02)
+        
+        assert executed == ['Venice']
+        assert prefetcher.stats['failed'] == 1
+
+
+class TestRouteWeather:
+    """Test grid-bucketed route weather."""
+    
+    def test_nearby_cities_share_one_forecast_call(self, tmp_path):
+        """Test that cities in one grid cell share a cached forecast."""
+        from src.services.weather_service import WeatherService
+        
+        calls = []
+        step = {'main': {'temp': 22.0, 'feels_like': 23.0, 'humidity': 60, 'pressure': 1015},
+                'weather': [{'description': 'clear sky', 'icon': '01d'}],
+                'wind': {'speed': 3.0, 'deg': 180}, 'visibility': 10000, 'pop': 0.1}
+        
+        class FakeResponse:
+            status = 200
+            headers = {}
+            
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def text(self):
+                now = int(time.time())
+                return json.dumps({'list': [dict(step, dt=now + i * 10800) for i in range(40)]})
+        
+        def fake_get(url, params=None, headers=None):
+            calls.append((params['lat'], params['lon']))
+            return FakeResponse()
+        
+        session = Mock()
+        session.get = fake_get
+        cities = [
+            {'name': 'Nice', 'coordinates': [43.70, 7.27]},
+            {'name': 'Cannes', 'coordinates': [43.55, 7.01]},
+            {'name': 'Monaco', 'coordinates': [43.74, 7.42]},
+            {'name': 'Paris', 'coordinates': [48.86, 2.35]}
+        ]
+        
+        with patch.dict('os.environ', {'OPENWEATHER_API_KEY': 'test'}):
+            service = WeatherService()
+        with patch('src.infrastructure.response_cache.get_http_session', return_value=session), \
+                patch('src.infrastructure.response_cache.get_response_cache',
+                      return_value=ResponseCache(path=str(tmp_path / 'http_cache.db'))):
+            weather = asyncio.run(service.get_route_weather(cities))
+            asyncio.run(service.get_route_weather(cities))
+        
+        assert len(calls) == 2
+        assert weather['Cannes']['current']['temperature'] == 22.0
+        assert weather['Cannes']['current']['city'] == 'Cannes'
+        assert len(weather['Paris']['forecast']['daily']) == 5
+
+
+class TestClaudeAIService:
+    """Test Claude response caching, usage accounting and streaming against a local stub."""
+    
+    async def _with_stub(self, scenario):
+        from aiohttp import web
+        calls = []
+        
+        async def messages(request):
+            payload = await request.json()
+            calls.append(payload)
+            if not payload.get('stream'):
+                return web.json_response({'content': [{'text': 'Visit Lyon.'}],
+                                          'usage': {'input_tokens': 12, 'output_tokens': 3}})
+            
+            response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+            await response.prepare(request)
+            events = [{'type': 'message_start', 'message': {'usage': {'input_tokens': 10, 'output_tokens': 1}}}]
+            events += [{'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': text}}
+                       for text in ('Visit ', 'Lyon.')]
+            events += [{'type': 'message_delta', 'usage': {'output_tokens': 4}}, {'type': 'message_stop'}]
+            for event in events:
+                await response.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            await response.write_eof()
+            return response
+        
+        app = web.Application()
+        app.router.add_post('/messages', messages)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'test-key',
+                                           'ANTHROPIC_BASE_URL': f'http://127.0.0.1:{port}'}):
+                service = ClaudeAIService()
+            return await scenario(service), calls
+        finally:
+            # Close this loop's pooled session before asyncio.run closes the loop
+            await get_http_client().close()
+            await runner.cleanup()
+    
+    def test_normalized_prompts_share_cached_response(self):
+        async def scenario(service):
+            first = await service.travel_chat_assistant('Where should I  stop near Paris?')
+            second = await service.travel_chat_assistant('where should i stop near paris?\n')
+            return first, second, service.get_usage_stats()['chat']
+        
+        (first, second, usage), calls = asyncio.run(self._with_stub(scenario))
+        
+        assert first == second == 'Visit Lyon.'
+        assert len(calls) == 1
+        assert usage['requests'] == 2 and usage['cache_hits'] == 1
+        assert usage['input_tokens'] == 12 and usage['output_tokens'] == 3
+    
+    def test_stream_yields_deltas_and_caches_completion(self):
+        async def scenario(service):
+            streamed = [chunk async for chunk in service.stream_chat_assistant('Best stop near Paris?')]
+            replayed = [chunk async for chunk in service.stream_chat_assistant('Best stop near Paris?')]
+            return streamed, replayed, service.get_usage_stats()['chat']
+        
+        (streamed, replayed, usage), calls = asyncio.run(self._with_stub(scenario))
+        
+        assert streamed == ['Visit ', 'Lyon.']
+        assert replayed == ['Visit Lyon.']
+        assert len(calls) == 1 and calls[0]['stream'] is True
+        assert usage['input_tokens'] == 10 and usage['output_tokens'] == 4
+
+
+class TestAIJobScheduler:
+    """Test AI job concurrency cap, priority lanes and per-user fairness."""
+    
+    def test_interactive_first_then_round_robin_per_user(self):
+        scheduler = AIJobScheduler(max_concurrency=1)
+        order = []
+        
+        async def job(label, user, lane):
+            set_ai_user(user)
+            async with scheduler.slot(lane):
+                order.append(label)
+                await asyncio.sleep(0)
+        
+        async def run():
+            gate = asyncio.Event()
+            
+            async def blocker():
+                async with scheduler.slot('batch'):
+                    await gate.wait()
+            
+            tasks = [asyncio.create_task(blocker())]
+            for label, user, lane in [('a1', 'alice', 'batch'), ('a2', 'alice', 'batch'), ('a3', 'alice', 'batch'),
+                                      ('b1', 'bob', 'batch'), ('c1', 'carol', 'interactive')]:
+                await asyncio.sleep(0)
+                tasks.append(asyncio.create_task(job(label, user, lane)))
+            await asyncio.sleep(0.01)
+            stats = scheduler.get_stats()
+            gate.set()
+            await asyncio.gather(*tasks)
+            return stats
+        
+        stats = asyncio.run(run())
+        
+        assert order == ['c1', 'a1', 'b1', 'a2', 'a3']
+        assert stats['running'] == 1
+        assert stats['lanes']['batch']['queue_depth'] == 4
+        assert stats['lanes']['batch']['waiting_users'] == 2
+        assert stats['lanes']['interactive']['queue_depth'] == 1
+        assert scheduler.get_stats()['running'] == 0
+    
+    def test_sheds_jobs_past_queue_timeout_and_nests_slots(self):
+        scheduler = AIJobScheduler(max_concurrency=1, queue_timeouts={'batch': 0.05})
+        
+        async def job(hold):
+            async with scheduler.slot('batch'):
+                # Nested calls inside a running job do not queue behind it
+                async with scheduler.slot('batch'):
+                    await asyncio.sleep(hold)
+        
+        started = []
+        
+        async def run():
+            holder = asyncio.create_task(job(0.2))
+            await asyncio.sleep(0)
+            with pytest.raises(AISchedulerBusy):
+                await job(0)
+            # A shed run() never creates its coroutine
+            with pytest.raises(AISchedulerBusy):
+                await scheduler.run(lambda: started.append(True), lane='batch')
+            await holder
+        
+        asyncio.run(run())
+        
+        stats = scheduler.get_stats()
+        assert started == []
+        assert stats['running'] == 0
+        assert stats['lanes']['batch']['timed_out'] == 2
+        assert stats['lanes']['batch']['queue_depth'] == 0
+
+
 class TestServiceErrorHandling:
     """Test error handling across services."""
     